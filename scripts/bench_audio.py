@@ -0,0 +1,150 @@
+"""Benchmark podcast audio rendering against the local TTS stub
+
+Renders a synthetic episode with the same podcast['dialog'] structure that
+PodcastGenerator produces, at several concurrency levels, and reports render
+time, peak RSS and throughput. A stub server is started in-process unless
+--base-url points at a running one.
+
+    python scripts/bench_audio.py --lines 60 --concurrency 1 4 8 --latency 0.3
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.tts_stub_server import start_stub_server
+from utils.audio import AudioRenderer
+
+SENTENCES = [
+    "Välkommen till veckans avsnitt där vi går igenom de viktigaste nyheterna.",
+    "The regulator published its final guidance on model transparency this morning.",
+    "Det här påverkar framför allt mindre bolag som saknar egna juridiska resurser.",
+    "Analysts expect the first enforcement decisions before the end of the year.",
+    "Vi återkommer till frågan om finansiering i nästa del av programmet.",
+]
+
+
+def synthetic_podcast(lines):
+    """A podcast script in the format PodcastGenerator returns"""
+    hosts = [
+        {"name": "Anna", "role": "Host", "bio": "News editor",
+         "elevenlabs_voice_id": "stub-voice-anna"},
+        {"name": "Erik", "role": "Co-host", "bio": "Technology reporter",
+         "elevenlabs_voice_id": "stub-voice-erik"},
+    ]
+    dialog = [{
+        "speaker": hosts[i % len(hosts)]["name"],
+        # Line numbers keep every line unique, so nothing is served from cache
+        "text": f"{i + 1}. {SENTENCES[i % len(SENTENCES)]}"
+    } for i in range(lines)]
+    return {"podcast": {"title": "Benchmark episode", "episode": "1",
+                        "theme": "Load test", "hosts": hosts, "dialog": dialog}}
+
+
+class RssSampler:
+    """Samples the resident set size of this process in a background thread"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+        self.thread = None
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # Without /proc fall back to the lifetime peak (KiB on Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while self.running:
+            self.peak = max(self.peak, self.rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.rss()
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.rss())
+
+
+def render_episode(podcast, base_url, concurrency, max_attempts):
+    """Render one episode with a cold segment cache; failed renders resume"""
+    work_dir = tempfile.mkdtemp(prefix="bench_audio_")
+    renderer = AudioRenderer("stub", os.path.join(work_dir, "segments"), concurrency, base_url)
+    output_path = os.path.join(work_dir, "episode.mp3")
+    attempts = 0
+    try:
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            while True:
+                attempts += 1
+                try:
+                    renderer.render(podcast, output_path)
+                    break
+                except Exception:
+                    if attempts >= max_attempts:
+                        raise
+            elapsed = time.perf_counter() - start
+        size = os.path.getsize(output_path)
+    finally:
+        renderer.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"seconds": elapsed, "peak_rss": rss.peak, "bytes": size, "attempts": attempts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=60, help="Dialog lines per episode")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3, help="Renders per concurrency level")
+    parser.add_argument("--base-url", help="Use a running TTS server instead of the in-process stub")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-per-char", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-attempts", type=int, default=10,
+                        help="Render attempts per episode when the server returns errors")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    server = None
+    if not base_url:
+        server, base_url = start_stub_server(
+            latency=args.latency, latency_per_char=args.latency_per_char,
+            error_rate=args.error_rate)
+
+    podcast = synthetic_podcast(args.lines)["podcast"]
+    print(f"Rendering {args.lines} lines against {base_url}")
+    print(f"{'concurrency':>11} {'seconds':>9} {'lines/s':>8} {'MB/s':>7} {'peak RSS MB':>12} {'attempts':>9}")
+    try:
+        for concurrency in args.concurrency:
+            results = [render_episode(podcast, base_url, concurrency, args.max_attempts)
+                       for _ in range(args.repeat)]
+            seconds = sorted(result["seconds"] for result in results)[len(results) // 2]
+            peak_rss = max(result["peak_rss"] for result in results)
+            size = results[0]["bytes"]
+            attempts = max(result["attempts"] for result in results)
+            print(f"{concurrency:>11} {seconds:>9.2f} {args.lines / seconds:>8.1f} "
+                  f"{size / seconds / 1e6:>7.2f} {peak_rss / 1e6:>12.1f} {attempts:>9}")
+    finally:
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
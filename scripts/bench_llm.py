@@ -0,0 +1,101 @@
+"""Load-test the LLM gateway against the local OpenAI stub
+
+Sends relevance checks, in the request format ArticleProcessor uses, from
+many threads through one LLMGateway and reports throughput, latency,
+retries, failures and where the adaptive concurrency limit settled. A stub
+server is started in-process unless --base-url points at a running one.
+
+    python scripts/bench_llm.py --requests 300 --threads 32 --rpm 600 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+from scripts.llm_stub_server import start_stub_server
+from utils.llm import LLMGateway
+
+
+def relevance_request(i):
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [{
+            "role": "system",
+            "content": "You are a relevance checker. "
+            "Determine if the article matches the given interests. "
+            "Respond with JSON in this format: "
+            "{'relevant': boolean, 'reason': string}"
+        }, {
+            "role": "user",
+            "content": f"Interest criteria:\nAI regulation\n\nArticle content:\nArticle {i}. " * 20
+        }],
+        "response_format": {"type": "json_object"}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32, help="Callers sending requests at once")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--initial-concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--base-url", help="Use a running OpenAI-compatible server instead of the in-process stub")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--tpm", type=int, default=0)
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    server = None
+    if not base_url:
+        server, base_url = start_stub_server(
+            latency=args.latency, error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate, rpm=args.rpm, tpm=args.tpm)
+
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", "stub"), base_url=base_url, max_retries=0)
+    gateway = LLMGateway(client, max_concurrency=args.max_concurrency,
+                         initial_concurrency=args.initial_concurrency,
+                         max_retries=args.max_retries)
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            gateway.create("relevance", **relevance_request(i))
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    print(f"Sending {args.requests} requests from {args.threads} threads to {base_url}")
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(call, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+        if server:
+            server.shutdown()
+
+    latencies = sorted(seconds for seconds, _ in results)
+    stats = gateway.stats()
+    stage = stats["stages"].get("relevance", {})
+    print(f"{'seconds':>9} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'retries':>8} "
+          f"{'failed':>7} {'tokens':>8} {'limit':>6}")
+    print(f"{elapsed:>9.2f} {args.requests / elapsed:>7.1f} "
+          f"{latencies[len(latencies) // 2]:>7.2f} {latencies[int(len(latencies) * 0.95)]:>7.2f} "
+          f"{stage.get('retries', 0):>8} {stage.get('failures', 0):>7} "
+          f"{stage.get('tokens', 0):>8} {stats['concurrency_limit']:>6}")
+    if server:
+        print(f"Stub served: {server.RequestHandlerClass.state.counts}")
+
+
+if __name__ == "__main__":
+    main()
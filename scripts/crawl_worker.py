@@ -0,0 +1,62 @@
+"""Standalone worker for the queue crawl engine
+
+Drains the crawl_tasks queue of the configured database alongside the
+workers of the server, so several processes or machines can share one
+crawl. Tasks are only queued by runs with crawl_engine set to "queue";
+between runs the worker polls for new tasks.
+
+    python scripts/crawl_worker.py --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.resources import get_storage
+from utils.scheduler import build_processor, save_articles
+from utils.work_queue import QueueWorker, drain_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker threads (default: the queue_workers setting)")
+    parser.add_argument("--poll-interval", type=float, default=10.0,
+                        help="Seconds between checks for new tasks when the queue is empty")
+    parser.add_argument("--once", action="store_true",
+                        help="Exit once the queue is empty instead of waiting for more tasks")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    try:
+        while True:
+            if storage.count_open_tasks():
+                interest_prompt = storage.get_setting("interest_prompt")
+                summary_prompt = storage.get_setting("summary_prompt")
+                # Built per burst of work so the known URLs and settings are fresh
+                processor = build_processor(storage, interest_prompt=interest_prompt)
+                workers = [
+                    QueueWorker(
+                        storage, processor, interest_prompt, summary_prompt,
+                        lambda articles: save_articles(storage, articles),
+                        lease_seconds=int(storage.get_setting("queue_lease_seconds", "300")),
+                        max_attempts=int(storage.get_setting("queue_max_attempts", "3")))
+                    for _ in range(args.workers or int(storage.get_setting("queue_workers", "8")))
+                ]
+                try:
+                    drain_queue(workers)
+                finally:
+                    processor.extraction_pool.shutdown()
+                print(f"Queue drained: {storage.get_queue_stats()}")
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        # Leases held by this process expire and are taken over by others
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Answers POST /v1/chat/completions with deterministic completions in the
+formats the pipeline asks for (relevance verdicts, batched verdicts,
+summaries, podcast scripts and newsletter text), together with OpenAI's
+rate limit headers, so crawls and newsletters can be run and load-tested
+without using OpenAI credits. Point the application at it with
+OPENAI_BASE_URL=http://127.0.0.1:8766/v1.
+
+    python scripts/llm_stub_server.py --port 8766 --latency 0.5 --rpm 600
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _verdict(text):
+    """A stable relevance verdict: about half of all articles are relevant"""
+    return _digest(text)[0] % 2 == 0
+
+
+def completion_content(messages):
+    """Content of the answer to a conversation, chosen by what the system prompt asks for"""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+
+    if "'results'" in system:
+        articles = re.split(r"\[Article (\d+)\]\n", user)[1:]
+        results = [{
+            "id": int(number),
+            "relevant": _verdict(text),
+            "reason": "Stub verdict"
+        } for number, text in zip(articles[0::2], articles[1::2])]
+        return json.dumps({"results": results})
+    if "'relevant'" in system:
+        return json.dumps({"relevant": _verdict(user), "reason": "Stub verdict"})
+    if "'title'" in system and "'summary'" in system:
+        words = re.findall(r"\w+", user.split("Article content:")[-1])
+        return json.dumps({
+            "title": " ".join(words[:8]) or "Stub article",
+            "summary": " ".join(words[:60]) or "Stub summary"
+        })
+    if "'podcast'" in system:
+        return json.dumps({"podcast": {
+            "title": "Stub podcast", "episode": "1", "theme": "Stub",
+            "hosts": [{"name": "Anna", "role": "Host", "bio": "Stub host"}],
+            "dialog": [{"speaker": "Anna", "text": "Välkommen till veckans avsnitt."}]
+        }})
+    return "# Stub newsletter\n\n" + user[:2000]
+
+
+class StubState:
+    """Stub behaviour, a one-minute request window and counters, shared by the handler threads"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, rpm=0,
+                 tpm=0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.window_tokens = 0
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0, "tokens": 0}
+
+    def admit(self, tokens):
+        """Roll for injected failures and charge the rate limit window
+
+        Returns (status, headers); status is None when the request may proceed.
+        """
+        with self.lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.window_requests = self.window_tokens = 0
+            reset = f"{60 - (now - self.window_start):.3f}s"
+            over = ((self.rpm and self.window_requests >= self.rpm)
+                    or (self.tpm and self.window_tokens + tokens > self.tpm))
+            roll = self.random.random()
+            if over or roll < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return 429, {"retry-after": str(max(1, round(60 - (now - self.window_start))))
+                             if over else "1"}
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return 500, {}
+            self.window_requests += 1
+            self.window_tokens += tokens
+            self.counts["tokens"] += tokens
+            headers = {}
+            if self.rpm:
+                headers.update({
+                    "x-ratelimit-limit-requests": str(self.rpm),
+                    "x-ratelimit-remaining-requests": str(self.rpm - self.window_requests),
+                    "x-ratelimit-reset-requests": reset,
+                })
+            if self.tpm:
+                headers.update({
+                    "x-ratelimit-limit-tokens": str(self.tpm),
+                    "x-ratelimit-remaining-tokens": str(max(0, self.tpm - self.window_tokens)),
+                    "x-ratelimit-reset-tokens": reset,
+                })
+            return None, headers
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = StubState()
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/chat/completions":
+            self.send_json(404, {"error": {"message": "Not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+            messages = request["messages"]
+        except (ValueError, KeyError):
+            self.send_json(400, {"error": {"message": "Expected a JSON body with messages"}})
+            return
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+        status, headers = self.state.admit(prompt_tokens)
+        if status == 429:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           headers)
+            return
+        if status:
+            self.send_json(status, {"error": {"message": "Stub error"}})
+            return
+
+        time.sleep(self.state.latency)
+        content = completion_content(messages)
+        completion_tokens = len(content) // 4 + 1
+        self.send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }, headers)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, **options):
+    handler = type("Handler", (StubHandler,), {"state": StubState(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_server(host="127.0.0.1", port=0, **options):
+    """Serve the stub in a background thread; returns (server, base_url)"""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of latency added to every successful response")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of requests answered with HTTP 429")
+    parser.add_argument("--rpm", type=int, default=0,
+                        help="Requests per minute before answering 429; 0 means unlimited")
+    parser.add_argument("--tpm", type=int, default=0,
+                        help="Prompt tokens per minute before answering 429; 0 means unlimited")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the error and rate limit draws")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, rpm=args.rpm, tpm=args.tpm, seed=args.seed)
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {server.RequestHandlerClass.state.counts}")
+
+
+if __name__ == "__main__":
+    main()
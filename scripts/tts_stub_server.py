@@ -0,0 +1,162 @@
+"""Local stand-in for the ElevenLabs text-to-speech API
+
+Answers POST /v1/text-to-speech/<voice_id> with deterministic MP3 frames
+whose count is proportional to the length of the text, so the audio pipeline
+can be load-tested without using ElevenLabs credits. Point the application
+at it with ELEVENLABS_BASE_URL=http://127.0.0.1:8765.
+
+    python scripts/tts_stub_server.py --port 8765 --latency 0.3 --error-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding, no CRC: 417 bytes and
+# 1152 samples (~26 ms) per frame
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x64])
+FRAME_SIZE = 417
+FRAME_SECONDS = 1152 / 44100
+# Roughly how fast the voices speak
+CHARACTERS_PER_SECOND = 15
+
+
+def mp3_frame_count(text):
+    return max(1, round(len(text) / CHARACTERS_PER_SECOND / FRAME_SECONDS))
+
+
+def mp3_frame(voice_id, text):
+    """One MP3 frame whose payload depends only on the voice and text"""
+    seed = hashlib.sha256(f"{voice_id}\n{text}".encode("utf-8")).digest()
+    payload_size = FRAME_SIZE - len(FRAME_HEADER)
+    payload = (seed * (payload_size // len(seed) + 1))[:payload_size]
+    return FRAME_HEADER + payload
+
+
+class StubState:
+    """Stub behaviour plus counters, shared by the request handler threads"""
+
+    def __init__(self, latency=0.0, latency_per_char=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, seed=0, chunk_frames=16):
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunk_frames = chunk_frames
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0, "bytes": 0}
+
+    def roll(self):
+        with self.lock:
+            self.counts["requests"] += 1
+            return self.random.random()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = StubState()
+
+    def do_POST(self):
+        prefix = "/v1/text-to-speech/"
+        if not self.path.startswith(prefix):
+            self.send_json(404, {"detail": "Not found"})
+            return
+        voice_id = self.path[len(prefix):].split("?")[0]
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            text = json.loads(self.rfile.read(length))["text"]
+        except (ValueError, KeyError):
+            self.send_json(400, {"detail": "Expected a JSON body with text"})
+            return
+
+        state = self.state
+        roll = state.roll()
+        if roll < state.rate_limit_rate:
+            state.count("rate_limited")
+            self.send_json(429, {"detail": "Too many requests"}, {"Retry-After": "1"})
+            return
+        if roll < state.rate_limit_rate + state.error_rate:
+            state.count("errors")
+            self.send_json(500, {"detail": "Stub error"})
+            return
+
+        time.sleep(state.latency + state.latency_per_char * len(text))
+
+        frame = mp3_frame(voice_id, text)
+        frames = mp3_frame_count(text)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(frames * len(frame)))
+        self.end_headers()
+        # Sent in chunks like a streaming synthesis response
+        for start in range(0, frames, state.chunk_frames):
+            self.wfile.write(frame * min(state.chunk_frames, frames - start))
+        state.count("bytes", frames * len(frame))
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, **options):
+    handler = type("Handler", (StubHandler,), {"state": StubState(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_server(host="127.0.0.1", port=0, **options):
+    """Serve the stub in a background thread; returns (server, base_url)"""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of latency added to every successful response")
+    parser.add_argument("--latency-per-char", type=float, default=0.0,
+                        help="Extra seconds of latency per character of text")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of requests answered with HTTP 429")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the error and rate limit draws")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, latency=args.latency, latency_per_char=args.latency_per_char,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    print(f"TTS stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {server.RequestHandlerClass.state.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,45 @@
 import os
-import requests
+import json
 from flask import Flask, jsonify, request, send_from_directory, Response
 from flask_cors import CORS
-from utils.storage import Storage
+from utils.resources import get_storage, update_pool_metrics
 from utils.article_processor import ArticleProcessor
-from utils.newsletter import NewsletterGenerator
-from utils.scheduler import start_scheduler, process_urls, generate_daily_newsletter
+from utils.scheduler import start_scheduler
+from utils.runs import METRICS, get_active_run
+from utils.coordinator import RunCoordinator
+from utils.audio import start_audio_job, get_audio_job
 import threading
+from collections import deque
 from datetime import datetime
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
 
 # Initialize components
-storage = Storage()
+storage = get_storage()
+coordinator = RunCoordinator(storage)
 processor = ArticleProcessor()
 
-# Queue for status messages
-status_messages = []
-status_lock = threading.Lock()
+# Ring buffer of the last 100 status messages, each with a sequence number
+# that clients use as a cursor to receive only newer messages
+status_messages = deque(maxlen=100)
+status_sequence = 0
+status_condition = threading.Condition()
 
 def add_status_message(message):
-    with status_lock:
+    global status_sequence
+    with status_condition:
+        status_sequence += 1
         status_messages.append({
+            "id": status_sequence,
             "message": message,
             "timestamp": datetime.now().isoformat()
         })
-        # Keep only last 100 messages
-        if len(status_messages) > 100:
-            status_messages.pop(0)
+        status_condition.notify_all()
+
+def get_status_messages(cursor=0):
+    """Buffered status messages newer than the cursor; call with status_condition held"""
+    return [m for m in status_messages if m["id"] > cursor]
 
 @app.route('/')
 def index():
@@ -53,163 +64,214 @@ def add_url():
         "message": "Invalid URL or already exists"
     })
 
+@app.route('/api/urls/schedule', methods=['GET'])
+def get_url_schedule():
+    schedule = storage.get_source_schedule()
+    for source in schedule:
+        for key in ('last_crawled_at', 'next_crawl_at'):
+            if source[key]:
+                source[key] = source[key].isoformat()
+    return jsonify(schedule)
+
 @app.route('/api/urls/<path:url>', methods=['DELETE'])
 def remove_url(url):
     storage.remove_url(url)
     return jsonify({"success": True})
 
+def encode_cursor(timestamp, row_id):
+    """Opaque keyset cursor for the row a page ended on"""
+    return f"{timestamp.isoformat()}_{row_id}"
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        timestamp, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        return None
+
+def page_limit(default):
+    return max(1, min(request.args.get('limit', default, type=int), 100))
+
 @app.route('/api/articles', methods=['GET'])
 def get_articles():
-    return jsonify(storage.get_recent_articles())
+    search = request.args.get('search', '')
+    limit = page_limit(20)
+    if search:
+        # Ranked search results page by offset rather than by key
+        offset = request.args.get('cursor', 0, type=int)
+        articles = storage.search_articles(search, limit + 1, offset)
+        next_cursor = str(offset + limit) if len(articles) > limit else None
+    else:
+        articles = storage.get_recent_articles(
+            limit + 1, decode_cursor(request.args.get('cursor')))
+        next_cursor = None
+        if len(articles) > limit:
+            last = articles[limit - 1]
+            next_cursor = encode_cursor(last['processed_date'], last['id'])
+    return jsonify({"articles": articles[:limit], "next_cursor": next_cursor})
 
 @app.route('/api/newsletters', methods=['GET'])
 def get_newsletters():
     search = request.args.get('search', '')
-    return jsonify(storage.get_newsletters(search if search else None))
+    limit = page_limit(10)
+    if search:
+        offset = request.args.get('cursor', 0, type=int)
+        newsletters = storage.search_newsletters(search, limit + 1, offset)
+        next_cursor = str(offset + limit) if len(newsletters) > limit else None
+    else:
+        newsletters = storage.get_newsletters(
+            limit + 1, decode_cursor(request.args.get('cursor')),
+            podcasts_only=request.args.get('podcasts') == 'true')
+        next_cursor = None
+        if len(newsletters) > limit:
+            last = newsletters[limit - 1]
+            next_cursor = encode_cursor(last['date'], last['id'])
+    return jsonify({"newsletters": newsletters[:limit], "next_cursor": next_cursor})
+
+@app.route('/api/newsletters/<int:newsletter_id>', methods=['GET'])
+def get_newsletter(newsletter_id):
+    newsletter = storage.get_newsletter(newsletter_id)
+    if not newsletter:
+        return jsonify({"error": "Newsletter not found"}), 404
+    return jsonify(newsletter)
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    with status_lock:
-        return jsonify(status_messages)
+    cursor = request.args.get('since', 0, type=int)
+    with status_condition:
+        return jsonify(get_status_messages(cursor))
+
+@app.route('/api/status/stream', methods=['GET'])
+def stream_status():
+    """Server-Sent Events stream of status messages
+
+    Starts after the Last-Event-ID header (sent by EventSource on reconnect)
+    or the since query parameter, and then pushes each new message once.
+    """
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0, type=int))
+    except ValueError:
+        # A malformed header replays the buffer instead of failing the stream
+        cursor = 0
+
+    def events():
+        nonlocal cursor
+        while True:
+            with status_condition:
+                if cursor > status_sequence:
+                    # The server restarted since the client's last event
+                    cursor = 0
+                messages = get_status_messages(cursor)
+                if not messages:
+                    status_condition.wait(timeout=15)
+                    messages = get_status_messages(cursor)
+            if not messages:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for message in messages:
+                cursor = message["id"]
+                yield f"id: {cursor}\ndata: {json.dumps(message)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/process', methods=['POST'])
 def start_processing():
     def status_callback(message):
         add_status_message(message)
 
-    # Start processing in a background thread
-    thread = threading.Thread(target=process_urls, args=(status_callback,))
-    thread.daemon = True
-    thread.start()
-
-    return jsonify({"success": True, "message": "Processing started"})
+    # Processing runs in a background thread; a request made while a run is
+    # in progress is coalesced into that run instead of starting another
+    run_id, started = coordinator.submit("manual", status_callback)
+    message = "Processing started" if started else "A run is already in progress"
+
+    return jsonify({"success": True, "message": message, "run_id": run_id, "started": started})
+
+@app.route('/api/runs', methods=['GET'])
+def get_runs():
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(storage.get_runs(limit))
+
+@app.route('/api/runs/<int:run_id>', methods=['GET'])
+def get_run(run_id):
+    # Running runs report live metrics, finished ones their persisted state
+    active = get_active_run(run_id)
+    if active:
+        return jsonify(active.to_dict())
+    run = storage.get_run(run_id)
+    if not run:
+        return jsonify({"error": "Run not found"}), 404
+    return jsonify(run)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    update_pool_metrics()
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
+    settings = storage.get_settings()
     return jsonify({
-        "interest_prompt": storage.get_setting("interest_prompt"),
-        "summary_prompt": storage.get_setting("summary_prompt"),
-        "newsletter_template": storage.get_setting("newsletter_template"),
-        "newsletter_time": storage.get_setting("newsletter_time"),
-        "create_podcast": storage.get_setting("create_podcast", "false"),
-        "podcast_studio_prompt": storage.get_setting("podcast_studio_prompt", "")
+        "interest_prompt": settings.get("interest_prompt", ""),
+        "summary_prompt": settings.get("summary_prompt", ""),
+        "newsletter_template": settings.get("newsletter_template", ""),
+        "newsletter_time": settings.get("newsletter_time", ""),
+        "create_podcast": settings.get("create_podcast", "false"),
+        "podcast_studio_prompt": settings.get("podcast_studio_prompt", "")
     })
 
 @app.route('/api/settings', methods=['POST'])
 def save_settings():
     settings = request.json
-    for key, value in settings.items():
-        storage.save_setting(key, str(value))
+    changed = storage.save_settings({key: str(value) for key, value in settings.items()})
 
-    # Restart scheduler with new settings
-    newsletter_time = settings.get('newsletter_time', '08:00')
-    start_scheduler(newsletter_time)
+    # Restart scheduler only when its schedule actually changed
+    if 'newsletter_time' in changed or 'crawl_schedule' in changed:
+        start_scheduler(storage.get_setting("newsletter_time", "08:00"), coordinator)
 
     return jsonify({"success": True})
 
-ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
+AUDIO_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'audio_segments')
 
-@app.route('/api/generate-audio', methods=['POST'])
-def generate_audio():
+@app.route('/api/newsletters/<int:newsletter_id>/audio', methods=['POST'])
+def generate_audio(newsletter_id):
     try:
-        podcast_index = request.json.get('podcast_index')
-        print(f"Generating audio for podcast index: {podcast_index}")
-
-        # Get the most recent newsletter with a podcast script
-        newsletters = storage.get_newsletters()
-        podcasts = [n for n in newsletters if n.get('podcast_script')]
-
-        print(f"Found {len(podcasts)} podcasts with scripts")
-
-        if podcast_index >= len(podcasts):
-            print(f"Podcast index {podcast_index} out of range")
+        newsletter = storage.get_newsletter(newsletter_id)
+        if not newsletter or not newsletter.get('podcast_script'):
+            print(f"No podcast script for newsletter {newsletter_id}")
             return jsonify({"error": "Podcast not found"}), 404
 
-        podcast = podcasts[podcast_index]['podcast_script']['podcast']
-        print(f"Processing podcast: {podcast['title']}")
-
-        # Create mapping of speaker names to voice IDs
-        voice_mapping = {host['name']: host['elevenlabs_voice_id'] for host in podcast['hosts']}
-
-        # Generate audio for each line of dialog
-        audio_parts = []
-        for i, line in enumerate(podcast['dialog']):
-            print(f"Generating audio for line {i+1}/{len(podcast['dialog'])}")
-            try:
-                # Get voice ID for the current speaker
-                voice_id = voice_mapping.get(line['speaker'])
-                if not voice_id:
-                    print(f"No voice ID found for speaker: {line['speaker']}")
-                    return jsonify({"error": f"No voice ID found for speaker: {line['speaker']}"}), 500
-
-                response = requests.post(
-                    f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
-                    headers={
-                        'xi-api-key': ELEVENLABS_API_KEY,
-                        'Content-Type': 'application/json'
-                    },
-                    json={
-                        'text': line['text'],
-                        'model_id': 'eleven_multilingual_v2',
-                        'voice_settings': {
-                            'stability': 0.5,
-                            'similarity_boost': 0.5
-                        }
-                    },
-                    stream=True
-                )
-
-                print(f"Elevenlabs API response status: {response.status_code}")
-                if response.status_code != 200:
-                    print(f"API Error response: {response.text}")
-                    return jsonify({"error": f"Failed to generate audio: {response.text}"}), 500
-
-                audio_parts.append(response.content)
-            except Exception as e:
-                print(f"Error generating audio for line {i+1}: {str(e)}")
-                return jsonify({"error": f"Error generating audio for line {i+1}: {str(e)}"}), 500
-
-        # Save the audio file
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        audio_filename = f'podcast_{timestamp}.mp3'
-        audio_path = os.path.join(app.static_folder, 'audio', audio_filename)
-
-        # Ensure audio directory exists
-        try:
-            os.makedirs(os.path.join(app.static_folder, 'audio'), exist_ok=True)
-            print(f"Created audio directory at {os.path.join(app.static_folder, 'audio')}")
-        except Exception as e:
-            print(f"Error creating audio directory: {str(e)}")
-            return jsonify({"error": f"Failed to create audio directory: {str(e)}"}), 500
-
-        try:
-            # Concatenate all audio parts
-            with open(audio_path, 'wb') as f:
-                for part in audio_parts:
-                    f.write(part)
-            print(f"Saved audio file to {audio_path}")
-
-            # Update newsletter with audio URL
-            podcasts[podcast_index]['audio_url'] = f'/static/audio/{audio_filename}'
-            storage.update_newsletter_audio(podcasts[podcast_index]['id'], f'/static/audio/{audio_filename}')
-
-        except Exception as e:
-            print(f"Error saving audio file: {str(e)}")
-            return jsonify({"error": f"Failed to save audio file: {str(e)}"}), 500
-
-        return jsonify({
-            "success": True,
-            "audio_url": f'/static/audio/{audio_filename}'
-        })
+        podcast = newsletter['podcast_script']['podcast']
+        print(f"Generating audio for podcast: {podcast['title']}")
+
+        # Rendering runs in the background; poll the job for progress
+        job = start_audio_job(
+            storage, newsletter_id, podcast,
+            audio_dir=os.path.join(app.static_folder, 'audio'),
+            cache_dir=AUDIO_CACHE_DIR,
+            concurrency=int(storage.get_setting("audio_concurrency", "4")))
+        return jsonify({"success": True, "job_id": job["id"], "job": job}), 202
 
     except Exception as e:
         print(f"Unexpected error in generate_audio: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/audio-jobs/<job_id>', methods=['GET'])
+def get_audio_job_status(job_id):
+    job = get_audio_job(job_id)
+    if not job:
+        return jsonify({"error": "Audio job not found"}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     # Start scheduler with initial settings
     newsletter_time = storage.get_setting("newsletter_time", "08:00")
-    start_scheduler(newsletter_time)
+    start_scheduler(newsletter_time, coordinator)
 
     # Run Flask app
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.llm_stub_server import start_stub_server
+from utils import resources
+
+
+class FakeStorage:
+    """In-memory stand-in for Storage with the methods a crawl uses"""
+
+    def __init__(self, urls=(), settings=None, clock_skew=timedelta(0)):
+        self.settings = {
+            "interest_prompt": "AI regulation",
+            "summary_prompt": "Summarize in two sentences",
+            "use_fetch_cache": "false",
+            "use_llm_cache": "false",
+            "use_near_duplicates": "false",
+            # The local news site needs no politeness delays
+            "crawl_host_rate": "1000",
+        }
+        self.settings.update(settings or {})
+        self.schedule = {
+            url: {"url": url, "crawl_interval": None, "change_rate": None,
+                  "last_crawled_at": None, "next_crawl_at": None}
+            for url in urls
+        }
+        self.articles = {}
+        self.rejected = {}
+        self.runs = {}
+        # How far the database clock is ahead of this process
+        self.clock_skew = clock_skew
+        # Advisory locks held, by this or another process
+        self.advisory_locks = set()
+        self.fetch_cache = {}
+        self.signatures = {}
+        self.duplicates = {}
+
+    def get_setting(self, key, default=None):
+        return self.settings.get(key, default)
+
+    def get_urls(self):
+        return list(self.schedule)
+
+    def get_seen_urls(self, prompt_hash):
+        return set(self.articles) | set(self.rejected)
+
+    def save_rejected_url(self, url, prompt_hash, reason):
+        self.rejected[url] = reason
+
+    def save_articles(self, articles):
+        inserted = {}
+        for article in articles:
+            if article["url"] not in self.articles:
+                self.articles[article["url"]] = article
+                inserted[article["url"]] = len(self.articles)
+        return inserted
+
+    def get_fetch_cache(self):
+        return dict(self.fetch_cache)
+
+    def save_fetch_cache(self, url, entry):
+        self.fetch_cache[url] = entry
+
+    def get_article_signatures(self, since):
+        return list(self.signatures.items())
+
+    def evict_article_signatures(self, before):
+        pass
+
+    def save_article_signature(self, url, signature, duplicates=()):
+        self.signatures[url] = signature
+        self.save_article_duplicates(url, duplicates)
+
+    def save_article_duplicates(self, url, duplicates):
+        for duplicate, similarity in duplicates:
+            self.duplicates.setdefault(duplicate, url)
+
+    def create_run(self, trigger, started_at):
+        run_id = len(self.runs) + 1
+        self.runs[run_id] = {"trigger": trigger, "status": "running"}
+        return run_id
+
+    def finish_run(self, run_id, status, error, finished_at, metrics):
+        self.runs[run_id].update(status=status, error=error, metrics=metrics)
+
+    def try_advisory_lock(self, key):
+        if key in self.advisory_locks:
+            return None
+        self.advisory_locks.add(key)
+        return object()
+
+    def release_advisory_lock(self, conn, key):
+        self.advisory_locks.discard(key)
+
+    def get_running_run_id(self):
+        return next((run_id for run_id, run in self.runs.items()
+                     if run["status"] == "running"), None)
+
+    def mark_interrupted_runs(self):
+        for run in self.runs.values():
+            if run["status"] == "running":
+                run["status"] = "interrupted"
+
+    def get_database_time(self):
+        return datetime.now() + self.clock_skew
+
+    def get_source_schedule(self):
+        return [dict(source) for source in self.schedule.values()]
+
+    def claim_due_sources(self, urls, lease_minutes):
+        now = self.get_database_time()
+        claimed = [url for url in urls if (self.schedule[url]["next_crawl_at"] or now) <= now]
+        for url in claimed:
+            self.schedule[url]["next_crawl_at"] = now + timedelta(minutes=lease_minutes)
+        return claimed
+
+    def update_source_schedule(self, url, crawl_interval, change_rate, next_crawl_minutes):
+        now = self.get_database_time()
+        self.schedule[url].update(crawl_interval=crawl_interval, change_rate=change_rate,
+                                  last_crawled_at=now,
+                                  next_crawl_at=now + timedelta(minutes=next_crawl_minutes))
+
+
+ARTICLE_TEXT = (
+    "<p>The European Parliament voted on new rules for artificial intelligence "
+    "systems on {n}. Lawmakers said the regulation sets obligations for "
+    "providers of high-risk systems and bans a number of practices.</p>"
+    "<p>Companies will have two years to comply. Critics argued that the rules "
+    "leave open questions about enforcement, while supporters called the vote "
+    "a milestone for technology regulation in Europe.</p>"
+)
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """A news site: /source links to /news/1 and /news/2, /feed to /news/1 to /news/8"""
+
+    def do_GET(self):
+        if self.path in ("/source", "/feed"):
+            count = 2 if self.path == "/source" else 8
+            links = " ".join(f"<a href='/news/{n}'>Article {n}</a>" for n in range(1, count + 1))
+            body = (
+                f"<html><body><div class='news'>{links}</div>"
+                f"<main class='content'>{ARTICLE_TEXT.format(n='Monday')}</main>"
+                "</body></html>")
+        elif self.path.startswith("/news/"):
+            body = (f"<html><body><article><h1>Article {self.path}</h1>"
+                    f"{ARTICLE_TEXT.format(n=self.path)}</article></body></html>")
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def news_site():
+    """Base URL of a local news site"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    """Point the shared OpenAI client and LLM gateway at the local stub"""
+    server, base_url = start_stub_server()
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setattr(resources, "_openai", None)
+    monkeypatch.setattr(resources, "_llm", None)
+    yield base_url
+    server.shutdown()
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import audio
+from utils.audio import AudioRenderer, get_audio_job
+
+
+def test_segment_path_rejects_unsafe_voice_ids(tmp_path):
+    renderer = AudioRenderer("key", str(tmp_path))
+    try:
+        path = renderer.segment_path("8N2ng9i2uiUWqstgmWlH", "Hej")
+        assert path.startswith(str(tmp_path))
+        for voice_id in ("../../etc/passwd", "a/b", ""):
+            with pytest.raises(Exception, match="Invalid voice ID"):
+                renderer.segment_path(voice_id, "Hej")
+    finally:
+        renderer.close()
+
+
+def test_finished_jobs_are_pruned_after_ttl(monkeypatch):
+    expired = (datetime.now() - audio.AUDIO_JOB_TTL - timedelta(minutes=1)).isoformat()
+    recent = datetime.now().isoformat()
+    jobs = {
+        "old": {"status": "completed", "finished_at": expired},
+        "failed": {"status": "failed", "finished_at": expired},
+        "recent": {"status": "completed", "finished_at": recent},
+        "running": {"status": "running", "finished_at": None},
+    }
+    monkeypatch.setattr(audio, "AUDIO_JOBS", jobs)
+
+    assert get_audio_job("old") is None
+    assert set(jobs) == {"recent", "running"}
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from utils import coordinator as coordinator_module
+from utils.coordinator import PIPELINE_LOCK_KEY, RunCoordinator
+
+from conftest import FakeStorage
+
+
+class FakePipeline:
+    """Stands in for process_urls; each run blocks until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Semaphore(0)
+        self.proceed = threading.Semaphore(0)
+
+    def __call__(self, status_callback=None, run=None, urls=None, newsletter=True):
+        self.calls.append((run.trigger, urls, newsletter))
+        self.started.release()
+        assert self.proceed.acquire(timeout=5)
+        run.finish("completed")
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(coordinator_module, "process_urls", pipeline)
+    return pipeline
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_requests_during_a_run_are_coalesced_into_one(pipeline):
+    storage = FakeStorage()
+    coordinator = RunCoordinator(storage)
+
+    run_id, started = coordinator.submit("manual")
+    assert started
+    assert pipeline.started.acquire(timeout=5)
+
+    assert coordinator.submit("adaptive", urls=["a"], newsletter=False) == (run_id, False)
+    assert coordinator.submit("adaptive", urls=["b"], newsletter=False) == (run_id, False)
+    pipeline.proceed.release()
+    assert pipeline.started.acquire(timeout=5)
+    pipeline.proceed.release()
+    wait_until(lambda: coordinator.current_run is None)
+
+    assert pipeline.calls == [("manual", None, True), ("adaptive", ["a", "b"], False)]
+    assert PIPELINE_LOCK_KEY not in storage.advisory_locks
+
+
+def test_request_is_queued_while_another_process_runs(pipeline):
+    storage = FakeStorage()
+    storage.advisory_locks.add(PIPELINE_LOCK_KEY)
+    storage.runs[7] = {"trigger": "scheduled", "status": "running"}
+    coordinator = RunCoordinator(storage, retry_seconds=0.05)
+
+    assert coordinator.submit("adaptive", urls=["a"], newsletter=False) == (7, False)
+    assert coordinator.submit("scheduled", urls=[]) == (7, False)
+    time.sleep(0.2)
+    assert pipeline.calls == []
+
+    # The other process finishes its run
+    storage.runs[7]["status"] = "completed"
+    storage.release_advisory_lock(None, PIPELINE_LOCK_KEY)
+    assert pipeline.started.acquire(timeout=5)
+    pipeline.proceed.release()
+    wait_until(lambda: coordinator.current_run is None)
+
+    assert pipeline.calls == [("scheduled", ["a"], True)]
+    assert not coordinator.waiting
@@ -0,0 +1,55 @@
+import asyncio
+
+from utils import scheduler
+from utils.article_processor import ArticleProcessor
+from utils.crawler import AsyncCrawler
+from utils.resources import new_async_openai
+from utils.runs import RunTracker
+
+from conftest import FakeStorage
+
+
+def test_async_engine_crawls_through_scheduler(monkeypatch, news_site, llm_stub):
+    source = f"{news_site}/source"
+    storage = FakeStorage(urls=[source])
+    monkeypatch.setattr(scheduler, "get_storage", lambda: storage)
+    run = RunTracker(storage, trigger="test")
+
+    scheduler.process_urls(engine="async", run=run, newsletter=False)
+
+    assert storage.runs[run.id]["status"] == "completed"
+    counts = run.sources[source]["counts"]
+    assert counts["candidates"] == 2
+    assert "errors" not in counts
+    # Every candidate got a verdict, and relevant ones were saved
+    assert counts.get("relevant", 0) + counts.get("irrelevant", 0) >= 2
+    assert len(storage.articles) == counts.get("relevant", 0)
+    # The crawl is recorded in the adaptive schedule
+    assert storage.schedule[source]["last_crawled_at"] is not None
+    assert storage.schedule[source]["next_crawl_at"] is not None
+
+
+def test_llm_calls_do_not_hold_the_fetch_budget(llm_stub):
+    processor = ArticleProcessor()
+    crawler = AsyncCrawler(processor, max_concurrency=1)
+    budget_held = []
+    acreate = processor.llm.acreate
+
+    async def recording_acreate(client, stage="llm", **request):
+        budget_held.append(crawler._budget.locked())
+        return await acreate(client, stage, **request)
+
+    processor.llm.acreate = recording_acreate
+
+    async def check():
+        crawler._budget = asyncio.Semaphore(1)
+        crawler.openai = new_async_openai()
+        try:
+            await crawler.check_relevance("An article", "AI regulation")
+            await crawler.check_relevance_batch(["First article", "Second article"],
+                                                "AI regulation")
+        finally:
+            await crawler.openai.close()
+
+    asyncio.run(check())
+    assert budget_held and not any(budget_held)
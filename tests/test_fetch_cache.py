@@ -0,0 +1,53 @@
+import pytest
+
+from utils import scheduler
+from utils.runs import RunTracker
+
+from conftest import FakeStorage
+
+
+def crawl(monkeypatch, storage, engine):
+    monkeypatch.setattr(scheduler, "get_storage", lambda: storage)
+    run = RunTracker(storage, trigger="test")
+    scheduler.process_urls(engine=engine, run=run, newsletter=False)
+    return run
+
+
+ENGINES = [(engine, batch_size) for engine in ("threads", "async") for batch_size in ("1", "10")]
+
+
+@pytest.mark.parametrize("engine,batch_size", ENGINES)
+def test_relevant_pages_are_remembered_once_saved(monkeypatch, news_site, llm_stub, engine,
+                                                  batch_size):
+    source = f"{news_site}/feed"
+    storage = FakeStorage(urls=[source], settings={
+        "use_fetch_cache": "true", "relevance_batch_size": batch_size})
+
+    crawl(monkeypatch, storage, engine)
+
+    # Some of the articles are relevant and saved, the others rejected
+    assert 0 < len(storage.articles) < 8
+    assert set(storage.articles) <= set(storage.fetch_cache)
+    assert source in storage.fetch_cache
+
+
+@pytest.mark.parametrize("engine,batch_size", ENGINES)
+def test_failed_save_keeps_relevant_pages_unremembered(monkeypatch, news_site, llm_stub, engine,
+                                                       batch_size):
+    source = f"{news_site}/feed"
+    storage = FakeStorage(urls=[source], settings={
+        "use_fetch_cache": "true", "relevance_batch_size": batch_size})
+    relevant = []
+
+    def failing_save(articles):
+        relevant.extend(article["url"] for article in articles)
+        raise Exception("Database is down")
+
+    monkeypatch.setattr(storage, "save_articles", failing_save)
+
+    with pytest.raises(Exception, match="Database is down"):
+        crawl(monkeypatch, storage, engine)
+
+    assert relevant
+    assert not set(relevant) & set(storage.fetch_cache)
+    assert source not in storage.fetch_cache
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from scripts.llm_stub_server import start_stub_server
+from utils.llm import AdaptiveLimiter, LLMGateway
+
+
+def test_async_waiter_is_woken_by_release_without_polling():
+    limiter = AdaptiveLimiter(initial=1, maximum=1)
+    limiter.acquire()
+    checks = []
+    wait_time = limiter._wait_time
+
+    def counting_wait_time():
+        checks.append(1)
+        return wait_time()
+
+    limiter._wait_time = counting_wait_time
+    threading.Timer(0.3, limiter.release).start()
+
+    async def acquire():
+        start = time.monotonic()
+        await limiter.acquire_async()
+        return time.monotonic() - start
+
+    waited = asyncio.run(acquire())
+
+    assert 0.25 < waited < 0.5
+    # Checked once before waiting and once after being woken
+    assert len(checks) == 2
+    assert limiter.in_flight == 1
+
+
+def rate_limit_headers(limit, remaining, reset="2s"):
+    return {"x-ratelimit-limit-requests": str(limit),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": reset}
+
+
+def test_limit_grows_after_a_full_window_of_successes():
+    limiter = AdaptiveLimiter(initial=2, maximum=3)
+
+    limiter.on_success(rate_limit_headers(100, 90))
+    assert limiter.limit == 2
+    limiter.on_success(rate_limit_headers(100, 89))
+    assert limiter.limit == 3
+
+    for _ in range(10):
+        limiter.on_success({})
+    assert limiter.limit == 3
+
+
+def test_limit_shrinks_when_headroom_runs_low_and_pauses_until_reset():
+    limiter = AdaptiveLimiter(initial=8)
+
+    limiter.on_success(rate_limit_headers(100, 5))
+    assert limiter.limit == 6
+    assert limiter._wait_time() == 0
+
+    limiter.on_success(rate_limit_headers(100, 0, reset="2s"))
+    assert limiter.limit == 4
+    assert limiter._wait_time() == pytest.approx(2, abs=0.1)
+
+
+def test_rate_limit_halves_the_limit_down_to_the_minimum():
+    limiter = AdaptiveLimiter(initial=4, minimum=1)
+
+    limiter.on_rate_limited(0.5)
+    assert limiter.limit == 2
+    assert limiter._wait_time() == pytest.approx(0.5, abs=0.1)
+    limiter.on_rate_limited(0)
+    limiter.on_rate_limited(0)
+    assert limiter.limit == 1
+
+
+def test_blocked_thread_is_woken_when_the_limit_grows():
+    limiter = AdaptiveLimiter(initial=1, maximum=2)
+    limiter.acquire()
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limiter.acquire(), acquired.set()), daemon=True).start()
+
+    assert not acquired.wait(0.1)
+    limiter.on_success({})
+    assert acquired.wait(1)
+    assert limiter.in_flight == 2
+
+
+class FakeRaw:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+    def parse(self):
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=10))
+
+
+def api_error(error_class, status_code, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return error_class("Stub error", response=response, body=None)
+
+
+class FakeClient:
+    """OpenAI client whose completions answer from a list of outcomes, in order"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self.create)))
+
+    def create(self, **request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_gateway_retries_after_the_servers_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    client = FakeClient([
+        api_error(openai.RateLimitError, 429, {"retry-after-ms": "1500"}),
+        api_error(openai.InternalServerError, 500, {"retry-after": "2"}),
+        FakeRaw(),
+    ])
+    gateway = LLMGateway(client, initial_concurrency=4)
+
+    gateway.create("summarize", model="stub", messages=[])
+
+    assert sleeps == [1.5, 2.0]
+    assert gateway.limiter.limit == 2
+    assert gateway.limiter.in_flight == 0
+    stats = gateway.stats()["stages"]["summarize"]
+    assert (stats["requests"], stats["retries"], stats["failures"], stats["tokens"]) == (1, 2, 0, 10)
+
+
+def test_gateway_backs_off_with_capped_jitter_and_gives_up(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    client = FakeClient([api_error(openai.InternalServerError, 500) for _ in range(4)])
+    gateway = LLMGateway(client, max_retries=3, max_backoff=3)
+
+    with pytest.raises(openai.InternalServerError):
+        gateway.create("relevance", model="stub", messages=[])
+
+    assert client.calls == 4
+    assert [0 <= delay <= cap for delay, cap in zip(sleeps, (1, 2, 3))] == [True] * 3
+    assert gateway.stats()["stages"]["relevance"]["failures"] == 1
+
+
+def test_gateway_does_not_retry_final_errors():
+    client = FakeClient([api_error(openai.BadRequestError, 400)])
+    gateway = LLMGateway(client)
+
+    with pytest.raises(openai.BadRequestError):
+        gateway.create("relevance", model="stub", messages=[])
+
+    assert client.calls == 1
+    assert gateway.limiter.in_flight == 0
+
+
+def test_gateway_retries_stub_server_errors_sync_and_async():
+    server, base_url = start_stub_server(error_rate=0.5, seed=1)
+    try:
+        options = {"api_key": "stub", "base_url": base_url, "max_retries": 0}
+        gateway = LLMGateway(openai.OpenAI(**options), max_retries=20, max_backoff=0.01)
+        request = {"model": "stub", "messages": [{"role": "user", "content": "Hello"}]}
+        for _ in range(5):
+            gateway.create("newsletter", **request)
+
+        async def create_all():
+            client = openai.AsyncOpenAI(**options)
+            await asyncio.gather(*(gateway.acreate(client, "newsletter", **request)
+                                   for _ in range(5)))
+
+        asyncio.run(create_all())
+    finally:
+        server.shutdown()
+
+    counts = server.RequestHandlerClass.state.counts
+    stats = gateway.stats()["stages"]["newsletter"]
+    assert counts["errors"] > 0
+    assert stats["requests"] == 10
+    assert stats["retries"] == counts["errors"]
+    assert gateway.limiter.in_flight == 0
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.article_processor import ArticleProcessor
+from utils.fetch_cache import FetchCache
+from utils.near_duplicates import NearDuplicateIndex
+
+from conftest import ARTICLE_TEXT, FakeStorage
+
+ORIGINAL = "https://one.example/story"
+DUPLICATE = "https://two.example/story"
+
+
+def make_processor(storage):
+    fetch_cache = FetchCache(storage)
+    processor = ArticleProcessor(fetch_cache=fetch_cache,
+                                 near_duplicates=NearDuplicateIndex(storage))
+    text = ARTICLE_TEXT.format(n="Monday")
+    for url in (ORIGINAL, DUPLICATE):
+        fetch_cache.remember(url, {}, text.encode("utf-8"))
+    assert not processor._is_near_duplicate(ORIGINAL, text)
+    assert processor._is_near_duplicate(DUPLICATE, text)
+    # Nothing is remembered while the original is still being processed
+    assert storage.fetch_cache == {}
+    return processor
+
+
+def test_duplicate_is_remembered_with_its_kept_original(llm_stub):
+    storage = FakeStorage()
+    processor = make_processor(storage)
+
+    processor._settle_near_duplicate(ORIGINAL, True)
+
+    assert storage.duplicates == {DUPLICATE: ORIGINAL}
+    assert DUPLICATE in storage.fetch_cache
+
+
+def test_duplicates_of_released_original_are_checked_again(llm_stub):
+    storage = FakeStorage()
+    processor = make_processor(storage)
+
+    processor._settle_near_duplicate(ORIGINAL, False)
+
+    assert storage.duplicates == {}
+    assert storage.fetch_cache == {}
+    assert not processor.fetch_cache.has(DUPLICATE)
+
+
+def test_batched_status_reports_duplicates_apart_from_prefilter(llm_stub, monkeypatch):
+    storage = FakeStorage()
+    processor = ArticleProcessor(near_duplicates=NearDuplicateIndex(storage))
+    text = ARTICLE_TEXT.format(n="Monday")
+    monkeypatch.setattr(processor, "_fetch_candidate", lambda url, source=None: text)
+    messages = []
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = processor._process_links_batched(
+            [ORIGINAL, DUPLICATE], "AI regulation", "Summarize", executor, messages.append)
+        for future in futures:
+            future.result()
+
+    assert "Hoppade över 1 nära dubbletter av 2 artiklar" in messages
+    assert not any(message.startswith("Förfiltret") for message in messages)
@@ -0,0 +1,36 @@
+from utils.newsletter import NewsletterGenerator
+
+
+def make_articles(count):
+    return [{
+        "title": f"Story {n} about topic {n % 7}",
+        "summary": f"Summary {n} of topic {n % 7}. " * 20,
+        "url": f"https://example.com/{n}",
+    } for n in range(count)]
+
+
+def test_sections_are_merged_until_they_fit_the_budget(llm_stub, monkeypatch):
+    generator = NewsletterGenerator(mode="map_reduce", cluster_size=2, section_budget=3000)
+    prompts = []
+    complete = generator._complete
+
+    def recording_complete(system_prompt, user_prompt):
+        prompts.append((system_prompt, user_prompt))
+        return complete(system_prompt, user_prompt)
+
+    monkeypatch.setattr(generator, "_complete", recording_complete)
+    podcast_sources = []
+    monkeypatch.setattr(generator.podcast_gen, "generate_podcast_script",
+                        lambda articles, prompt, sections: podcast_sources.append(sections))
+
+    result = generator.generate_newsletter(make_articles(40), "# Template",
+                                           create_podcast=True, podcast_prompt="Talk")
+
+    assert result["content"]
+    merges = [user for system, user in prompts if "Merge the provided" in system]
+    assert merges
+    assembly = [user for system, user in prompts if "provided template" in system]
+    assert len(assembly) == 1
+    sections = assembly[0].split("Sections:\n", 1)[1]
+    assert len(sections) <= 3000
+    assert "\n\n".join(podcast_sources[0]) == sections
@@ -0,0 +1,161 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from utils import resources
+from utils.politeness import ROBOTS_ERROR_TTL, HostPolicy, TokenBucket, parse_retry_after
+from utils.scheduler import build_processor
+
+from conftest import FakeStorage
+
+
+def test_parse_retry_after_reads_seconds_and_http_dates():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert parse_retry_after(in_a_minute) == pytest.approx(60, abs=2)
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_host_policy_outlives_a_run(monkeypatch, llm_stub):
+    monkeypatch.setattr(resources, "_host_policy", None)
+    storage = FakeStorage()
+    first = build_processor(storage).host_policy
+    first.set_robots("https://example.com/a", 200, "User-agent: *\nDisallow: /private")
+
+    second = build_processor(storage).host_policy
+    assert second is first
+    assert not second.needs_robots("https://example.com/b")
+    assert not second.can_fetch("https://example.com/private/page")
+
+    # Changed settings apply, and start the hosts afresh
+    storage.settings["crawl_host_rate"] = "1"
+    third = build_processor(storage).host_policy
+    assert third is first and third.rate == 1.0
+    assert third.needs_robots("https://example.com/b")
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """requests session answering each URL from a list of responses, in order"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(url)
+        response = self.responses[url].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_token_bucket_allows_a_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    now = bucket.updated
+
+    assert [bucket.reserve(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(now) == pytest.approx(0.5)
+    assert bucket.reserve(now) == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_up_to_its_burst():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    now = bucket.updated
+    for _ in range(3):
+        bucket.reserve(now)
+
+    assert bucket.reserve(now + 0.5) == 0.0
+    # An idle hour still only saves up one burst
+    later = now + 3600
+    assert [bucket.reserve(later) for _ in range(4)] == [0.0, 0.0, 0.0, pytest.approx(0.5)]
+
+
+@pytest.mark.parametrize("status_code, ttl", [
+    (200, 86400),
+    (404, 86400),
+    (500, ROBOTS_ERROR_TTL),
+    (503, ROBOTS_ERROR_TTL),
+    (None, ROBOTS_ERROR_TTL),
+])
+def test_robots_is_cached_for_its_ttl(status_code, ttl):
+    policy = HostPolicy("TestBot", robots_ttl=86400)
+    url = "https://example.com/private/page"
+
+    policy.set_robots(url, status_code, "User-agent: *\nDisallow: /private")
+
+    expires = policy.state(url).robots_expires - time.monotonic()
+    assert expires == pytest.approx(ttl, abs=5)
+    assert not policy.needs_robots(url)
+    # Only a robots.txt that was actually served can disallow anything
+    assert policy.can_fetch(url) == (status_code != 200)
+
+    policy.state(url).robots_expires = time.monotonic() - 1
+    assert policy.needs_robots(url)
+
+
+def test_robots_crawl_delay_slows_the_host_down():
+    policy = HostPolicy("TestBot", rate=2.0, burst=4)
+    url = "https://example.com/"
+
+    policy.set_robots(url, 200, "User-agent: *\nCrawl-delay: 10")
+    assert policy.state(url).bucket.rate == pytest.approx(0.1)
+    assert policy.state(url).bucket.burst == 1
+
+    policy.set_robots(url, 503, "")
+    assert policy.state(url).bucket.rate == 2.0
+    assert policy.state(url).bucket.burst == 4
+
+
+def test_unreachable_robots_allows_fetching_and_is_asked_again():
+    policy = HostPolicy("TestBot", rate=1000)
+    url = "https://example.com/page"
+    session = FakeSession({
+        policy.robots_url(url): [FakeResponse(500), ConnectionError("refused")],
+        url: [FakeResponse(200, "first"), FakeResponse(200, "second")],
+    })
+
+    assert policy.get(session, url).text == "first"
+    policy.state(url).robots_expires = time.monotonic() - 1
+    assert policy.get(session, url).text == "second"
+
+    assert session.requests == [policy.robots_url(url), url, policy.robots_url(url), url]
+
+
+def test_retry_statuses_block_the_host_until_retry_after():
+    policy = HostPolicy("TestBot", rate=1000, max_retries=2)
+    url = "https://example.com/page"
+
+    assert policy.retry_delay(url, 500, {}, 0) is None
+    assert policy.retry_delay(url, 429, {"Retry-After": "30"}, 0) == 30
+    assert policy.wait_time(url) == pytest.approx(30, abs=1)
+    assert policy.wait_time("https://other.example/") == 0
+
+    assert policy.retry_delay(url, 503, {"Retry-After": "500"}, 1) == policy.max_backoff
+    assert policy.retry_delay(url, 503, {}, 2) is None
+
+
+def test_get_retries_503_then_returns_the_final_response():
+    policy = HostPolicy("TestBot", rate=1000, respect_robots=False, max_retries=2)
+    url = "https://example.com/page"
+    session = FakeSession({url: [
+        FakeResponse(503, headers={"Retry-After": "0"}),
+        FakeResponse(429, headers={"Retry-After": "0"}),
+        FakeResponse(503, headers={"Retry-After": "0"}),
+    ]})
+
+    assert policy.get(session, url).status_code == 503
+    assert len(session.requests) == 3
@@ -0,0 +1,46 @@
+from utils.prefilter import KeywordPrefilter
+from utils.scheduler import build_processor
+
+from conftest import ARTICLE_TEXT, FakeStorage
+
+INTEREST_PROMPT = "AI regulation and artificial intelligence law\nExclude: sports"
+ON_TOPIC = ARTICLE_TEXT.format(n="Monday")
+OFF_TOPIC = ("<p>The home team won the cup final after extra time. Fans celebrated "
+             "in the streets until late in the evening.</p>")
+
+
+def test_threshold_separates_on_and_off_topic_articles():
+    prefilter = KeywordPrefilter(INTEREST_PROMPT, threshold=0.2)
+
+    assert prefilter.score(OFF_TOPIC) == 0
+    assert prefilter.score(ON_TOPIC) >= 0.2
+    assert prefilter.accepts(ON_TOPIC)
+    assert not prefilter.accepts(OFF_TOPIC)
+
+
+def test_threshold_is_inclusive():
+    score = KeywordPrefilter(INTEREST_PROMPT, threshold=0).score(ON_TOPIC)
+
+    assert KeywordPrefilter(INTEREST_PROMPT, threshold=score).accepts(ON_TOPIC)
+    assert not KeywordPrefilter(INTEREST_PROMPT, threshold=score + 0.01).accepts(ON_TOPIC)
+
+
+def test_excluded_terms_do_not_count():
+    prefilter = KeywordPrefilter(INTEREST_PROMPT, threshold=0.1)
+
+    assert not prefilter.accepts("<p>Sports sports sports.</p>")
+
+
+def test_prompt_without_terms_accepts_everything():
+    assert KeywordPrefilter("news about all topics", threshold=1).accepts(OFF_TOPIC)
+
+
+def test_zero_threshold_disables_the_prefilter(llm_stub):
+    assert build_processor(FakeStorage()).prefilter is None
+
+    processor = build_processor(FakeStorage(settings={"prefilter_threshold": "0.2"}),
+                                interest_prompt=INTEREST_PROMPT)
+    assert processor.prefilter.threshold == 0.2
+    assert processor._passes_prefilter(ON_TOPIC)
+    assert not processor._passes_prefilter(OFF_TOPIC)
+    assert processor.prefilter_stats == {"checked": 2, "rejected": 1}
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from scripts import llm_stub_server
+from utils.article_processor import ArticleProcessor
+
+from conftest import ARTICLE_TEXT
+
+CONTENTS = [ARTICLE_TEXT.format(n=n) for n in range(4)]
+
+
+def answer(*items):
+    return json.dumps({"results": [
+        {"id": position, "relevant": relevant, "reason": "why"}
+        for position, relevant in items]})
+
+
+def test_batch_answer_in_any_order_is_accepted(llm_stub):
+    processor = ArticleProcessor()
+
+    verdicts = processor._parse_batch_relevance(answer((2, True), (0, False), (1, True)), 3)
+
+    assert verdicts == {0: (False, "why"), 1: (True, "why"), 2: (True, "why")}
+
+
+@pytest.mark.parametrize("content", [
+    # Ids counted from one shift every verdict onto the next article
+    answer((1, True), (2, False), (3, True)),
+    answer((0, True), (0, False), (1, True)),
+    answer((0, True), (1, False)),
+    answer((0, True), (1, False), (2, True), (3, True)),
+    json.dumps({"results": [{"id": 0, "relevant": "yes"}, {"id": 1, "relevant": True},
+                            {"id": 2, "relevant": True}]}),
+    "not json",
+])
+def test_batch_answer_not_matching_the_articles_is_rejected(llm_stub, content):
+    processor = ArticleProcessor()
+
+    assert processor._parse_batch_relevance(content, 3) == {}
+
+
+def test_off_by_one_batch_falls_back_to_single_checks(llm_stub, monkeypatch):
+    completion_content = llm_stub_server.completion_content
+
+    def shifted(messages):
+        content = completion_content(messages)
+        if "'results'" not in messages[0]["content"]:
+            return content
+        results = json.loads(content)["results"]
+        for item in results:
+            item["id"] += 1
+            item["relevant"] = not item["relevant"]
+        return json.dumps({"results": results})
+
+    expected = ArticleProcessor().check_relevance_batch(CONTENTS, "AI regulation")
+    monkeypatch.setattr(llm_stub_server, "completion_content", shifted)
+    processor = ArticleProcessor(relevance_batch_size=len(CONTENTS))
+
+    assert processor.check_relevance_batch(CONTENTS, "AI regulation") == expected
@@ -0,0 +1,35 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+from utils import resources
+
+from conftest import FakeStorage
+
+
+@pytest.fixture
+def server(monkeypatch, llm_stub):
+    monkeypatch.setattr(resources, "_storage", FakeStorage())
+    sys.modules.pop("server", None)
+    yield importlib.import_module("server")
+    sys.modules.pop("server", None)
+
+
+@pytest.mark.parametrize("last_event_id", ["garbage", "1"])
+def test_status_stream_replays_after_last_event_id(server, last_event_id):
+    server.add_status_message("first")
+    server.add_status_message("second")
+
+    response = server.app.test_client().get(
+        "/api/status/stream", headers={"Last-Event-ID": last_event_id})
+    try:
+        assert response.status_code == 200
+        event = next(response.response).decode("utf-8")
+    finally:
+        response.close()
+
+    # A malformed ID starts from the beginning of the buffer
+    expected = "first" if last_event_id == "garbage" else "second"
+    assert json.loads(event.split("data: ", 1)[1])["message"] == expected
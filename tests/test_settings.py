@@ -0,0 +1,151 @@
+import pytest
+
+from utils import storage as storage_module
+from utils.storage import Storage
+
+
+class SettingsDatabase:
+    """The app_settings tables of one database, shared by every Storage using it"""
+
+    def __init__(self):
+        self.settings = {}
+        self.version = 0
+        self.queries = []
+
+
+class SettingsCursor:
+    def __init__(self, database):
+        self.database = database
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.database.queries.append(query)
+        if query.startswith("SELECT version FROM app_settings_version"):
+            self.result = [(self.database.version,)]
+        elif query.startswith("SELECT key, value FROM app_settings"):
+            self.result = list(self.database.settings.items())
+        elif query.startswith("UPDATE app_settings_version"):
+            self.database.version += 1
+            self.result = [(self.database.version,)]
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class SettingsConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return SettingsCursor(self.database)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class SettingsPool:
+    def __init__(self, database):
+        self.database = database
+
+    def getconn(self):
+        return SettingsConnection(self.database)
+
+    def putconn(self, conn):
+        pass
+
+
+def upsert_settings(cur, query, rows, page_size=None, fetch=False):
+    """execute_values for the settings upsert: write rows whose value changed"""
+    changed = [(key,) for key, value in rows if cur.database.settings.get(key) != value]
+    cur.database.settings.update(rows)
+    return changed
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = SettingsDatabase()
+    monkeypatch.setattr(Storage, "create_tables", lambda self: None)
+    monkeypatch.setattr(storage_module, "execute_values", upsert_settings)
+    monkeypatch.setattr(storage_module, "ThreadedConnectionPool",
+                        lambda **kwargs: SettingsPool(database))
+    return database
+
+
+def test_snapshot_is_served_from_memory_within_the_ttl(database):
+    database.settings = {"interest_prompt": "AI"}
+    storage = Storage(settings_ttl=60)
+
+    assert storage.get_setting("interest_prompt") == "AI"
+    queries = len(database.queries)
+    for _ in range(10):
+        assert storage.get_setting("interest_prompt") == "AI"
+        assert storage.get_setting("missing", "default") == "default"
+
+    assert len(database.queries) == queries
+
+
+def test_unchanged_version_is_not_reloaded(database):
+    database.settings = {"interest_prompt": "AI"}
+    storage = Storage(settings_ttl=0)
+    storage.get_settings()
+    database.queries.clear()
+
+    storage.get_settings()
+
+    assert database.queries == ["SELECT version FROM app_settings_version"]
+
+
+def test_own_write_is_visible_at_once(database):
+    database.settings = {"interest_prompt": "AI"}
+    storage = Storage(settings_ttl=60)
+    storage.get_settings()
+
+    assert storage.save_settings({"interest_prompt": "Climate", "summary_prompt": "Short"}) == {
+        "interest_prompt", "summary_prompt"}
+    assert storage.save_settings({"interest_prompt": "Climate"}) == set()
+    assert database.version == 1
+    database.queries.clear()
+
+    assert storage.get_setting("interest_prompt") == "Climate"
+    assert storage.get_setting("summary_prompt") == "Short"
+    assert database.queries == []
+
+
+def test_write_from_another_process_is_picked_up_after_the_ttl(database):
+    database.settings = {"interest_prompt": "AI"}
+    storage = Storage(settings_ttl=60)
+    other = Storage(settings_ttl=60)
+    storage.get_settings()
+
+    other.save_setting("interest_prompt", "Climate")
+    assert storage.get_setting("interest_prompt") == "AI"
+
+    storage.settings_checked_at = float("-inf")
+    assert storage.get_setting("interest_prompt") == "Climate"
+
+
+def test_write_after_one_from_another_process_reloads_the_snapshot(database):
+    database.settings = {"interest_prompt": "AI", "summary_prompt": "Long"}
+    storage = Storage(settings_ttl=60)
+    other = Storage(settings_ttl=60)
+    storage.get_settings()
+
+    other.save_setting("summary_prompt", "Short")
+    storage.save_setting("interest_prompt", "Climate")
+
+    assert storage.get_settings() == {"interest_prompt": "Climate", "summary_prompt": "Short"}
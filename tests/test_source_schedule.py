@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+import pytest
+
+from utils.source_schedule import SourceScheduler, record_source_crawls
+
+from conftest import FakeStorage
+
+SOURCE = "https://example.com/news"
+
+
+class FakeCoordinator:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, trigger, **options):
+        self.submitted.append(options["urls"])
+
+
+class FakeRun:
+    def __init__(self, counts):
+        self.sources = {SOURCE: {"counts": counts}}
+
+
+@pytest.mark.parametrize("skew", [timedelta(hours=-8), timedelta(hours=8)])
+def test_schedule_follows_the_database_clock(skew):
+    storage = FakeStorage(urls=[SOURCE], clock_skew=skew)
+    coordinator = FakeCoordinator()
+    scheduler = SourceScheduler(storage, coordinator)
+
+    record_source_crawls(storage, FakeRun({"candidates": 3}), [SOURCE], 30, 1440)
+    source = storage.schedule[SOURCE]
+    assert source["last_crawled_at"] == pytest.approx(storage.get_database_time(),
+                                                      abs=timedelta(seconds=5))
+    scheduler.refresh()
+    scheduler.run_due()
+    assert coordinator.submitted == []
+
+    source["next_crawl_at"] = storage.get_database_time() - timedelta(minutes=1)
+    scheduler.refresh()
+    assert scheduler.seconds_until_due() == 1
+    assert scheduler.run_due() == [SOURCE]
+    assert coordinator.submitted == [[SOURCE]]
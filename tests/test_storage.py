@@ -0,0 +1,34 @@
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+
+@pytest.fixture
+def storage():
+    from utils.storage import Storage
+    storage = Storage(max_connections=2)
+    yield storage
+    storage.close()
+
+
+def test_source_saved_as_article_is_enqueued_again(storage):
+    source = f"https://example.com/{uuid.uuid4()}"
+    article = f"{source}/article"
+    storage.save_articles([
+        {"url": url, "title": "Title", "summary": "Summary", "content": "Content",
+         "processed_date": datetime.now()}
+        for url in (source, article)
+    ])
+
+    try:
+        assert storage.enqueue_tasks(None, "source", [source], source=source) == 1
+        assert storage.enqueue_tasks(None, "article", [article], source=source) == 0
+    finally:
+        with storage.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM crawl_tasks WHERE source = %s", (source,))
+                cur.execute("DELETE FROM news_articles WHERE url IN (%s, %s)", (source, article))
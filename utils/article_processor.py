@@ -1,22 +1,45 @@
-import trafilatura
-from openai import OpenAI
-import os
+import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 import json
-from urllib.parse import urljoin, urlparse
 import re
-from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from queue import Queue
 from threading import Lock
+from utils.extraction import ExtractionPool
+from utils.politeness import USER_AGENT
+from utils.runs import NullRun
+from utils.resources import get_llm
 
 class ArticleProcessor:
-    def __init__(self):
+    def __init__(self, fetch_cache=None, seen_urls=None, llm_cache=None, prefilter=None,
+                 extraction_pool=None, run=None, relevance_batch_size=1,
+                 relevance_batch_tokens=12000, near_duplicates=None, host_policy=None):
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm = get_llm()
         self.status_queue = Queue()
         self.status_lock = Lock()
+        self.fetch_cache = fetch_cache
+        self.seen_urls = seen_urls
+        self.llm_cache = llm_cache
+        self.prefilter = prefilter
+        self.prefilter_stats = {"checked": 0, "rejected": 0}
+        self.near_duplicates = near_duplicates
+        # New links of each crawled source page, whose fetch-cache entry is
+        # committed by commit_saved once all of them went through
+        self.source_links = {}
+        self.host_policy = host_policy
+        self.extraction_pool = extraction_pool or ExtractionPool()
+        self.run = run or NullRun()
+        self.relevance_batch_size = relevance_batch_size
+        self.relevance_batch_tokens = relevance_batch_tokens
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        # Keep-alive pools for up to 100 hosts, so connections to a source
+        # are reused across its articles instead of evicted by other hosts
+        self.session.mount("http://", HTTPAdapter(pool_connections=100, pool_maxsize=10))
+        self.session.mount("https://", HTTPAdapter(pool_connections=100, pool_maxsize=10))
 
     def _update_status(self, message, status_callback=None):
         """Thread-safe status update"""
@@ -29,148 +52,401 @@ class ArticleProcessor:
                     # Ignore status update errors in threads
                     pass
 
-    def fetch_article(self, url):
-        """Fetch and extract content from a URL"""
+    def download(self, url):
+        """Download a URL, returning None when it is unchanged since the last run"""
+        headers = self.fetch_cache.request_headers(url) if self.fetch_cache else {}
+        with self.run.stage("fetch"):
+            if self.host_policy:
+                response = self.host_policy.get(self.session, url, headers=headers, timeout=30)
+            else:
+                response = self.session.get(url, headers=headers, timeout=30)
+        if self.fetch_cache and self.fetch_cache.is_unchanged(
+                url, response.status_code, response.content):
+            return None
+        response.raise_for_status()
+        if self.fetch_cache:
+            self.fetch_cache.remember(url, response.headers, response.content)
+        return response.content
+
+    def fetch_article(self, url, discover_links=True):
+        """Fetch and extract content from a URL
+
+        Article links are only extracted when discover_links is set, which is
+        the case for source pages. Returns (None, []) when the page is
+        unchanged since it was last processed.
+        """
         try:
-            downloaded = trafilatura.fetch_url(url)
+            downloaded = self.download(url)
+            if downloaded is None:
+                return None, []
             if not downloaded:
                 raise Exception("Could not download the content")
 
-            # Extract article links before extracting main content
-            article_links = self._extract_article_links(downloaded, url)
-
-            # Extract main content
-            content = trafilatura.extract(downloaded)
-            if not content:
-                raise Exception("No content could be extracted")
-
-            return content, article_links
+            with self.run.stage("extract"):
+                return self.extraction_pool.extract(downloaded, url, discover_links)
         except Exception as e:
             raise Exception(f"Failed to fetch article: {str(e)}")
 
-    def _extract_article_links(self, html_content, base_url):
-        """Extract potential article links from HTML content"""
-        links = set()  # Use set to avoid duplicates
+    def _relevance_request(self, content, interest_prompt):
+        """Build the chat completion arguments for a relevance check"""
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [{
+                "role":
+                "system",
+                "content":
+                "You are a relevance checker. "
+                "Determine if the article matches the given interests. "
+                "Respond with JSON in this format: "
+                "{'relevant': boolean, 'reason': string}"
+            }, {
+                "role":
+                "user",
+                "content":
+                f"Interest criteria:\n{interest_prompt}\n\n"
+                f"Article content:\n{content[:4000]}"
+            }],
+            "response_format": {"type": "json_object"}
+        }
+
+    def _batch_relevance_request(self, contents, interest_prompt):
+        """Build the chat completion arguments for a batched relevance check"""
+        articles = "\n\n".join(
+            f"[Article {i}]\n{content[:4000]}" for i, content in enumerate(contents))
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [{
+                "role":
+                "system",
+                "content":
+                "You are a relevance checker. "
+                "Determine for each numbered article if it matches the given interests. "
+                "Respond with JSON in this format, with one result per article: "
+                "{'results': [{'id': number, 'relevant': boolean, 'reason': string}]}"
+            }, {
+                "role":
+                "user",
+                "content":
+                f"Interest criteria:\n{interest_prompt}\n\n"
+                f"Articles:\n{articles}"
+            }],
+            "response_format": {"type": "json_object"}
+        }
+
+    def _plan_relevance_batches(self, contents):
+        """Split content indexes into batches bounded by size and estimated tokens"""
+        batches, batch, batch_tokens = [], [], 0
+        for i, content in enumerate(contents):
+            # Roughly four characters per token plus the article header
+            tokens = len(content[:4000]) // 4 + 10
+            if batch and (len(batch) >= self.relevance_batch_size
+                          or batch_tokens + tokens > self.relevance_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _parse_batch_relevance(self, response_content, batch_size):
+        """Map batch positions to (relevant, reason)
+
+        The ids must be exactly 0..batch_size-1, each once. Anything else
+        means the answers cannot be trusted to line up with the articles, so
+        nothing is returned and the whole batch is re-checked one by one.
+        """
+        verdicts = {}
         try:
-            # Parse HTML with BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Get links from common article containers
-            article_containers = soup.find_all(
-                ['article', 'div', 'section'],
-                class_=lambda x: x and any(term in x.lower(
-                ) for term in ['article', 'post', 'story', 'news']))
-
-            # Extract links from article containers
-            for container in article_containers:
-                for a_tag in container.find_all('a', href=True):
-                    links.add(a_tag['href'])
-
-            # Also check for links in the main content area
-            main_content = soup.find(
-                ['main', 'div'], class_=lambda x: x and 'content' in x.lower())
-            if main_content:
-                for a_tag in main_content.find_all('a', href=True):
-                    links.add(a_tag['href'])
-
-            # Clean and normalize links
-            cleaned_links = []
-            for link in links:
-                # Make relative URLs absolute
-                absolute_url = urljoin(base_url, link)
-                parsed = urlparse(absolute_url)
-
-                # Skip if not same domain or obvious non-article URLs
-                if not parsed.netloc or any(
-                        skip in parsed.path.lower() for skip in
-                    ['/tag/', '/category/', '/author/', '/search/', '/page/']):
-                    continue
+            results = json.loads(response_content)["results"]
+        except Exception:
+            return {}
+        if not isinstance(results, list) or len(results) != batch_size:
+            print("Warning: Batched relevance answer has the wrong number of items, checking one by one")
+            return {}
+        for item in results:
+            if not isinstance(item, dict) or not isinstance(item.get("relevant"), bool):
+                print("Warning: Batched relevance answer has a malformed item, checking one by one")
+                return {}
+            position = item.get("id")
+            if (not isinstance(position, int) or isinstance(position, bool)
+                    or not 0 <= position < batch_size or position in verdicts):
+                print(f"Warning: Batched relevance answer has unexpected id {position!r}, checking one by one")
+                return {}
+            verdicts[position] = (item["relevant"], str(item.get("reason", "")))
+        return verdicts
 
-                # Include if likely an article URL
-                if any(pattern in parsed.path.lower() for pattern in [
-                        '/article/', '/news/', '/story/', '/post/', '/2024/',
-                        '/2025/'
-                ]):
-                    cleaned_links.append(absolute_url)
+    def _summary_request(self, content, summary_prompt):
+        """Build the chat completion arguments for an article summary"""
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [{
+                "role":
+                "system",
+                "content":
+                "You are an article summarizer. "
+                "Summarize the article according to the given instructions. "
+                "Respond with JSON in this format: "
+                "{'title': string, 'summary': string}"
+            }, {
+                "role":
+                "user",
+                "content":
+                f"Summary instructions:\n{summary_prompt}\n\n"
+                f"Article content:\n{content[:4000]}"
+            }],
+            "response_format": {"type": "json_object"}
+        }
 
-            return list(set(cleaned_links))  # Remove any remaining duplicates
-        except Exception as e:
-            print(f"Warning: Error extracting links: {str(e)}")
-            return []
+    def _cache_key(self, request, prompt, content):
+        """LLM cache key for a request, or None when caching is disabled"""
+        if not self.llm_cache:
+            return None
+        instructions = request["messages"][0]["content"]
+        return self.llm_cache.key(request["model"], f"{instructions}\n{prompt}", content[:4000])
+
+    def _complete(self, stage, request, prompt, content, fields):
+        """Run a JSON chat completion, answering from the LLM cache when possible"""
+        cache_key = self._cache_key(request, prompt, content)
+        if cache_key:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        with self.run.stage(stage):
+            response = self.llm.create(stage, **request)
+        self.run.record_usage(response)
+        result = json.loads(response.choices[0].message.content)
+        result = {field: result[field] for field in fields}
+        if cache_key:
+            self.llm_cache.set(cache_key, result)
+        return result
 
     def check_relevance(self, content, interest_prompt):
         """Check if the article is relevant based on interest prompt"""
         try:
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{
-                    "role":
-                    "system",
-                    "content":
-                    "You are a relevance checker. "
-                    "Determine if the article matches the given interests. "
-                    "Respond with JSON in this format: "
-                    "{'relevant': boolean, 'reason': string}"
-                }, {
-                    "role":
-                    "user",
-                    "content":
-                    f"Interest criteria:\n{interest_prompt}\n\n"
-                    f"Article content:\n{content[:4000]}"
-                }],
-                response_format={"type": "json_object"})
-            result = json.loads(response.choices[0].message.content)
+            result = self._complete("relevance", self._relevance_request(content, interest_prompt),
+                                    interest_prompt, content, ("relevant", "reason"))
             return result["relevant"], result["reason"]
         except Exception as e:
             raise Exception(f"Failed to check relevance: {str(e)}")
 
+    def _cached_relevance(self, content, interest_prompt):
+        """Cache key and cached (relevant, reason) for one article, if any"""
+        cache_key = self._cache_key(
+            self._relevance_request(content, interest_prompt), interest_prompt, content)
+        cached = self.llm_cache.get(cache_key) if cache_key else None
+        return cache_key, (cached["relevant"], cached["reason"]) if cached else None
+
+    def check_relevance_batch(self, contents, interest_prompt):
+        """Check the relevance of many articles with as few requests as possible
+
+        Returns one (relevant, reason) per content. Cached answers are reused,
+        batches whose response does not line up with the articles are
+        re-checked one by one, and items that still fail get (None, error
+        message).
+        """
+        verdicts = [None] * len(contents)
+        cache_keys = {}
+        for i, content in enumerate(contents):
+            cache_keys[i], verdicts[i] = self._cached_relevance(content, interest_prompt)
+        misses = [i for i, verdict in enumerate(verdicts) if verdict is None]
+
+        for batch in self._plan_relevance_batches([contents[i] for i in misses]):
+            batch = [misses[position] for position in batch]
+            batch_verdicts = {}
+            if len(batch) > 1:
+                try:
+                    with self.run.stage("relevance"):
+                        response = self.llm.create(
+                            "relevance", **self._batch_relevance_request(
+                                [contents[i] for i in batch], interest_prompt))
+                    self.run.record_usage(response)
+                    batch_verdicts = self._parse_batch_relevance(
+                        response.choices[0].message.content, len(batch))
+                except Exception as e:
+                    print(f"Warning: Batched relevance check failed: {str(e)}")
+            for position, i in enumerate(batch):
+                if position in batch_verdicts:
+                    verdicts[i] = batch_verdicts[position]
+                    if cache_keys[i]:
+                        relevant, reason = verdicts[i]
+                        self.llm_cache.set(cache_keys[i], {"relevant": relevant, "reason": reason})
+                    continue
+                try:
+                    verdicts[i] = self.check_relevance(contents[i], interest_prompt)
+                except Exception as e:
+                    verdicts[i] = (None, str(e))
+        return verdicts
+
     def summarize_article(self, content, summary_prompt):
         """Summarize the article based on summary prompt"""
         try:
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{
-                    "role":
-                    "system",
-                    "content":
-                    "You are an article summarizer. "
-                    "Summarize the article according to the given instructions. "
-                    "Respond with JSON in this format: "
-                    "{'title': string, 'summary': string}"
-                }, {
-                    "role":
-                    "user",
-                    "content":
-                    f"Summary instructions:\n{summary_prompt}\n\n"
-                    f"Article content:\n{content[:4000]}"
-                }],
-                response_format={"type": "json_object"})
-            result = json.loads(response.choices[0].message.content)
+            result = self._complete("summarize", self._summary_request(content, summary_prompt),
+                                    summary_prompt, content, ("title", "summary"))
             return result["title"], result["summary"]
         except Exception as e:
             raise Exception(f"Failed to summarize article: {str(e)}")
 
-    def process_single_article(self, article_url, interest_prompt, summary_prompt):
+    def _build_article(self, url, title, summary, content):
+        """Build the article record stored for a relevant article"""
+        return {
+            "url": url,
+            "title": title,
+            "summary": summary,
+            "processed_date": datetime.now().isoformat(),
+            "content": content
+        }
+
+    def _unseen_links(self, article_links):
+        """Drop links that are already stored, rejected or taken by another source"""
+        if self.seen_urls is None:
+            return article_links
+        return [link for link in article_links if self.seen_urls.claim(link)]
+
+    def _passes_prefilter(self, content):
+        """Run the local pre-filter, counting how many candidates it rejects"""
+        if self.prefilter is None:
+            return True
+        accepted = self.prefilter.accepts(content)
+        with self.status_lock:
+            self.prefilter_stats["checked"] += 1
+            if not accepted:
+                self.prefilter_stats["rejected"] += 1
+        return accepted
+
+    def _is_near_duplicate(self, article_url, content, source=None):
+        """Check a candidate against the near-duplicate index before any LLM call"""
+        if self.near_duplicates is None:
+            return False
+        duplicate_of, recorded = self.near_duplicates.claim(article_url, content)
+        if duplicate_of is None:
+            return False
+        self.run.count("near_duplicates", source=source)
+        self._update_status(f"Nära dubblett av {duplicate_of}: {article_url}")
+        # A duplicate of an article still being processed is only remembered
+        # once that article is kept; if it is released, both are checked again
+        if recorded and self.fetch_cache:
+            self.fetch_cache.commit(article_url)
+        return True
+
+    def _settle_near_duplicate(self, article_url, kept):
+        """Persist the signature of a kept article and its duplicates, or release the claim"""
+        if self.near_duplicates is None:
+            return
+        if kept:
+            for duplicate in self.near_duplicates.commit(article_url):
+                if self.fetch_cache:
+                    self.fetch_cache.commit(duplicate)
+        else:
+            self.near_duplicates.release(article_url)
+
+    def _fetch_candidate(self, article_url, source=None):
+        """Fetch an article's content, or None if unchanged or failing"""
+        try:
+            self._update_status(f"Kontrollerar artikel: {article_url}")
+            content, _ = self.fetch_article(article_url, discover_links=False)
+            if content is None:
+                self.run.count("unchanged", source=source)
+            return content
+        except Exception as e:
+            self.run.count("errors", source=source)
+            self._update_status(f"Fel vid bearbetning av artikel {article_url}: {str(e)}")
+            return None
+
+    def _summarize_candidate(self, article_url, content, summary_prompt, source=None):
+        """Summarize an article already judged relevant"""
+        try:
+            title, summary = self.summarize_article(content, summary_prompt)
+            self.run.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {title}")
+            return self._build_article(article_url, title, summary, content)
+        except Exception as e:
+            self._settle_near_duplicate(article_url, False)
+            self.run.count("errors", source=source)
+            self._update_status(f"Fel vid bearbetning av artikel {article_url}: {str(e)}")
+            return None
+
+    def _process_links_batched(self, article_links, interest_prompt, summary_prompt, executor,
+                               status_callback=None, source=None):
+        """Fetch all links, classify them in batches and summarize the relevant ones"""
+        contents = list(executor.map(
+            lambda link: self._fetch_candidate(link, source), article_links))
+        fetched = [(url, content) for url, content in zip(article_links, contents) if content]
+        candidates = []
+        rejected = duplicates = 0
+        for article_url, content in fetched:
+            if not self._passes_prefilter(content):
+                rejected += 1
+                self.run.count("prefilter_rejected", source=source)
+                if self.fetch_cache:
+                    self.fetch_cache.commit(article_url)
+            elif self._is_near_duplicate(article_url, content, source):
+                duplicates += 1
+            else:
+                candidates.append((article_url, content))
+        if rejected:
+            self._update_status(
+                f"Förfiltret avvisade {rejected} av {len(fetched)} artiklar", status_callback)
+        if duplicates:
+            self._update_status(
+                f"Hoppade över {duplicates} nära dubbletter av {len(fetched)} artiklar",
+                status_callback)
+        verdicts = self.check_relevance_batch(
+            [content for _, content in candidates], interest_prompt)
+
+        futures = []
+        for (article_url, content), (relevant, reason) in zip(candidates, verdicts):
+            if relevant is None:
+                self._settle_near_duplicate(article_url, False)
+                self.run.count("errors", source=source)
+                self._update_status(f"Fel vid bearbetning av artikel {article_url}: {reason}")
+            elif relevant:
+                futures.append(executor.submit(
+                    self._summarize_candidate, article_url, content, summary_prompt, source))
+            else:
+                self._settle_near_duplicate(article_url, False)
+                self.run.count("irrelevant", source=source)
+                if self.seen_urls is not None:
+                    self.seen_urls.reject(article_url, reason)
+                if self.fetch_cache:
+                    self.fetch_cache.commit(article_url)
+        return futures
+
+    def process_single_article(self, article_url, interest_prompt, summary_prompt, source=None):
         """Process a single article URL"""
         try:
             self._update_status(f"Kontrollerar artikel: {article_url}")
 
-            article_content, _ = self.fetch_article(article_url)  # Ignore nested links
+            article_content, _ = self.fetch_article(article_url, discover_links=False)
+            if article_content is None:
+                self.run.count("unchanged", source=source)
+                return None
+            if not self._passes_prefilter(article_content):
+                self.run.count("prefilter_rejected", source=source)
+                self._update_status(f"Förfiltret avvisade: {article_url}")
+                if self.fetch_cache:
+                    self.fetch_cache.commit(article_url)
+                return None
+            if self._is_near_duplicate(article_url, article_content, source):
+                return None
             relevant, reason = self.check_relevance(article_content, interest_prompt)
 
-            if relevant:
-                title, summary = self.summarize_article(article_content, summary_prompt)
-                result = {
-                    "url": article_url,
-                    "title": title,
-                    "summary": summary,
-                    "processed_date": datetime.now().isoformat(),
-                    "content": article_content
-                }
-                self._update_status(f"Hittade relevant artikel: {title}")
-                return result
-            return None
+            if not relevant:
+                self.run.count("irrelevant", source=source)
+                if self.seen_urls is not None:
+                    self.seen_urls.reject(article_url, reason)
+                self._settle_near_duplicate(article_url, False)
+                if self.fetch_cache:
+                    self.fetch_cache.commit(article_url)
+                return None
+            # A relevant page is only remembered by commit_saved
+            title, summary = self.summarize_article(article_content, summary_prompt)
+            self.run.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {title}")
+            return self._build_article(article_url, title, summary, article_content)
         except Exception as e:
+            self._settle_near_duplicate(article_url, False)
+            self.run.count("errors", source=source)
             self._update_status(f"Fel vid bearbetning av artikel {article_url}: {str(e)}")
             return None
 
@@ -179,39 +455,53 @@ class ArticleProcessor:
         self._update_status(f"Hämtar innehåll från: {url}", status_callback)
         content, article_links = self.fetch_article(url)
         processed_articles = []
+        if content is None:
+            self.run.count("unchanged_sources", source=url)
+            self._update_status(f"Oförändrad sedan förra körningen: {url}", status_callback)
+            return processed_articles
 
         # First check if the main page content is relevant
-        relevant, reason = self.check_relevance(content, interest_prompt)
+        relevant = False
+        if self._passes_prefilter(content):
+            relevant, reason = self.check_relevance(content, interest_prompt)
 
         if relevant:
             title, summary = self.summarize_article(content, summary_prompt)
-            processed_articles.append({
-                "url": url,
-                "title": title,
-                "summary": summary,
-                "processed_date": datetime.now().isoformat(),
-                "content": content
-            })
+            processed_articles.append(self._build_article(url, title, summary, content))
+            self.run.count("relevant", source=url)
             self._update_status(
                 f"Hittade relevant innehåll på huvudsidan: {title}", status_callback)
 
         # Process extracted article links in parallel
-        if article_links:
+        new_links = self._unseen_links(article_links)
+        self.run.count("candidates", len(new_links), source=url)
+        self.run.count("known", len(article_links) - len(new_links), source=url)
+        if len(new_links) < len(article_links):
+            self._update_status(
+                f"Hoppar över {len(article_links) - len(new_links)} redan kända artiklar",
+                status_callback)
+        if new_links:
             self._update_status(
-                f"Hittade {len(article_links)} potentiella artikellänkar", status_callback)
+                f"Hittade {len(new_links)} potentiella artikellänkar", status_callback)
 
             # Process articles in parallel with max 5 workers
             with ThreadPoolExecutor(max_workers=5) as executor:
-                futures = []
-                for article_url in article_links:
-                    futures.append(
-                        executor.submit(
-                            self.process_single_article,
-                            article_url,
-                            interest_prompt,
-                            summary_prompt
+                if self.relevance_batch_size > 1:
+                    futures = self._process_links_batched(
+                        new_links, interest_prompt, summary_prompt, executor, status_callback,
+                        source=url)
+                else:
+                    futures = []
+                    for article_url in new_links:
+                        futures.append(
+                            executor.submit(
+                                self.process_single_article,
+                                article_url,
+                                interest_prompt,
+                                summary_prompt,
+                                url
+                            )
                         )
-                    )
 
                 for future in as_completed(futures):
                     result = future.result()
@@ -220,4 +510,23 @@ class ArticleProcessor:
                         self._update_status(
                             f"Bearbetat artikel: {result['title']}", status_callback)
 
-        return processed_articles
\ No newline at end of file
+        self.source_links[url] = new_links
+        return processed_articles
+
+    def commit_saved(self, articles, sources):
+        """Remember the pages of saved articles and of the sources they came from
+
+        Relevant pages are only committed once their article is stored, so an
+        article lost to a crash or a failed save is processed again on the
+        next run. A source page is remembered once all its articles went
+        through, otherwise failed articles would be skipped until it changes.
+        """
+        for article in articles:
+            self._settle_near_duplicate(article['url'], True)
+            if self.fetch_cache and article['url'] not in sources:
+                self.fetch_cache.commit(article['url'])
+        for url in sources:
+            new_links = self.source_links.pop(url, None)
+            if (self.fetch_cache and new_links is not None
+                    and all(self.fetch_cache.has(link) for link in new_links)):
+                self.fetch_cache.commit(url)
\ No newline at end of file
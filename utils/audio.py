@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_ELEVENLABS_BASE_URL = "https://api.elevenlabs.io"
+CHUNK_SIZE = 64 * 1024
+# Voice IDs end up in segment file names and request paths
+VOICE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Audio jobs of this process, by job ID; finished ones are kept for
+# AUDIO_JOB_TTL so that clients can read the result
+AUDIO_JOBS = {}
+AUDIO_JOBS_LOCK = threading.Lock()
+AUDIO_JOB_TTL = timedelta(hours=1)
+
+
+class AudioRenderer:
+    """Renders podcast dialog to one MP3 file with ElevenLabs.
+
+    Lines are synthesized concurrently over one pooled session and streamed
+    to disk. Each segment is cached by (voice_id, text hash), so a retry or
+    re-render only synthesizes the lines that are missing.
+    """
+
+    def __init__(self, api_key, cache_dir, concurrency=4, base_url=None):
+        self.api_key = api_key
+        # ELEVENLABS_BASE_URL points the renderer at another server, such as
+        # scripts/tts_stub_server.py for load tests
+        self.base_url = (base_url or os.getenv("ELEVENLABS_BASE_URL")
+                         or DEFAULT_ELEVENLABS_BASE_URL).rstrip("/")
+        self.cache_dir = cache_dir
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        self.session.headers["xi-api-key"] = api_key or ""
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=concurrency))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=concurrency))
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def segment_path(self, voice_id, text):
+        if not VOICE_ID_PATTERN.fullmatch(voice_id):
+            raise Exception(f"Invalid voice ID: {voice_id!r}")
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{voice_id}_{text_hash}.mp3")
+
+    def synthesize(self, voice_id, text):
+        """Synthesize one line unless it is cached; returns the segment path"""
+        path = self.segment_path(voice_id, text)
+        if os.path.exists(path):
+            return path
+
+        response = self.session.post(
+            f"{self.base_url}/v1/text-to-speech/{voice_id}",
+            json={
+                'text': text,
+                'model_id': 'eleven_multilingual_v2',
+                'voice_settings': {
+                    'stability': 0.5,
+                    'similarity_boost': 0.5
+                }
+            },
+            stream=True,
+            timeout=120
+        )
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to generate audio: {response.text}")
+            # Written under a temporary name so that an interrupted download
+            # is never mistaken for a cached segment
+            partial_path = f"{path}.{uuid.uuid4().hex}.part"
+            try:
+                with open(partial_path, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                os.replace(partial_path, path)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+        return path
+
+    def render(self, podcast, output_path, progress=None):
+        """Synthesize every dialog line and concatenate them into output_path"""
+        voice_mapping = {host['name']: host['elevenlabs_voice_id'] for host in podcast['hosts']}
+        lines = []
+        for line in podcast['dialog']:
+            voice_id = voice_mapping.get(line['speaker'])
+            if not voice_id:
+                raise Exception(f"No voice ID found for speaker: {line['speaker']}")
+            lines.append((voice_id, line['text']))
+
+        def synthesize_line(line):
+            path = self.synthesize(*line)
+            if progress:
+                progress()
+            return path
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            paths = list(executor.map(synthesize_line, lines))
+
+        partial_path = f"{output_path}.part"
+        with open(partial_path, 'wb') as output:
+            for path in paths:
+                with open(path, 'rb') as segment:
+                    shutil.copyfileobj(segment, output, CHUNK_SIZE)
+        os.replace(partial_path, output_path)
+
+    def close(self):
+        self.session.close()
+
+
+def _prune_audio_jobs():
+    """Drop jobs that finished more than AUDIO_JOB_TTL ago; AUDIO_JOBS_LOCK held"""
+    cutoff = (datetime.now() - AUDIO_JOB_TTL).isoformat()
+    for job_id in [job_id for job_id, job in AUDIO_JOBS.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]:
+        del AUDIO_JOBS[job_id]
+
+
+def start_audio_job(storage, newsletter_id, podcast, audio_dir, cache_dir, concurrency=4):
+    """Render a newsletter's podcast in a background thread and return the job
+
+    A job that is already running for the same newsletter is returned instead
+    of starting another one.
+    """
+    with AUDIO_JOBS_LOCK:
+        _prune_audio_jobs()
+        for job in AUDIO_JOBS.values():
+            if job["newsletter_id"] == newsletter_id and job["status"] == "running":
+                return dict(job)
+        job = {
+            "id": uuid.uuid4().hex,
+            "newsletter_id": newsletter_id,
+            "status": "running",
+            "total": len(podcast['dialog']),
+            "done": 0,
+            "audio_url": None,
+            "error": None,
+            "finished_at": None
+        }
+        AUDIO_JOBS[job["id"]] = job
+
+    def progress():
+        with AUDIO_JOBS_LOCK:
+            job["done"] += 1
+
+    def run():
+        renderer = AudioRenderer(os.getenv('ELEVENLABS_API_KEY'), cache_dir, concurrency)
+        try:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            audio_filename = f'podcast_{newsletter_id}_{timestamp}.mp3'
+            os.makedirs(audio_dir, exist_ok=True)
+            renderer.render(podcast, os.path.join(audio_dir, audio_filename), progress)
+            audio_url = f'/static/audio/{audio_filename}'
+            storage.update_newsletter_audio(newsletter_id, audio_url)
+            print(f"Saved audio file for newsletter {newsletter_id} to {audio_url}")
+            with AUDIO_JOBS_LOCK:
+                job["status"] = "completed"
+                job["audio_url"] = audio_url
+                job["finished_at"] = datetime.now().isoformat()
+        except Exception as e:
+            print(f"Error generating audio for newsletter {newsletter_id}: {str(e)}")
+            with AUDIO_JOBS_LOCK:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                job["finished_at"] = datetime.now().isoformat()
+        finally:
+            renderer.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    with AUDIO_JOBS_LOCK:
+        return dict(job)
+
+
+def get_audio_job(job_id):
+    with AUDIO_JOBS_LOCK:
+        _prune_audio_jobs()
+        job = AUDIO_JOBS.get(job_id)
+        return dict(job) if job else None
@@ -0,0 +1,59 @@
+import math
+from collections import Counter
+
+from utils.prefilter import terms
+
+
+def _article_vector(article, idf):
+    # Title terms count double: titles name the topic, summaries add detail
+    counts = Counter(terms(article["title"]) * 2 + terms(article["summary"]))
+    vector = {term: count * idf.get(term, 0.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+def _cosine(vector, centroid):
+    if len(vector) > len(centroid):
+        vector, centroid = centroid, vector
+    return sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+
+
+def cluster_articles(articles, max_cluster_size=12, threshold=0.2):
+    """Group articles by topic with TF-IDF vectors of their title and summary
+
+    Each article joins the most similar cluster whose centroid is at least
+    threshold similar and that still has room, or starts a new one. Articles
+    left on their own are gathered into mixed clusters, so every cluster has
+    at most max_cluster_size articles. Returns a list of article lists.
+    """
+    document_terms = [set(terms(a["title"]) + terms(a["summary"])) for a in articles]
+    frequencies = Counter(term for doc in document_terms for term in doc)
+    idf = {
+        term: math.log((1 + len(articles)) / (1 + frequency)) + 1
+        for term, frequency in frequencies.items()
+    }
+
+    clusters = []
+    for article in articles:
+        vector = _article_vector(article, idf)
+        best, best_score = None, threshold
+        for cluster in clusters:
+            if len(cluster["articles"]) >= max_cluster_size:
+                continue
+            score = _cosine(vector, cluster["centroid"])
+            if score >= best_score:
+                best, best_score = cluster, score
+        if best is None:
+            clusters.append({"articles": [article], "sum": dict(vector), "centroid": vector})
+            continue
+        best["articles"].append(article)
+        for term, weight in vector.items():
+            best["sum"][term] = best["sum"].get(term, 0.0) + weight
+        norm = math.sqrt(sum(weight * weight for weight in best["sum"].values()))
+        best["centroid"] = {term: weight / norm for term, weight in best["sum"].items()} if norm else {}
+
+    topics = [cluster["articles"] for cluster in clusters if len(cluster["articles"]) > 1]
+    singles = [cluster["articles"][0] for cluster in clusters if len(cluster["articles"]) == 1]
+    for start in range(0, len(singles), max_cluster_size):
+        topics.append(singles[start:start + max_cluster_size])
+    return topics
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from utils.runs import RunTracker
+from utils.scheduler import process_urls
+
+# Postgres advisory lock key held for the duration of a pipeline run
+PIPELINE_LOCK_KEY = 7204110001
+
+
+class RunCoordinator:
+    """Single-flight coordinator for pipeline runs.
+
+    Only one run executes at a time: within this process via a lock, and
+    across processes (e.g. several gunicorn workers) via a Postgres advisory
+    lock held on a dedicated connection. Requests that arrive while a run is
+    in progress are coalesced into one follow-up run. When the run belongs
+    to another process, the follow-up starts once that run releases the
+    advisory lock, which is retried every retry_seconds.
+    """
+
+    def __init__(self, storage, retry_seconds=10):
+        self.storage = storage
+        self.retry_seconds = retry_seconds
+        self.lock = threading.Lock()
+        self.current_run = None
+        self.pending = None
+        self.waiting = False
+
+    def submit(self, trigger="manual", status_callback=None, urls=None, newsletter=True):
+        """Start a run unless one is in progress
+
+        urls limits the run to these sources (None crawls all of them) and
+        newsletter selects whether the run ends by generating the newsletter.
+        Returns (run_id, started). When a run is already in progress, run_id is
+        that run's ID and started is False; the request is then queued.
+        """
+        with self.lock:
+            # Coalesce: however many requests arrive mid-run, one more run
+            # covering all of them starts when the current one finishes
+            self._coalesce(trigger, status_callback, urls, newsletter)
+            if self.current_run:
+                return self.current_run.id, False
+
+            lock_conn = self.storage.try_advisory_lock(PIPELINE_LOCK_KEY)
+            if lock_conn is None:
+                # Another process is running; wait for it instead of
+                # dropping the request
+                if not self.waiting:
+                    self.waiting = True
+                    threading.Thread(target=self._wait_for_lock, daemon=True).start()
+                return self.storage.get_running_run_id(), False
+
+            return self._start_pending(lock_conn), True
+
+    def _coalesce(self, trigger, status_callback, urls, newsletter):
+        """Merge a request into the pending one; self.lock held"""
+        if self.pending:
+            _, _, pending_urls, pending_newsletter = self.pending
+            if urls is not None and pending_urls is not None:
+                urls = sorted(set(pending_urls) | set(urls))
+            else:
+                urls = None
+            newsletter = newsletter or pending_newsletter
+        self.pending = (trigger, status_callback, urls, newsletter)
+
+    def _start_pending(self, lock_conn):
+        """Start the pending request in a thread holding lock_conn; self.lock held"""
+        trigger, status_callback, urls, newsletter = self.pending
+        try:
+            # Nothing else can be running while we hold the lock, so
+            # runs still marked as running were cut short by a restart
+            self.storage.mark_interrupted_runs()
+            self.current_run = RunTracker(self.storage, trigger=trigger)
+        except Exception:
+            self.storage.release_advisory_lock(lock_conn, PIPELINE_LOCK_KEY)
+            raise
+        self.pending = None
+        thread = threading.Thread(
+            target=self._run_loop, args=(lock_conn, status_callback, urls, newsletter),
+            daemon=True)
+        thread.start()
+        return self.current_run.id
+
+    def _wait_for_lock(self):
+        """Start the queued request once another process's run releases the lock"""
+        while True:
+            time.sleep(self.retry_seconds)
+            with self.lock:
+                # A run of this process started meanwhile and takes the request over
+                if self.current_run or not self.pending:
+                    self.waiting = False
+                    return
+                try:
+                    lock_conn = self.storage.try_advisory_lock(PIPELINE_LOCK_KEY)
+                    if lock_conn is not None:
+                        self._start_pending(lock_conn)
+                        self.waiting = False
+                        return
+                except Exception as e:
+                    print(f"Could not start queued pipeline run: {str(e)}")
+
+    def _run_loop(self, lock_conn, status_callback, urls, newsletter):
+        while True:
+            try:
+                process_urls(status_callback, run=self.current_run, urls=urls,
+                             newsletter=newsletter)
+            except Exception as e:
+                print(f"Pipeline run {self.current_run.id} failed: {str(e)}")
+
+            with self.lock:
+                if self.pending:
+                    trigger, status_callback, urls, newsletter = self.pending
+                    self.pending = None
+                    try:
+                        self.current_run = RunTracker(self.storage, trigger=trigger)
+                        continue
+                    except Exception as e:
+                        print(f"Could not start queued pipeline run: {str(e)}")
+                # Release while holding the lock so that a submit() racing
+                # with the end of the run cannot see a stale advisory lock
+                self.current_run = None
+                self.storage.release_advisory_lock(lock_conn, PIPELINE_LOCK_KEY)
+                return
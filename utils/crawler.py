@@ -0,0 +1,390 @@
+import asyncio
+import json
+from urllib.parse import urlparse
+
+import httpx
+from utils.politeness import USER_AGENT
+from utils.resources import new_async_openai
+
+
+class AsyncCrawler:
+    """Asyncio crawl engine sharing one concurrency budget across all sources.
+
+    Every page fetch acquires the global semaphore and a per-host semaphore,
+    and all HTTP traffic goes through one keep-alive connection pool. OpenAI
+    calls are bounded by the LLM gateway's limiter instead, so that its
+    rate-limit pauses and backoff never hold up page fetches.
+    """
+
+    def __init__(self, processor, max_concurrency=20, per_host_limit=4, timeout=30):
+        self.processor = processor
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+
+    def run(self, urls, interest_prompt, summary_prompt, status_callback=None):
+        """Crawl all source URLs and return the relevant articles"""
+        return asyncio.run(
+            self._crawl(urls, interest_prompt, summary_prompt, status_callback))
+
+    async def _crawl(self, urls, interest_prompt, summary_prompt, status_callback):
+        self._budget = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits = {}
+        self._robots_locks = {}
+        self._scheduled = set(urls)
+        self._status_callback = status_callback
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(limits=limits,
+                                     timeout=self.timeout,
+                                     follow_redirects=True,
+                                     headers={"User-Agent": USER_AGENT}) as http:
+            self.http = http
+            self.openai = new_async_openai()
+            try:
+                results = await asyncio.gather(*[
+                    self._process_source(url, interest_prompt, summary_prompt)
+                    for url in urls
+                ])
+            finally:
+                await self.openai.close()
+        return [article for articles in results for article in articles]
+
+    @property
+    def tracker(self):
+        """The RunTracker of the processor; not named run, which starts the crawl"""
+        return self.processor.run
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    def _update_status(self, message, to_callback=True):
+        self.processor._update_status(
+            message, self._status_callback if to_callback else None)
+
+    async def fetch(self, url):
+        """Download a page within the global and per-host limits
+
+        Returns None when the page is unchanged since it was last processed.
+        """
+        fetch_cache = self.processor.fetch_cache
+        headers = fetch_cache.request_headers(url) if fetch_cache else {}
+        policy = self.processor.host_policy
+        if policy:
+            await self._check_robots(url)
+        async with self._host_limit(url):
+            attempt = 0
+            while True:
+                # Wait for the host's rate limit without holding the budget
+                if policy:
+                    await asyncio.sleep(policy.wait_time(url))
+                async with self._budget:
+                    with self.tracker.stage("fetch"):
+                        response = await self.http.get(url, headers=headers)
+                if not policy or policy.retry_delay(
+                        url, response.status_code, response.headers, attempt) is None:
+                    break
+                attempt += 1
+        if fetch_cache and fetch_cache.is_unchanged(url, response.status_code, response.content):
+            return None
+        response.raise_for_status()
+        if fetch_cache:
+            fetch_cache.remember(url, response.headers, response.content)
+        return response.content
+
+    async def _check_robots(self, url):
+        """Fetch the host's robots.txt once and raise if it disallows the URL"""
+        policy = self.processor.host_policy
+        host = policy.host(url)
+        if host not in self._robots_locks:
+            self._robots_locks[host] = asyncio.Lock()
+        async with self._robots_locks[host]:
+            if policy.needs_robots(url):
+                await asyncio.sleep(policy.wait_time(url))
+                try:
+                    response = await self.http.get(policy.robots_url(url), timeout=10)
+                    policy.set_robots(url, response.status_code, response.text)
+                except Exception:
+                    policy.set_robots(url, None, "")
+        if not policy.can_fetch(url):
+            raise Exception(f"Disallowed by robots.txt: {url}")
+
+    def _mark_processed(self, url):
+        if self.processor.fetch_cache:
+            self.processor.fetch_cache.commit(url)
+
+    async def fetch_article(self, url, discover_links=True):
+        """Fetch a page and extract its content and, optionally, article links"""
+        try:
+            html = await self.fetch(url)
+            if html is None:
+                return None, []
+            if not html:
+                raise Exception("Could not download the content")
+            with self.tracker.stage("extract"):
+                return await self.processor.extraction_pool.extract_async(
+                    html, url, discover_links)
+        except Exception as e:
+            raise Exception(f"Failed to fetch article: {str(e)}")
+
+    async def _complete(self, stage, request, prompt, content, fields):
+        cache_key = self.processor._cache_key(request, prompt, content)
+        llm_cache = self.processor.llm_cache
+        if cache_key:
+            cached = await asyncio.to_thread(llm_cache.get, cache_key)
+            if cached is not None:
+                return cached
+        with self.tracker.stage(stage):
+            response = await self.processor.llm.acreate(self.openai, stage, **request)
+        self.tracker.record_usage(response)
+        result = json.loads(response.choices[0].message.content)
+        result = {field: result[field] for field in fields}
+        if cache_key:
+            await asyncio.to_thread(llm_cache.set, cache_key, result)
+        return result
+
+    async def check_relevance(self, content, interest_prompt):
+        """Check if the article is relevant based on interest prompt"""
+        try:
+            result = await self._complete(
+                "relevance", self.processor._relevance_request(content, interest_prompt),
+                interest_prompt, content, ("relevant", "reason"))
+            return result["relevant"], result["reason"]
+        except Exception as e:
+            raise Exception(f"Failed to check relevance: {str(e)}")
+
+    async def _check_relevance_batch(self, batch, contents, interest_prompt, cache_keys):
+        batch_verdicts = {}
+        if len(batch) > 1:
+            try:
+                with self.tracker.stage("relevance"):
+                    response = await self.processor.llm.acreate(
+                        self.openai, "relevance", **self.processor._batch_relevance_request(
+                            [contents[i] for i in batch], interest_prompt))
+                self.tracker.record_usage(response)
+                batch_verdicts = self.processor._parse_batch_relevance(
+                    response.choices[0].message.content, len(batch))
+            except Exception as e:
+                print(f"Warning: Batched relevance check failed: {str(e)}")
+        verdicts = []
+        for position, i in enumerate(batch):
+            if position in batch_verdicts:
+                verdicts.append((i, batch_verdicts[position]))
+                if cache_keys[i]:
+                    relevant, reason = batch_verdicts[position]
+                    await asyncio.to_thread(self.processor.llm_cache.set, cache_keys[i],
+                                            {"relevant": relevant, "reason": reason})
+                continue
+            try:
+                verdicts.append((i, await self.check_relevance(contents[i], interest_prompt)))
+            except Exception as e:
+                verdicts.append((i, (None, str(e))))
+        return verdicts
+
+    async def check_relevance_batch(self, contents, interest_prompt):
+        """Check the relevance of many articles, see ArticleProcessor.check_relevance_batch"""
+        verdicts = [None] * len(contents)
+        cache_keys = {}
+        for i, content in enumerate(contents):
+            cache_keys[i], verdicts[i] = await asyncio.to_thread(
+                self.processor._cached_relevance, content, interest_prompt)
+        misses = [i for i, verdict in enumerate(verdicts) if verdict is None]
+
+        batches = [[misses[position] for position in batch]
+                   for batch in self.processor._plan_relevance_batches(
+                       [contents[i] for i in misses])]
+        for batch_verdicts in await asyncio.gather(*[
+                self._check_relevance_batch(batch, contents, interest_prompt, cache_keys)
+                for batch in batches
+        ]):
+            for i, verdict in batch_verdicts:
+                verdicts[i] = verdict
+        return verdicts
+
+    async def summarize_article(self, content, summary_prompt):
+        """Summarize the article based on summary prompt"""
+        try:
+            result = await self._complete(
+                "summarize", self.processor._summary_request(content, summary_prompt),
+                summary_prompt, content, ("title", "summary"))
+            return result["title"], result["summary"]
+        except Exception as e:
+            raise Exception(f"Failed to summarize article: {str(e)}")
+
+    async def _summarize(self, url, content, summary_prompt):
+        title, summary = await self.summarize_article(content, summary_prompt)
+        return self.processor._build_article(url, title, summary, content)
+
+    async def _is_near_duplicate(self, article_url, content, source):
+        if self.processor.near_duplicates is None:
+            return False
+        # MinHash is CPU work and a duplicate is recorded in the database
+        return await asyncio.to_thread(
+            self.processor._is_near_duplicate, article_url, content, source)
+
+    async def _settle_near_duplicate(self, article_url, kept):
+        if self.processor.near_duplicates is not None:
+            await asyncio.to_thread(self.processor._settle_near_duplicate, article_url, kept)
+
+    async def _fetch_candidate(self, article_url, source):
+        try:
+            self._update_status(f"Kontrollerar artikel: {article_url}", to_callback=False)
+            content, _ = await self.fetch_article(article_url, discover_links=False)
+            if content is None:
+                self.tracker.count("unchanged", source=source)
+            return content
+        except Exception as e:
+            self.tracker.count("errors", source=source)
+            self._update_status(
+                f"Fel vid bearbetning av artikel {article_url}: {str(e)}", to_callback=False)
+            return None
+
+    async def _summarize_candidate(self, article_url, content, summary_prompt, source):
+        try:
+            result = await self._summarize(article_url, content, summary_prompt)
+            self.tracker.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {result['title']}", to_callback=False)
+            return result
+        except Exception as e:
+            await self._settle_near_duplicate(article_url, False)
+            self.tracker.count("errors", source=source)
+            self._update_status(
+                f"Fel vid bearbetning av artikel {article_url}: {str(e)}", to_callback=False)
+            return None
+
+    async def _process_links_batched(self, article_links, interest_prompt, summary_prompt, source):
+        contents = await asyncio.gather(*[
+            self._fetch_candidate(link, source) for link in article_links])
+        fetched = [(url, content) for url, content in zip(article_links, contents) if content]
+        candidates = []
+        rejected = duplicates = 0
+        for article_url, content in fetched:
+            if not self.processor._passes_prefilter(content):
+                rejected += 1
+                self.tracker.count("prefilter_rejected", source=source)
+                self._mark_processed(article_url)
+            elif await self._is_near_duplicate(article_url, content, source):
+                duplicates += 1
+            else:
+                candidates.append((article_url, content))
+        if rejected:
+            self._update_status(f"Förfiltret avvisade {rejected} av {len(fetched)} artiklar")
+        if duplicates:
+            self._update_status(
+                f"Hoppade över {duplicates} nära dubbletter av {len(fetched)} artiklar")
+        verdicts = await self.check_relevance_batch(
+            [content for _, content in candidates], interest_prompt)
+
+        summaries = []
+        for (article_url, content), (relevant, reason) in zip(candidates, verdicts):
+            if relevant is None:
+                await self._settle_near_duplicate(article_url, False)
+                self.tracker.count("errors", source=source)
+                self._update_status(
+                    f"Fel vid bearbetning av artikel {article_url}: {reason}", to_callback=False)
+            elif relevant:
+                summaries.append(
+                    self._summarize_candidate(article_url, content, summary_prompt, source))
+            else:
+                await self._settle_near_duplicate(article_url, False)
+                self.tracker.count("irrelevant", source=source)
+                if self.processor.seen_urls is not None:
+                    await asyncio.to_thread(self.processor.seen_urls.reject, article_url, reason)
+                self._mark_processed(article_url)
+        return summaries
+
+    async def _process_single_article(self, article_url, interest_prompt, summary_prompt, source):
+        try:
+            self._update_status(f"Kontrollerar artikel: {article_url}", to_callback=False)
+            content, _ = await self.fetch_article(article_url, discover_links=False)
+            if content is None:
+                self.tracker.count("unchanged", source=source)
+                return None
+            if not self.processor._passes_prefilter(content):
+                self.tracker.count("prefilter_rejected", source=source)
+                self._update_status(f"Förfiltret avvisade: {article_url}", to_callback=False)
+                self._mark_processed(article_url)
+                return None
+            if await self._is_near_duplicate(article_url, content, source):
+                return None
+            relevant, reason = await self.check_relevance(content, interest_prompt)
+            if not relevant:
+                self.tracker.count("irrelevant", source=source)
+                if self.processor.seen_urls is not None:
+                    await asyncio.to_thread(self.processor.seen_urls.reject, article_url, reason)
+                await self._settle_near_duplicate(article_url, False)
+                self._mark_processed(article_url)
+                return None
+            # A relevant page is only remembered by commit_saved
+            result = await self._summarize(article_url, content, summary_prompt)
+            self.tracker.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {result['title']}",
+                                to_callback=False)
+            return result
+        except Exception as e:
+            await self._settle_near_duplicate(article_url, False)
+            self.tracker.count("errors", source=source)
+            self._update_status(
+                f"Fel vid bearbetning av artikel {article_url}: {str(e)}", to_callback=False)
+            return None
+
+    async def _process_source(self, url, interest_prompt, summary_prompt):
+        with self.tracker.source(url):
+            return await self._crawl_source(url, interest_prompt, summary_prompt)
+
+    async def _crawl_source(self, url, interest_prompt, summary_prompt):
+        try:
+            self._update_status(f"Processing source: {url}")
+            self._update_status(f"Hämtar innehåll från: {url}")
+            content, article_links = await self.fetch_article(url)
+            processed_articles = []
+            if content is None:
+                self.tracker.count("unchanged_sources", source=url)
+                self._update_status(f"Oförändrad sedan förra körningen: {url}")
+                return processed_articles
+
+            relevant = False
+            if self.processor._passes_prefilter(content):
+                relevant, _ = await self.check_relevance(content, interest_prompt)
+            if relevant:
+                article = await self._summarize(url, content, summary_prompt)
+                processed_articles.append(article)
+                self.tracker.count("relevant", source=url)
+                self._update_status(
+                    f"Hittade relevant innehåll på huvudsidan: {article['title']}")
+
+            # Another source may already have scheduled the same article
+            new_links = self.processor._unseen_links(
+                [link for link in article_links if link not in self._scheduled])
+            self._scheduled.update(new_links)
+            self.tracker.count("candidates", len(new_links), source=url)
+            self.tracker.count("known", len(article_links) - len(new_links), source=url)
+            if len(new_links) < len(article_links):
+                self._update_status(
+                    f"Hoppar över {len(article_links) - len(new_links)} redan kända artiklar")
+            if new_links:
+                self._update_status(
+                    f"Hittade {len(new_links)} potentiella artikellänkar")
+                if self.processor.relevance_batch_size > 1:
+                    tasks = await self._process_links_batched(
+                        new_links, interest_prompt, summary_prompt, url)
+                else:
+                    tasks = [
+                        self._process_single_article(link, interest_prompt, summary_prompt, url)
+                        for link in new_links
+                    ]
+                for result in asyncio.as_completed(tasks):
+                    article = await result
+                    if article:
+                        processed_articles.append(article)
+                        self._update_status(f"Bearbetat artikel: {article['title']}")
+
+            self.processor.source_links[url] = new_links
+            return processed_articles
+        except Exception as e:
+            self.tracker.count("errors", source=url)
+            self._update_status(f"Error processing URL {url}: {str(e)}")
+            return []
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import trafilatura
+from lxml import etree
+from trafilatura.utils import load_html
+
+# Links inside article-like containers, plus links in the first main content
+# area. Evaluated by libxml2 in one pass over the tree.
+ARTICLE_LINKS = etree.XPath(
+    "//*[self::article or self::div or self::section]"
+    "[re:test(@class, 'article|post|story|news', 'i')]//a/@href"
+    " | (//*[self::main or self::div][re:test(@class, 'content', 'i')])[1]//a/@href",
+    namespaces={"re": "http://exslt.org/regular-expressions"})
+
+SKIP_PATH = re.compile(r"/(?:tag|category|author|search|page)/")
+ARTICLE_PATH = re.compile(r"/(?:article|news|story|post|20\d\d)/")
+
+
+def parse_html(html):
+    """Parse raw HTML (bytes or str) once into an lxml tree"""
+    tree = load_html(html)
+    if tree is None:
+        raise Exception("Could not parse the content")
+    return tree
+
+
+def extract_links(tree, base_url):
+    """Extract potential article links from a parsed page"""
+    links = set()
+    for href in set(ARTICLE_LINKS(tree)):
+        # Make relative URLs absolute
+        absolute_url = urljoin(base_url, str(href).strip())
+        parsed = urlparse(absolute_url)
+        path = parsed.path.lower()
+
+        # Skip if not same domain or obvious non-article URLs, and include
+        # only if likely an article URL
+        if parsed.netloc and not SKIP_PATH.search(path) and ARTICLE_PATH.search(path):
+            links.add(absolute_url)
+    return list(links)
+
+
+def extract_page(html, base_url, discover_links=False):
+    """Parse a page once and return (text, links)
+
+    Link discovery is only done when asked for, i.e. for source pages.
+    """
+    tree = parse_html(html)
+    links = []
+    if discover_links:
+        try:
+            links = extract_links(tree, base_url)
+        except Exception as e:
+            print(f"Warning: Error extracting links: {str(e)}")
+    content = trafilatura.extract(tree)
+    if not content:
+        raise Exception("No content could be extracted")
+    return content, links
+
+
+class ExtractionPool:
+    """Optional worker processes for CPU-bound parsing and text extraction.
+
+    Raw page bytes are sent to the workers and (text, links) tuples come back,
+    so extraction scales with cores instead of competing for the GIL with the
+    fetch threads. With zero workers extraction runs inline in the caller.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self.executor = None
+        if workers > 0:
+            # Spawn rather than fork: forking a process that runs fetch and
+            # database threads can copy locks held by those threads
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def extract(self, html, base_url, discover_links=False):
+        """Parse and extract a page, in a worker process when the pool is enabled"""
+        if self.executor is None:
+            return extract_page(html, base_url, discover_links)
+        return self.executor.submit(extract_page, html, base_url, discover_links).result()
+
+    async def extract_async(self, html, base_url, discover_links=False):
+        """Awaitable variant of extract() for the async crawl engine"""
+        if self.executor is None:
+            return await asyncio.to_thread(extract_page, html, base_url, discover_links)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, extract_page, html, base_url, discover_links)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,73 @@
+import hashlib
+from datetime import datetime
+from threading import Lock
+
+
+class FetchCache:
+    """Persistent ETag/Last-Modified/body-hash cache for fetched pages.
+
+    Entries are loaded once per run. A fresh response is only remembered in
+    memory until commit() is called, so a page whose processing failed is
+    fetched and processed again on the next run. Entries written under a
+    different context (the settings that decide what happens to a page, such
+    as the interest prompt) are ignored so that changed settings re-evaluate
+    unchanged pages.
+    """
+
+    def __init__(self, storage, context=""):
+        self.storage = storage
+        self.context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        self.entries = {
+            url: entry for url, entry in storage.get_fetch_cache().items()
+            if entry["context_hash"] == self.context_hash
+        }
+        self.pending = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def body_hash(body):
+        return hashlib.sha256(body).hexdigest()
+
+    def request_headers(self, url):
+        """Conditional request headers for a previously fetched URL"""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, status_code, body):
+        """Check whether a response repeats what was processed last time"""
+        entry = self.entries.get(url)
+        if not entry:
+            return False
+        if status_code == 304:
+            return True
+        return entry["body_hash"] == self.body_hash(body)
+
+    def remember(self, url, headers, body):
+        """Keep the validators of a fresh response until it has been processed"""
+        with self.lock:
+            self.pending[url] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "body_hash": self.body_hash(body),
+                "context_hash": self.context_hash
+            }
+
+    def has(self, url):
+        with self.lock:
+            return url in self.entries and url not in self.pending
+
+    def commit(self, url):
+        """Persist the validators once the page has been fully processed"""
+        with self.lock:
+            entry = self.pending.pop(url, None)
+            if not entry:
+                return
+            entry["fetched_at"] = datetime.now().isoformat()
+            self.entries[url] = entry
+        self.storage.save_fetch_cache(url, entry)
@@ -0,0 +1,268 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+import openai
+
+from utils.politeness import parse_retry_after
+from utils.runs import METRICS
+
+# Errors worth another attempt; anything else (bad request, auth) is final
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+# Below this share of the request or token budget left the limit is lowered
+LOW_HEADROOM = 0.1
+
+METRICS.describe("llm_requests_total", "OpenAI requests by stage and outcome")
+METRICS.describe("llm_request_seconds_total", "Seconds spent in OpenAI requests by stage, including retries")
+METRICS.describe("llm_retries_total", "OpenAI request attempts retried by error")
+METRICS.describe("llm_stage_tokens_total", "OpenAI tokens used by stage")
+METRICS.describe("llm_concurrency_limit", "Current adaptive limit on concurrent OpenAI requests")
+
+
+def _reset_seconds(value):
+    """Seconds from a rate limit reset header such as '1s', '6m0s' or '20ms'"""
+    if not value:
+        return None
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def _retry_after(headers):
+    """Seconds from OpenAI's retry-after-ms header or the standard Retry-After"""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    return parse_retry_after(headers.get("retry-after"))
+
+
+class AdaptiveLimiter:
+    """Limit on concurrent requests that follows the API's rate limit headers.
+
+    The limit grows by one after a full window of successful requests with
+    headroom left, shrinks by a quarter when the remaining request or token
+    budget runs low and halves on a 429. Until the budget resets (or the
+    Retry-After of a 429 passes) no new request is let through at all.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.in_flight = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+        # (loop, event) of each coroutine waiting in acquire_async
+        self.async_waiters = []
+        METRICS.set("llm_concurrency_limit", self.limit)
+
+    def _wait_time(self):
+        """Seconds until a request may start, 0 if one may start now; condition held"""
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        return 0 if self.in_flight < self.limit else None
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return
+                self.condition.wait(wait)
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            with self.condition:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return
+                self.async_waiters.append((loop, event))
+            # Woken by _notify when a slot frees up, or when a pause ends
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self.condition:
+                    if (loop, event) in self.async_waiters:
+                        self.async_waiters.remove((loop, event))
+
+    def _notify(self):
+        """Wake every waiting thread and coroutine; condition held"""
+        self.condition.notify_all()
+        for loop, event in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+        self.async_waiters.clear()
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self._notify()
+
+    def _set_limit(self, limit):
+        self.limit = max(self.minimum, min(limit, self.maximum))
+        self.successes = 0
+        METRICS.set("llm_concurrency_limit", self.limit)
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def on_success(self, headers):
+        headroom = None
+        reset = 0.0
+        for kind in ("requests", "tokens"):
+            try:
+                limit = float(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = float(headers.get(f"x-ratelimit-remaining-{kind}"))
+            except (TypeError, ValueError):
+                continue
+            if limit > 0:
+                share = remaining / limit
+                headroom = share if headroom is None else min(headroom, share)
+                if remaining <= 0:
+                    reset = max(reset, _reset_seconds(headers.get(f"x-ratelimit-reset-{kind}")) or 1.0)
+
+        with self.condition:
+            if reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            if headroom is not None and headroom < LOW_HEADROOM:
+                self._set_limit(int(self.limit * 0.75))
+                return
+            self.successes += 1
+            if self.successes >= self.limit:
+                self._set_limit(self.limit + 1)
+                self._notify()
+
+    def on_rate_limited(self, seconds):
+        with self.condition:
+            self._set_limit(self.limit // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class LLMGateway:
+    """Shared entry point for every OpenAI chat completion.
+
+    Requests go through one AdaptiveLimiter, time out after timeout seconds
+    and are retried on rate limits, timeouts, connection and server errors
+    with full-jitter exponential backoff (or the server's Retry-After), up to
+    max_retries times. Requests, retries, latency and tokens are recorded per
+    stage. The OpenAI client is passed in, so pointing it at another base URL
+    (e.g. scripts/llm_stub_server.py) swaps the backend.
+    """
+
+    def __init__(self, client, max_concurrency=16, initial_concurrency=4, max_retries=4,
+                 timeout=60, max_backoff=30):
+        self.client = client
+        self.limiter = AdaptiveLimiter(initial_concurrency, 1, max_concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def _record(self, stage, **values):
+        with self.lock:
+            stats = self.stages.setdefault(stage, {
+                "requests": 0, "failures": 0, "retries": 0, "seconds": 0.0, "tokens": 0})
+            for name, value in values.items():
+                stats[name] += value
+
+    def stats(self):
+        """Per-stage totals plus the current concurrency limit"""
+        with self.lock:
+            stages = {stage: dict(stats, seconds=round(stats["seconds"], 3))
+                      for stage, stats in self.stages.items()}
+        return {"concurrency_limit": self.limiter.limit, "stages": stages}
+
+    def _succeeded(self, stage, raw, start):
+        response = raw.parse()
+        elapsed = time.monotonic() - start
+        self.limiter.on_success(raw.headers)
+        usage = getattr(response, "usage", None)
+        tokens = (usage.total_tokens or 0) if usage else 0
+        self._record(stage, requests=1, seconds=elapsed, tokens=tokens)
+        METRICS.inc("llm_requests_total", stage=stage, outcome="ok")
+        METRICS.inc("llm_request_seconds_total", elapsed, stage=stage)
+        METRICS.inc("llm_stage_tokens_total", tokens, stage=stage)
+        return response
+
+    def _failed(self, stage, start):
+        elapsed = time.monotonic() - start
+        self._record(stage, requests=1, failures=1, seconds=elapsed)
+        METRICS.inc("llm_requests_total", stage=stage, outcome="failed")
+        METRICS.inc("llm_request_seconds_total", elapsed, stage=stage)
+
+    def _backoff(self, stage, error, attempt, start):
+        """Seconds to wait before the next attempt; re-raises once out of attempts"""
+        if attempt >= self.max_retries:
+            self._failed(stage, start)
+            raise error
+        response = getattr(error, "response", None)
+        delay = _retry_after(response.headers) if response is not None else None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, 2 ** attempt))
+        delay = min(delay, self.max_backoff)
+        if isinstance(error, openai.RateLimitError):
+            self.limiter.on_rate_limited(delay)
+        self._record(stage, retries=1)
+        METRICS.inc("llm_retries_total", error=type(error).__name__)
+        return delay
+
+    def create(self, stage="llm", **request):
+        """chat.completions.create with rate limiting, retries and accounting"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                raw = self.client.chat.completions.with_raw_response.create(
+                    timeout=self.timeout, **request)
+                return self._succeeded(stage, raw, start)
+            except RETRYABLE_ERRORS as e:
+                error = e
+            except Exception:
+                self._failed(stage, start)
+                raise
+            finally:
+                self.limiter.release()
+            time.sleep(self._backoff(stage, error, attempt, start))
+            attempt += 1
+
+    async def acreate(self, client, stage="llm", **request):
+        """create() for an AsyncOpenAI client, sharing the same limiter"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            await self.limiter.acquire_async()
+            try:
+                raw = await client.chat.completions.with_raw_response.create(
+                    timeout=self.timeout, **request)
+                return self._succeeded(stage, raw, start)
+            except RETRYABLE_ERRORS as e:
+                error = e
+            except Exception:
+                self._failed(stage, start)
+                raise
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(self._backoff(stage, error, attempt, start))
+            attempt += 1
@@ -0,0 +1,51 @@
+import hashlib
+import json
+from threading import Lock
+
+
+class LLMCache:
+    """Persistent cache of parsed LLM responses.
+
+    Keys combine the model, a hash of the full prompt (system instructions plus
+    the user's prompt setting) and a hash of the whitespace-normalized content,
+    so the same article text under a different URL reuses earlier answers.
+    Entries expire after ttl_days and the least recently used entries are
+    evicted beyond max_entries.
+    """
+
+    def __init__(self, storage, ttl_days=30, max_entries=50000):
+        self.storage = storage
+        self.ttl_days = ttl_days
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def key(self, model, prompt, content):
+        normalized = " ".join(content.split())
+        return self._hash(f"{model}:{self._hash(prompt)}:{self._hash(normalized)}")
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        response = self.storage.get_llm_cache(key, self.ttl_days)
+        with self.lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(response)
+
+    def set(self, key, result):
+        self.storage.save_llm_cache(key, json.dumps(result))
+
+    def evict(self):
+        """Drop expired entries and the least recently used ones over the limit"""
+        return self.storage.evict_llm_cache(self.ttl_days, self.max_entries)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,138 @@
+import random
+import re
+import struct
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Lock
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Mersenne prime for the universal hash family of the MinHash permutations
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of relevant articles with an LSH index.
+
+    The same story syndicated by several sources has near-identical text but
+    different URLs. Each candidate is checked before any LLM call: if its
+    estimated Jaccard similarity (over word shingles) to an indexed article
+    reaches threshold, it is recorded as related to that article and skipped.
+
+    A claimed article is only persisted by commit() once it has been
+    summarized; release() drops a claim whose article turned out irrelevant
+    or failed, together with the duplicates found for it, so that those are
+    checked again on the next run.
+    """
+
+    def __init__(self, storage, threshold=0.8, num_perm=64, bands=16, shingle_size=5,
+                 max_age_days=14):
+        self.storage = storage
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        generator = random.Random(1)
+        self.permutations = [
+            (generator.randrange(1, PRIME), generator.randrange(0, PRIME))
+            for _ in range(num_perm)
+        ]
+        self.lock = Lock()
+        self.signatures = {}
+        self.buckets = defaultdict(set)
+        self.pending = set()
+        self.duplicates = defaultdict(list)
+        self.stats = {"checked": 0, "duplicates": 0}
+
+        since = datetime.now() - timedelta(days=max_age_days)
+        storage.evict_article_signatures(since)
+        for url, packed in storage.get_article_signatures(since):
+            signature = struct.unpack(f"<{num_perm}I", packed)
+            self._add(url, signature)
+
+    def signature(self, content):
+        """MinHash signature over the word shingles of a text"""
+        tokens = TOKEN_PATTERN.findall(content.lower())
+        size = self.shingle_size
+        shingles = {
+            zlib.crc32(" ".join(tokens[i:i + size]).encode("utf-8"))
+            for i in range(max(1, len(tokens) - size + 1))
+        }
+        return tuple(
+            min(((a * shingle + b) % PRIME) & MAX_HASH for shingle in shingles)
+            for a, b in self.permutations)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def _add(self, url, signature):
+        self.signatures[url] = signature
+        for key in self._band_keys(signature):
+            self.buckets[key].add(url)
+
+    def similarity(self, first, second):
+        return sum(a == b for a, b in zip(first, second)) / self.num_perm
+
+    def claim(self, url, content):
+        """Check an article, claiming it if it duplicates nothing
+
+        Returns (original, recorded): the URL this article nearly duplicates,
+        or None after claiming it, and whether the duplicate was recorded
+        right away because its original is stored already. Otherwise it is
+        recorded when the original is committed.
+        """
+        signature = self.signature(content)
+        with self.lock:
+            self.stats["checked"] += 1
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+            best, best_similarity = None, self.threshold
+            for candidate in candidates:
+                similarity = self.similarity(signature, self.signatures[candidate])
+                if candidate != url and similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            if best is not None:
+                self.stats["duplicates"] += 1
+                self.duplicates[best].append((url, best_similarity))
+                if best not in self.pending:
+                    # Related to an article stored by an earlier run
+                    duplicates = self.duplicates.pop(best)
+                else:
+                    duplicates = None
+            else:
+                self._add(url, signature)
+                self.pending.add(url)
+                return None, False
+        if duplicates:
+            self.storage.save_article_duplicates(best, duplicates)
+        return best, bool(duplicates)
+
+    def commit(self, url):
+        """Persist a claimed article and the duplicates found for it
+
+        Returns the URLs of the duplicates that were recorded.
+        """
+        with self.lock:
+            if url not in self.pending:
+                return []
+            self.pending.discard(url)
+            signature = self.signatures[url]
+            duplicates = self.duplicates.pop(url, [])
+        self.storage.save_article_signature(
+            url, struct.pack(f"<{self.num_perm}I", *signature), duplicates)
+        return [duplicate for duplicate, _ in duplicates]
+
+    def release(self, url):
+        """Drop a claim, e.g. because the article was not relevant"""
+        with self.lock:
+            if url not in self.pending:
+                return
+            self.pending.discard(url)
+            signature = self.signatures.pop(url)
+            for key in self._band_keys(signature):
+                self.buckets[key].discard(url)
+            self.duplicates.pop(url, None)
@@ -1,61 +1,150 @@
 from datetime import datetime
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
+from utils.clustering import cluster_articles
+from utils.runs import NullRun
 from utils.podcast import PodcastGenerator
+from utils.resources import get_llm
 
 class NewsletterGenerator:
 
-    def __init__(self):
+    def __init__(self, run=None, mode="auto", cluster_size=12, concurrency=4,
+                 section_budget=24000):
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.podcast_gen = PodcastGenerator()
+        self.llm = get_llm()
+        self.run = run or NullRun()
+        self.podcast_gen = PodcastGenerator(run=run)
+        # "single" sends every article in one prompt, "map_reduce" writes one
+        # section per topic cluster first, "auto" picks map_reduce when the
+        # articles do not fit in one cluster
+        self.mode = mode
+        self.cluster_size = cluster_size
+        self.concurrency = concurrency
+        # Most characters of sections sent in one prompt; beyond it sections
+        # are merged in rounds until they fit
+        self.section_budget = section_budget
+
+    @staticmethod
+    def _articles_data(articles):
+        articles_data = []
+        for article in articles:
+            data = {
+                "title": article["title"],
+                "summary": article["summary"],
+                "url": article["url"]
+            }
+            # Other sources that published the same story
+            if article.get("related_urls"):
+                data["also_reported_by"] = article["related_urls"]
+            articles_data.append(data)
+        return articles_data
+
+    def _complete(self, system_prompt, user_prompt):
+        response = self.llm.create(
+            "newsletter",
+            model="gpt-4o-mini",
+            messages=[{
+                "role": "system",
+                "content": system_prompt
+            }, {
+                "role": "user",
+                "content": user_prompt
+            }])
+        self.run.record_usage(response)
+        return response.choices[0].message.content
 
     def generate_newsletter(self, articles, template, create_podcast=False, podcast_prompt=""):
         """Generate a newsletter from the collected articles using the template"""
         try:
-            # Prepare articles data
-            articles_data = []
-            for article in articles:
-                articles_data.append({
-                    "title": article["title"],
-                    "summary": article["summary"],
-                    "url": article["url"]
-                })
-
-            # Use OpenAI to generate the newsletter
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{
-                    "role":
-                    "system",
-                    "content":
-                    "You are a newsletter generator. "
-                    "Create a newsletter using the provided template and articles. "
-                    "The newsletter should be well-structured and engaging."
-                }, {
-                    "role":
-                    "user",
-                    "content":
-                    f"Template:\n{template}\n\n"
-                    f"Articles:\n{json.dumps(articles_data, indent=2)}"
-                }])
-
-            newsletter_content = response.choices[0].message.content
-
-            result = {
-                "date": datetime.now().isoformat(),
-                "content": newsletter_content,
-                "articles": articles_data
-            }
+            articles_data = self._articles_data(articles)
+            use_map_reduce = self.mode == "map_reduce" or (
+                self.mode == "auto" and len(articles) > self.cluster_size)
+
+            with ThreadPoolExecutor(max_workers=max(2, self.concurrency)) as executor:
+                if use_map_reduce:
+                    sections = self._reduce_sections(
+                        self._generate_sections(articles, executor), executor)
+                    content = executor.submit(self._assemble_newsletter, sections, template)
+                else:
+                    sections = None
+                    content = executor.submit(self._single_newsletter, articles_data, template)
+
+                # The podcast script does not depend on the newsletter text,
+                # so both are generated at the same time
+                podcast = None
+                if create_podcast and podcast_prompt:
+                    podcast = executor.submit(
+                        self.podcast_gen.generate_podcast_script,
+                        articles, podcast_prompt, sections)
 
-            # Generate podcast script if enabled
-            if create_podcast and podcast_prompt:
-                result["podcast_script"] = self.podcast_gen.generate_podcast_script(
-                    articles, podcast_prompt
-                )
+                result = {
+                    "date": datetime.now().isoformat(),
+                    "content": content.result(),
+                    "articles": articles_data
+                }
+                if podcast:
+                    result["podcast_script"] = podcast.result()
 
             return result
         except Exception as e:
-            raise Exception(f"Failed to generate newsletter: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to generate newsletter: {str(e)}")
+
+    def _single_newsletter(self, articles_data, template):
+        return self._complete(
+            "You are a newsletter generator. "
+            "Create a newsletter using the provided template and articles. "
+            "The newsletter should be well-structured and engaging.",
+            f"Template:\n{template}\n\n"
+            f"Articles:\n{json.dumps(articles_data, ensure_ascii=False)}")
+
+    def _generate_sections(self, articles, executor):
+        """Map step: one section per topic cluster, generated in parallel"""
+        clusters = cluster_articles(articles, max_cluster_size=self.cluster_size)
+        print(f"Generating {len(clusters)} newsletter sections from {len(articles)} articles")
+        return list(executor.map(self._generate_section, clusters))
+
+    def _generate_section(self, articles):
+        return self._complete(
+            "You are a newsletter editor. "
+            "Write one newsletter section covering the provided articles. "
+            "Start with a short heading naming their common topic, then cover each "
+            "article in a sentence or two with a markdown link to its URL. "
+            "Write in the language of the articles.",
+            f"Articles:\n{json.dumps(self._articles_data(articles), ensure_ascii=False)}")
+
+    def _reduce_sections(self, sections, executor):
+        """Merge groups of sections in rounds until all of them fit in section_budget"""
+        while len(sections) > 1 and len("\n\n".join(sections)) > self.section_budget:
+            groups = [[]]
+            for section in sections:
+                group = groups[-1]
+                # Every group takes at least two sections so that each round shrinks
+                if len(group) >= 2 and len("\n\n".join(group + [section])) > self.section_budget:
+                    groups.append([section])
+                else:
+                    group.append(section)
+            print(f"Merging {len(sections)} newsletter sections into {len(groups)}")
+            sections = list(executor.map(self._merge_sections, groups))
+        return sections
+
+    def _merge_sections(self, sections):
+        if len(sections) == 1:
+            return sections[0]
+        return self._complete(
+            "You are a newsletter editor. "
+            "Merge the provided newsletter sections into one shorter section. "
+            "Group related stories under short headings, keep every article link "
+            "and write in the language of the sections.",
+            "Sections:\n" + "\n\n".join(sections))
+
+    def _assemble_newsletter(self, sections, template):
+        """Reduce step: fit the sections into the template"""
+        return self._complete(
+            "You are a newsletter generator. "
+            "Create a newsletter using the provided template from the provided "
+            "sections. Keep every article link. "
+            "The newsletter should be well-structured and engaging.",
+            f"Template:\n{template}\n\n"
+            "Sections:\n" + "\n\n".join(sections))
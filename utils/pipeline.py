@@ -0,0 +1,236 @@
+import queue
+import threading
+
+# Marks the end of a stage's input
+DONE = object()
+
+
+class StreamingPipeline:
+    """Streaming crawl engine built from stages joined by bounded queues.
+
+    discover -> fetch -> extract -> classify -> summarize -> persist
+
+    Each stage runs in its own worker threads and blocks when the queue to
+    the next stage is full, so memory is bounded by the queue sizes rather
+    than by the number of articles. Articles are saved in small batches as
+    soon as they are summarized, so a run that dies midway keeps everything
+    summarized so far.
+    """
+
+    def __init__(self, processor, save_articles, queue_size=50, fetch_workers=8,
+                 extract_workers=2, summarize_workers=4, persist_batch_size=10,
+                 flush_interval=2.0):
+        self.processor = processor
+        self.save_articles = save_articles
+        self.queue_size = queue_size
+        self.fetch_workers = fetch_workers
+        self.extract_workers = extract_workers
+        self.summarize_workers = summarize_workers
+        self.persist_batch_size = persist_batch_size
+        self.flush_interval = flush_interval
+
+    @property
+    def run(self):
+        return self.processor.run
+
+    def _update_status(self, message, status_callback=None):
+        self.processor._update_status(message, status_callback)
+
+    def _error(self, url, error, source):
+        self.run.count("errors", source=source)
+        self._update_status(f"Fel vid bearbetning av artikel {url}: {error}")
+
+    def process(self, urls, interest_prompt, summary_prompt, status_callback=None):
+        """Crawl all source URLs, saving relevant articles as they are summarized"""
+        self.interest_prompt = interest_prompt
+        self.summary_prompt = summary_prompt
+        self.status_callback = status_callback
+        self.new_links = {}
+
+        sources = queue.Queue()
+        for url in urls:
+            sources.put(url)
+        links, pages, candidates, relevant, results = (
+            queue.Queue(maxsize=self.queue_size) for _ in range(5))
+
+        stages = [
+            (self._discover, sources, (links, candidates), min(5, max(1, len(urls)))),
+            (self._fetch, links, (pages,), self.fetch_workers),
+            (self._extract, pages, (candidates,), self.extract_workers),
+            (self._classify, candidates, (relevant,), 1),
+            (self._summarize, relevant, (results,), self.summarize_workers),
+            (self._persist, results, (), 1),
+        ]
+        threads = []
+        for function, inbox, outboxes, workers in stages:
+            threads.append([
+                threading.Thread(target=self._worker, args=(function, inbox, outboxes), daemon=True)
+                for _ in range(workers)
+            ])
+            for thread in threads[-1]:
+                thread.start()
+
+        # Close the stages in order: once every worker of a stage is done,
+        # the workers of the next stage each get a DONE marker
+        for position, workers in enumerate(threads):
+            inbox = stages[position][1]
+            for _ in workers:
+                inbox.put(DONE)
+            for thread in workers:
+                thread.join()
+
+        # Only remember a source page once all its articles went through,
+        # otherwise failed articles would be skipped until the page changes
+        fetch_cache = self.processor.fetch_cache
+        if fetch_cache:
+            for url, new_links in self.new_links.items():
+                if all(fetch_cache.has(link) for link in new_links):
+                    fetch_cache.commit(url)
+
+    def _worker(self, function, inbox, outboxes):
+        try:
+            function(inbox, *outboxes)
+        except Exception as e:
+            self._update_status(f"Pipeline stage {function.__name__} failed: {str(e)}",
+                                self.status_callback)
+            # Keep draining so that upstream stages never block on a full queue
+            for _ in self._items(inbox):
+                pass
+
+    def _items(self, inbox):
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                return
+            yield item
+
+    def _batches(self, inbox, size):
+        """Group items into batches, flushing a partial batch when input stalls"""
+        batch = []
+        while True:
+            try:
+                item = inbox.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if batch:
+                    yield batch
+                    batch = []
+                continue
+            if item is DONE:
+                if batch:
+                    yield batch
+                return
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+
+    def _discover(self, sources, links, candidates):
+        for url in self._items(sources):
+            try:
+                self._update_status(f"Hämtar innehåll från: {url}", self.status_callback)
+                with self.run.source(url):
+                    content, article_links = self.processor.fetch_article(url)
+                if content is None:
+                    self.run.count("unchanged_sources", source=url)
+                    self._update_status(
+                        f"Oförändrad sedan förra körningen: {url}", self.status_callback)
+                    continue
+
+                # The source page itself may be relevant too
+                if self.processor._passes_prefilter(content):
+                    candidates.put((url, content, url))
+
+                new_links = self.processor._unseen_links(article_links)
+                self.new_links[url] = new_links
+                self.run.count("candidates", len(new_links), source=url)
+                self.run.count("known", len(article_links) - len(new_links), source=url)
+                if new_links:
+                    self._update_status(
+                        f"Hittade {len(new_links)} potentiella artikellänkar", self.status_callback)
+                for link in new_links:
+                    links.put((link, url))
+            except Exception as e:
+                self.run.count("errors", source=url)
+                self._update_status(f"Error processing URL {url}: {str(e)}", self.status_callback)
+
+    def _fetch(self, links, pages):
+        for article_url, source in self._items(links):
+            try:
+                self._update_status(f"Kontrollerar artikel: {article_url}")
+                html = self.processor.download(article_url)
+                if html is None:
+                    self.run.count("unchanged", source=source)
+                    continue
+                if not html:
+                    raise Exception("Could not download the content")
+                pages.put((article_url, html, source))
+            except Exception as e:
+                self._error(article_url, f"Failed to fetch article: {str(e)}", source)
+
+    def _extract(self, pages, candidates):
+        processor = self.processor
+        for article_url, html, source in self._items(pages):
+            try:
+                with self.run.stage("extract"):
+                    content, _ = processor.extraction_pool.extract(html, article_url)
+            except Exception as e:
+                self._error(article_url, f"Failed to fetch article: {str(e)}", source)
+                continue
+            if not processor._passes_prefilter(content):
+                self.run.count("prefilter_rejected", source=source)
+                if processor.fetch_cache:
+                    processor.fetch_cache.commit(article_url)
+                continue
+            if processor._is_near_duplicate(article_url, content, source):
+                continue
+            candidates.put((article_url, content, source))
+
+    def _classify(self, candidates, relevant):
+        processor = self.processor
+        for batch in self._batches(candidates, max(1, processor.relevance_batch_size)):
+            verdicts = processor.check_relevance_batch(
+                [content for _, content, _ in batch], self.interest_prompt)
+            for (article_url, content, source), (is_relevant, reason) in zip(batch, verdicts):
+                if is_relevant is None:
+                    processor._settle_near_duplicate(article_url, False)
+                    self._error(article_url, reason, source)
+                elif is_relevant:
+                    relevant.put((article_url, content, source))
+                else:
+                    processor._settle_near_duplicate(article_url, False)
+                    self.run.count("irrelevant", source=source)
+                    # Source pages are not article candidates and stay unrejected
+                    if processor.seen_urls is not None and article_url != source:
+                        processor.seen_urls.reject(article_url, reason)
+                    if processor.fetch_cache and article_url != source:
+                        processor.fetch_cache.commit(article_url)
+
+    def _summarize(self, relevant, results):
+        processor = self.processor
+        for article_url, content, source in self._items(relevant):
+            try:
+                title, summary = processor.summarize_article(content, self.summary_prompt)
+            except Exception as e:
+                processor._settle_near_duplicate(article_url, False)
+                self._error(article_url, str(e), source)
+                continue
+            self.run.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {title}")
+            results.put((processor._build_article(article_url, title, summary, content), source))
+
+    def _persist(self, results):
+        processor = self.processor
+        for batch in self._batches(results, self.persist_batch_size):
+            try:
+                self.save_articles([article for article, _ in batch])
+            except Exception as e:
+                for article, source in batch:
+                    processor._settle_near_duplicate(article["url"], False)
+                    self._error(article["url"], f"Failed to save article: {str(e)}", source)
+                continue
+            # Remember pages only once their article is stored, so that a
+            # failed save is retried on the next run
+            for article, source in batch:
+                processor._settle_near_duplicate(article["url"], True)
+                if processor.fetch_cache and article["url"] != source:
+                    processor.fetch_cache.commit(article["url"])
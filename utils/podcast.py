@@ -1,29 +1,40 @@
 from datetime import datetime
-from openai import OpenAI
 import os
 import json
+from utils.runs import NullRun
+from utils.resources import get_llm
 
 class PodcastGenerator:
 
-    def __init__(self):
+    def __init__(self, run=None):
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm = get_llm()
+        self.run = run or NullRun()
 
-    def generate_podcast_script(self, articles, prompt):
-        """Generate a podcast script from the articles using the prompt"""
+    def generate_podcast_script(self, articles, prompt, sections=None):
+        """Generate a podcast script from the articles using the prompt
+
+        When newsletter sections are given the script is based on them
+        instead of on every article, which keeps the prompt bounded.
+        """
         try:
-            # Prepare articles data
-            articles_data = []
-            for article in articles:
-                articles_data.append({
-                    "title": article["title"],
-                    "summary": article["summary"],
-                    "url": article["url"]
-                })
+            if sections:
+                source = "Newsletter sections:\n" + "\n\n".join(sections)
+            else:
+                # Prepare articles data
+                articles_data = []
+                for article in articles:
+                    articles_data.append({
+                        "title": article["title"],
+                        "summary": article["summary"],
+                        "url": article["url"]
+                    })
+                source = f"Articles:\n{json.dumps(articles_data, ensure_ascii=False)}"
 
             # Use OpenAI to generate the podcast script
-            response = self.openai.chat.completions.create(
+            response = self.llm.create(
+                "podcast",
                 model="gpt-4o-mini",
                 messages=[{
                     "role": "system",
@@ -48,11 +59,11 @@ class PodcastGenerator:
                     "}"
                 }, {
                     "role": "user",
-                    "content": f"Prompt:\n{prompt}\n\n"
-                    f"Articles:\n{json.dumps(articles_data, indent=2)}"
+                    "content": f"Prompt:\n{prompt}\n\n{source}"
                 }],
                 response_format={"type": "json_object"}
             )
+            self.run.record_usage(response)
 
             # Parse the response
             podcast_data = json.loads(response.choices[0].message.content)
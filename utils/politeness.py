@@ -0,0 +1,218 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from utils.runs import METRICS
+
+USER_AGENT = "Mozilla/5.0 (compatible; IntelligentMonitoring/1.0)"
+# Responses that ask us to slow down and come back later
+RETRY_STATUSES = (429, 503)
+# How long a robots.txt that could not be fetched is treated as allowing all
+ROBOTS_ERROR_TTL = 600
+
+METRICS.describe("crawl_host_wait_seconds_total", "Seconds fetches waited for per-host rate limits and backoff")
+METRICS.describe("crawl_host_retries_total", "Fetches retried after a 429 or 503 response")
+METRICS.describe("crawl_robots_disallowed_total", "Fetches skipped because robots.txt disallows them")
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    reserve() takes a token now and returns how long the caller must wait
+    before using it, so the same bucket serves threads (time.sleep) and
+    coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class HostState:
+    def __init__(self, rate, burst, per_host_limit):
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        self.slots = threading.BoundedSemaphore(per_host_limit)
+        self.robots_lock = threading.Lock()
+        self.robots = None
+        self.robots_expires = 0.0
+
+
+class HostPolicy:
+    """Per-host politeness for every page fetch, shared by all crawl engines.
+
+    Each host gets a token bucket of rate requests per second (slowed down
+    to its robots.txt Crawl-delay), at most per_host_limit concurrent
+    requests, and a cached robots.txt. A 429 or 503 response blocks the host
+    for its Retry-After, or an exponential backoff with jitter, before the
+    request is retried up to max_retries times.
+
+    get() is the blocking fetch path for requests sessions; the async engine
+    uses the same bookkeeping through wait_time(), retry_delay() and the
+    robots methods.
+    """
+
+    def __init__(self, user_agent, rate=2.0, burst=4, per_host_limit=4, respect_robots=True,
+                 max_retries=3, max_backoff=120, robots_ttl=86400):
+        self.user_agent = user_agent
+        self.rate = rate
+        self.burst = burst
+        self.per_host_limit = per_host_limit
+        self.respect_robots = respect_robots
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.robots_ttl = robots_ttl
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    @staticmethod
+    def host(url):
+        return urlparse(url).netloc.lower()
+
+    def configure(self, rate, burst, per_host_limit, respect_robots, max_retries):
+        """Apply the current settings; per-host state is only reset when they changed"""
+        settings = (rate, burst, per_host_limit, respect_robots, max_retries)
+        with self.lock:
+            if settings == (self.rate, self.burst, self.per_host_limit, self.respect_robots,
+                            self.max_retries):
+                return
+            (self.rate, self.burst, self.per_host_limit, self.respect_robots,
+             self.max_retries) = settings
+            self.hosts = {}
+
+    def state(self, url):
+        host = self.host(url)
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostState(self.rate, self.burst, self.per_host_limit)
+            return self.hosts[host]
+
+    def wait_time(self, url):
+        """Reserve the next request slot of the host; returns seconds to wait first"""
+        state = self.state(url)
+        now = time.monotonic()
+        with self.lock:
+            wait = max(state.bucket.reserve(now), state.blocked_until - now)
+        if wait > 0:
+            METRICS.inc("crawl_host_wait_seconds_total", wait)
+        return wait
+
+    def retry_delay(self, url, status_code, headers, attempt):
+        """Backoff before retrying a response, or None when it is final
+
+        The host stays blocked for the delay, so other requests to it wait
+        too instead of piling onto a host that asked us to slow down.
+        """
+        if status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+            return None
+        delay = parse_retry_after(headers.get("Retry-After"))
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, 2 ** (attempt + 1)))
+        delay = min(delay, self.max_backoff)
+        state = self.state(url)
+        with self.lock:
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        METRICS.inc("crawl_host_retries_total", status=str(status_code))
+        return delay
+
+    @staticmethod
+    def robots_url(url):
+        parts = urlparse(url)
+        return f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+    def needs_robots(self, url):
+        if not self.respect_robots:
+            return False
+        state = self.state(url)
+        return state.robots is None or state.robots_expires < time.monotonic()
+
+    def set_robots(self, url, status_code, text):
+        """Cache the robots.txt of a host from its response; status_code None means it failed"""
+        parser = RobotFileParser()
+        ttl = self.robots_ttl
+        if status_code == 200:
+            parser.parse(text.splitlines())
+        elif status_code is not None and 400 <= status_code < 500:
+            # No robots.txt: everything is allowed
+            parser.parse([])
+        else:
+            # Unreachable: allow for now and ask again soon
+            parser.parse([])
+            ttl = ROBOTS_ERROR_TTL
+        state = self.state(url)
+        delay = parser.crawl_delay(self.user_agent)
+        with self.lock:
+            state.robots = parser
+            state.robots_expires = time.monotonic() + ttl
+            if delay:
+                state.bucket.rate = min(self.rate, 1 / float(delay))
+                state.bucket.burst = 1
+            else:
+                state.bucket.rate = self.rate
+                state.bucket.burst = self.burst
+
+    def can_fetch(self, url):
+        if not self.respect_robots:
+            return True
+        robots = self.state(url).robots
+        if robots is None or robots.can_fetch(self.user_agent, url):
+            return True
+        METRICS.inc("crawl_robots_disallowed_total")
+        return False
+
+    def _fetch_robots(self, session, url):
+        robots_url = self.robots_url(url)
+        time.sleep(self.wait_time(url))
+        try:
+            response = session.get(robots_url, timeout=10)
+            self.set_robots(url, response.status_code, response.text)
+        except Exception:
+            self.set_robots(url, None, "")
+
+    def get(self, session, url, **kwargs):
+        """GET a URL with a requests session, within the limits of its host"""
+        if self.needs_robots(url):
+            # One thread fetches it while the others of the host wait
+            with self.state(url).robots_lock:
+                if self.needs_robots(url):
+                    self._fetch_robots(session, url)
+        if not self.can_fetch(url):
+            raise Exception(f"Disallowed by robots.txt: {url}")
+        with self.state(url).slots:
+            attempt = 0
+            while True:
+                time.sleep(self.wait_time(url))
+                response = session.get(url, **kwargs)
+                if self.retry_delay(url, response.status_code, response.headers, attempt) is None:
+                    return response
+                response.close()
+                attempt += 1
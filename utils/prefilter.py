@@ -0,0 +1,75 @@
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+EXCLUDE_PATTERN = re.compile(r"^\s*(exclude|exkludera|uteslut)\b", re.IGNORECASE)
+STEM_LENGTH = 6
+
+STOPWORDS = {
+    # English
+    "a", "about", "all", "an", "and", "any", "are", "articles", "as", "at", "be",
+    "by", "focus", "for", "from", "in", "include", "interested", "into", "is",
+    "it", "its", "like", "new", "news", "of", "on", "or", "related", "such",
+    "that", "the", "their", "this", "to", "topics", "with",
+    # Swedish
+    "alla", "allt", "av", "och", "artiklar", "att", "den", "det", "en", "ett",
+    "fokus", "för", "i", "inom", "med", "nyheter", "om", "på", "relaterade",
+    "som", "till", "är",
+}
+
+
+def _stem(token):
+    # Crude prefix stemming that lets "regulation" match "regulatory" and
+    # Swedish inflections match their base form
+    return token[:STEM_LENGTH]
+
+
+def _tokens(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def terms(text):
+    """Stemmed, stopword-free terms of a text"""
+    return [_stem(token) for token in _tokens(text)]
+
+
+class KeywordPrefilter:
+    """Cheap local relevance score run before the LLM relevance check.
+
+    Scores article text against the terms of the interest prompt with BM25-style
+    term-frequency saturation and length normalization. Terms listed after an
+    "Exclude:" line of the prompt are ignored. Any object with the same
+    score()/accepts() interface can be plugged into ArticleProcessor instead.
+    """
+
+    def __init__(self, interest_prompt, threshold, k1=1.2, b=0.75, average_length=600):
+        self.threshold = threshold
+        self.k1 = k1
+        self.b = b
+        self.average_length = average_length
+        self.terms = set()
+        for line in interest_prompt.splitlines():
+            if EXCLUDE_PATTERN.match(line):
+                break
+            self.terms.update(_stem(token) for token in _tokens(line))
+
+    def score(self, content):
+        """Score in [0, 1]; the share of interest terms found, weighted by frequency"""
+        if not self.terms:
+            return 1.0
+        tokens = _tokens(content)
+        frequencies = {}
+        for token in tokens:
+            stem = _stem(token)
+            if stem in self.terms:
+                frequencies[stem] = frequencies.get(stem, 0) + 1
+        length_norm = 1 - self.b + self.b * len(tokens) / self.average_length
+        total = sum(
+            tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+            for tf in frequencies.values())
+        # Relative to a text matching every term often, scaled by sqrt(terms)
+        # so that long prompts are not dominated by terms an article skips
+        return min(1.0, total / (len(self.terms) * (self.k1 + 1)) * math.sqrt(len(self.terms)))
+
+    def accepts(self, content):
+        return self.score(content) >= self.threshold
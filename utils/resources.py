@@ -0,0 +1,109 @@
+import atexit
+import os
+from threading import Lock
+
+from openai import AsyncOpenAI, OpenAI
+
+from utils.llm import LLMGateway
+from utils.politeness import USER_AGENT, HostPolicy
+from utils.runs import METRICS
+from utils.storage import Storage
+
+# Process-wide shared resources, created on first use. Storage owns the one
+# database connection pool (and runs the DDL once); the OpenAI client keeps
+# its own pool of HTTP connections and is safe to share between threads, and
+# the LLM gateway wraps it with one concurrency limit for the whole process.
+# The host policy keeps robots.txt and per-host rate limits across runs.
+_lock = Lock()
+_storage = None
+_openai = None
+_llm = None
+_host_policy = None
+
+METRICS.describe("db_pool_connections", "Database connections by state")
+METRICS.describe("db_pool_checkouts", "Database connection checkouts, waits for a free connection and timeouts")
+
+
+def get_storage():
+    """The process-wide Storage and its connection pool"""
+    global _storage
+    with _lock:
+        if _storage is None:
+            _storage = Storage(max_connections=int(os.getenv("DB_POOL_MAX", "10")))
+        return _storage
+
+
+def _openai_options():
+    # The gateway does the retrying; OPENAI_BASE_URL points the clients at
+    # another endpoint such as scripts/llm_stub_server.py
+    return {
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "max_retries": 0,
+    }
+
+
+def get_openai():
+    """The process-wide OpenAI client"""
+    global _openai
+    with _lock:
+        if _openai is None:
+            _openai = OpenAI(**_openai_options())
+        return _openai
+
+
+def new_async_openai():
+    """A new AsyncOpenAI client; it is bound to the event loop it is used in"""
+    return AsyncOpenAI(**_openai_options())
+
+
+def get_llm():
+    """The process-wide LLMGateway that all chat completions go through"""
+    global _llm
+    client = get_openai()
+    with _lock:
+        if _llm is None:
+            _llm = LLMGateway(
+                client,
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+                initial_concurrency=int(os.getenv("LLM_INITIAL_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")))
+        return _llm
+
+
+def get_host_policy():
+    """The process-wide HostPolicy; callers configure it from the current settings"""
+    global _host_policy
+    with _lock:
+        if _host_policy is None:
+            _host_policy = HostPolicy(USER_AGENT)
+        return _host_policy
+
+
+def update_pool_metrics():
+    """Copy the connection pool statistics into the metrics registry"""
+    if _storage is None:
+        return
+    stats = _storage.pool_stats()
+    METRICS.set("db_pool_connections", stats["max"], state="max")
+    METRICS.set("db_pool_connections", stats["open"], state="open")
+    METRICS.set("db_pool_connections", stats["in_use"], state="in_use")
+    for event in ("checkouts", "waits", "timeouts"):
+        METRICS.set("db_pool_checkouts", stats[event], event=event)
+
+
+def close():
+    """Close the shared resources, e.g. at interpreter exit"""
+    global _storage, _openai, _llm
+    with _lock:
+        _llm = None
+        if _openai is not None:
+            _openai.close()
+            _openai = None
+        if _storage is not None:
+            _storage.close()
+            _storage = None
+
+
+atexit.register(close)
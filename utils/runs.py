@@ -0,0 +1,191 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+STAGES = ("fetch", "extract", "relevance", "summarize", "save", "newsletter")
+
+
+class Metrics:
+    """Process-wide counters rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def render(self):
+        lines = []
+        with self.lock:
+            series = [(key, value, "counter") for key, value in self.counters.items()]
+            series += [(key, value, "gauge") for key, value in self.gauges.items()]
+        seen = set()
+        for (name, labels), value, kind in sorted(series):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe("pipeline_runs_total", "Finished pipeline runs by final status")
+METRICS.describe("pipeline_runs_in_progress", "Pipeline runs currently executing")
+METRICS.describe("pipeline_stage_seconds_total", "Wall-clock seconds spent per pipeline stage")
+METRICS.describe("pipeline_stage_calls_total", "Number of times each pipeline stage ran")
+METRICS.describe("pipeline_articles_total", "Articles seen by the pipeline by outcome")
+METRICS.describe("llm_tokens_total", "OpenAI tokens used by token type")
+
+# Runs currently executing in this process, by run ID
+ACTIVE_RUNS = {}
+ACTIVE_RUNS_LOCK = Lock()
+
+
+class NullRun:
+    """Stand-in used when no run is being tracked"""
+
+    id = None
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    @contextmanager
+    def source(self, url):
+        yield
+
+    def count(self, name, value=1, source=None):
+        pass
+
+    def record_usage(self, response):
+        pass
+
+
+class RunTracker:
+    """One pipeline run: persisted status plus timings, counts and token usage.
+
+    Stage timings are summed across threads, so a stage can account for more
+    seconds than the run's wall-clock time when it runs in parallel.
+    """
+
+    def __init__(self, storage, trigger="scheduled"):
+        self.storage = storage
+        self.trigger = trigger
+        self.started_at = datetime.now()
+        self.status = "running"
+        self.error = None
+        self.lock = Lock()
+        self.stages = {stage: {"calls": 0, "seconds": 0.0} for stage in STAGES}
+        self.sources = {}
+        self.counts = {}
+        self.tokens = {"prompt": 0, "completion": 0, "total": 0}
+        self.id = storage.create_run(trigger, self.started_at)
+        with ACTIVE_RUNS_LOCK:
+            ACTIVE_RUNS[self.id] = self
+        METRICS.set("pipeline_runs_in_progress", len(ACTIVE_RUNS))
+
+    @contextmanager
+    def stage(self, name):
+        """Time one execution of a pipeline stage"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+                stage["calls"] += 1
+                stage["seconds"] += elapsed
+            METRICS.inc("pipeline_stage_calls_total", stage=name)
+            METRICS.inc("pipeline_stage_seconds_total", elapsed, stage=name)
+
+    @contextmanager
+    def source(self, url):
+        """Time the processing of one source URL"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self._source(url)["seconds"] = round(time.monotonic() - start, 3)
+
+    def _source(self, url):
+        return self.sources.setdefault(url, {"seconds": None, "counts": {}})
+
+    def count(self, name, value=1, source=None):
+        """Add to a run counter such as candidates, relevant, duplicates or errors"""
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+            if source:
+                counts = self._source(source)["counts"]
+                counts[name] = counts.get(name, 0) + value
+        METRICS.inc("pipeline_articles_total", value, outcome=name)
+
+    def record_usage(self, response):
+        """Add the token usage of an OpenAI response"""
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        with self.lock:
+            self.tokens["prompt"] += usage.prompt_tokens or 0
+            self.tokens["completion"] += usage.completion_tokens or 0
+            self.tokens["total"] += usage.total_tokens or 0
+        METRICS.inc("llm_tokens_total", usage.prompt_tokens or 0, type="prompt")
+        METRICS.inc("llm_tokens_total", usage.completion_tokens or 0, type="completion")
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "trigger": self.trigger,
+                "status": self.status,
+                "error": self.error,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": None,
+                "metrics": self._metrics()
+            }
+
+    def _metrics(self):
+        return {
+            "stages": {
+                name: {"calls": stage["calls"], "seconds": round(stage["seconds"], 3)}
+                for name, stage in self.stages.items()
+            },
+            "sources": self.sources,
+            "counts": self.counts,
+            "tokens": self.tokens
+        }
+
+    def finish(self, status="completed", error=None):
+        """Persist the final state of the run"""
+        with self.lock:
+            self.status = status
+            self.error = error
+            metrics = self._metrics()
+        self.storage.finish_run(self.id, status, error, datetime.now(), metrics)
+        with ACTIVE_RUNS_LOCK:
+            ACTIVE_RUNS.pop(self.id, None)
+        METRICS.set("pipeline_runs_in_progress", len(ACTIVE_RUNS))
+        METRICS.inc("pipeline_runs_total", status=status)
+
+
+def get_active_run(run_id):
+    with ACTIVE_RUNS_LOCK:
+        return ACTIVE_RUNS.get(run_id)
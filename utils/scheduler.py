@@ -4,34 +4,180 @@ import threading
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.article_processor import ArticleProcessor
-from utils.storage import Storage
+from utils.crawler import AsyncCrawler
+from utils.extraction import ExtractionPool
+from utils.fetch_cache import FetchCache
+from utils.llm_cache import LLMCache
+from utils.near_duplicates import NearDuplicateIndex
+from utils.pipeline import StreamingPipeline
+from utils.prefilter import KeywordPrefilter
+from utils.resources import get_host_policy, get_storage
+from utils.runs import NullRun, RunTracker
+from utils.seen_urls import SeenUrlIndex
+from utils.source_schedule import SourceScheduler, record_source_crawls
+from utils.work_queue import QueueWorker, drain_queue
 from utils.newsletter import NewsletterGenerator
 
-def process_urls(status_callback=None):
-    """Process all URLs and generate newsletter"""
-    storage = Storage()
-    processor = ArticleProcessor()
+def process_urls(status_callback=None, engine=None, run=None, urls=None, newsletter=True):
+    """Process all URLs and generate newsletter
 
+    engine selects the crawl engine: "threads" (default), "async", "stream" or
+    "queue". When not given it is read from the crawl_engine setting. run is
+    the RunTracker that records this run; a new one is created when not given.
+    urls limits the crawl to these sources, and newsletter=False skips the
+    newsletter. Returns the run ID.
+    """
+    storage = get_storage()
+    run = run or RunTracker(storage)
+    try:
+        _process_urls(storage, run, status_callback, engine, urls, newsletter)
+    except Exception as e:
+        run.finish("failed", str(e))
+        raise
+    return run.id
+
+def _process_urls(storage, run, status_callback, engine, urls, newsletter):
     # Get configuration
-    urls = storage.get_urls()
+    if urls is None:
+        urls = storage.get_urls()
     interest_prompt = storage.get_setting("interest_prompt")
     summary_prompt = storage.get_setting("summary_prompt")
+    engine = engine or storage.get_setting("crawl_engine", "threads")
 
     if not interest_prompt or not summary_prompt:
         error_msg = "Missing prompts configuration"
         if status_callback:
             status_callback(error_msg)
         print(error_msg)
+        run.finish("failed", error_msg)
         return
 
+    if urls:
+        crawl(storage, run, urls, interest_prompt, summary_prompt, status_callback, engine)
+        record_source_crawls(
+            storage, run, urls,
+            min_interval=int(storage.get_setting("crawl_min_interval_minutes", "30")),
+            max_interval=int(storage.get_setting("crawl_max_interval_minutes", "1440")))
+
+    if newsletter:
+        # Generate newsletter after processing all URLs
+        if status_callback:
+            status_callback("Generating newsletter...")
+        with run.stage("newsletter"):
+            generate_daily_newsletter(run)
+        if status_callback:
+            status_callback("Newsletter generated!")
+    run.finish("completed")
+
+def crawl(storage, run, urls, interest_prompt, summary_prompt, status_callback, engine):
+    """Crawl the sources with the selected engine, saving relevant articles"""
+    processor = build_processor(storage, run, interest_prompt)
+    print(f"Loaded {len(processor.seen_urls)} known article URLs")
+
+    try:
+        if engine == "async":
+            crawler = AsyncCrawler(
+                processor,
+                max_concurrency=int(storage.get_setting("crawl_concurrency", "20")),
+                per_host_limit=int(storage.get_setting("crawl_per_host_limit", "4")))
+            articles = crawler.run(urls, interest_prompt, summary_prompt, status_callback)
+            save_articles(storage, articles, status_callback, run)
+            processor.commit_saved(articles, urls)
+        elif engine == "stream":
+            pipeline = StreamingPipeline(
+                processor,
+                lambda articles: save_articles(storage, articles, status_callback, run),
+                queue_size=int(storage.get_setting("stream_queue_size", "50")),
+                fetch_workers=int(storage.get_setting("stream_fetch_workers", "8")),
+                summarize_workers=int(storage.get_setting("stream_summarize_workers", "4")))
+            pipeline.process(urls, interest_prompt, summary_prompt, status_callback)
+        elif engine == "queue":
+            crawl_with_queue(processor, storage, urls, interest_prompt, summary_prompt,
+                             status_callback, run)
+        else:
+            crawl_with_threads(processor, storage, urls, interest_prompt, summary_prompt,
+                               status_callback, run)
+    finally:
+        processor.extraction_pool.shutdown()
+
+    if processor.prefilter:
+        stats = processor.prefilter_stats
+        msg = f"Pre-filter rejected {stats['rejected']} of {stats['checked']} candidates"
+        if status_callback:
+            status_callback(msg)
+        print(msg)
+
+    if processor.llm_cache:
+        stats = processor.llm_cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses")
+
+    if processor.near_duplicates:
+        stats = processor.near_duplicates.stats
+        msg = f"Skipped {stats['duplicates']} near-duplicates of {stats['checked']} candidates"
+        if status_callback:
+            status_callback(msg)
+        print(msg)
+
+def build_processor(storage, run=None, interest_prompt=None):
+    """ArticleProcessor with the caches and filters enabled in the settings"""
+    interest_prompt = interest_prompt or storage.get_setting("interest_prompt")
+    prefilter = None
+    prefilter_threshold = float(storage.get_setting("prefilter_threshold", "0"))
+    if prefilter_threshold > 0:
+        prefilter = KeywordPrefilter(interest_prompt, prefilter_threshold)
+
+    fetch_cache = None
+    if storage.get_setting("use_fetch_cache", "true") == "true":
+        fetch_cache = FetchCache(storage, context=f"{interest_prompt}\n{prefilter_threshold}")
+    seen_urls = SeenUrlIndex(storage, interest_prompt)
+    llm_cache = None
+    if storage.get_setting("use_llm_cache", "true") == "true":
+        llm_cache = LLMCache(
+            storage,
+            ttl_days=int(storage.get_setting("llm_cache_ttl_days", "30")),
+            max_entries=int(storage.get_setting("llm_cache_max_entries", "50000")))
+        llm_cache.evict()
+    near_duplicates = None
+    if storage.get_setting("use_near_duplicates", "true") == "true":
+        near_duplicates = NearDuplicateIndex(
+            storage, threshold=float(storage.get_setting("near_duplicate_threshold", "0.8")))
+    # Shared by every run, so robots.txt is not fetched again on each crawl
+    host_policy = get_host_policy()
+    host_policy.configure(
+        rate=float(storage.get_setting("crawl_host_rate", "2")),
+        burst=int(storage.get_setting("crawl_host_burst", "4")),
+        per_host_limit=int(storage.get_setting("crawl_per_host_limit", "4")),
+        respect_robots=storage.get_setting("respect_robots_txt", "true") == "true",
+        max_retries=int(storage.get_setting("crawl_max_retries", "3")))
+    extraction_pool = ExtractionPool(int(storage.get_setting("extraction_workers", "0")))
+    return ArticleProcessor(
+        fetch_cache=fetch_cache,
+        seen_urls=seen_urls,
+        llm_cache=llm_cache,
+        prefilter=prefilter,
+        extraction_pool=extraction_pool,
+        run=run,
+        relevance_batch_size=int(storage.get_setting("relevance_batch_size", "10")),
+        relevance_batch_tokens=int(storage.get_setting("relevance_batch_tokens", "12000")),
+        near_duplicates=near_duplicates,
+        host_policy=host_policy)
+
+def crawl_with_threads(processor, storage, urls, interest_prompt, summary_prompt,
+                       status_callback=None, run=None):
+    """Threaded crawl engine: one thread per source, saving articles per source"""
+    run = run or NullRun()
+
     def process_single_url(url):
         """Process a single URL and its articles"""
         try:
             if status_callback:
                 status_callback(f"Processing source: {url}")
             print(f"\nProcessing source: {url}")
-            return processor.process_article(url, interest_prompt, summary_prompt, status_callback)
+            with run.source(url):
+                return processor.process_article(
+                    url, interest_prompt, summary_prompt, status_callback)
         except Exception as e:
+            run.count("errors", source=url)
             error_msg = f"Error processing URL {url}: {str(e)}"
             if status_callback:
                 status_callback(error_msg)
@@ -39,43 +185,80 @@ def process_urls(status_callback=None):
             return []
 
     # Process URLs in parallel with max 5 workers
-    processed_articles = []
     with ThreadPoolExecutor(max_workers=5) as executor:
         future_to_url = {executor.submit(process_single_url, url): url for url in urls}
 
         for future in as_completed(future_to_url):
             articles = future.result()
-            if articles:
-                for article in articles:
-                    # Check for duplicates
-                    with storage.get_conn() as conn:
-                        with conn.cursor() as cur:
-                            cur.execute("SELECT 1 FROM news_articles WHERE url = %s", (article["url"],))
-                            if cur.fetchone():
-                                msg = f"Skipping duplicate article: {article['url']}"
-                                if status_callback:
-                                    status_callback(msg)
-                                print(msg)
-                                continue
-
-                    # Save new article
-                    storage.save_article(article)
-                    msg = f"Saved new article: {article['title']}"
-                    if status_callback:
-                        status_callback(msg)
-                    print(msg)
-
-    # Generate newsletter after processing all URLs
-    if status_callback:
-        status_callback("Generating newsletter...")
-    generate_daily_newsletter()
-    if status_callback:
-        status_callback("Newsletter generated!")
-
-def generate_daily_newsletter():
+            save_articles(storage, articles, status_callback, run)
+            processor.commit_saved(articles, [future_to_url[future]])
+
+def crawl_with_queue(processor, storage, urls, interest_prompt, summary_prompt,
+                     status_callback=None, run=None):
+    """Queue crawl engine: durable per-URL tasks drained by lease-holding workers
+
+    Tasks left open by an interrupted run are picked up again, and any
+    scripts/crawl_worker.py processes sharing the database help drain the
+    queue. Returns once no task is open.
+    """
+    run = run or NullRun()
+    storage.evict_tasks(datetime.now() - timedelta(days=7))
+    queued = storage.enqueue_tasks(run.id, "source", urls)
+    open_tasks = storage.count_open_tasks()
+    if open_tasks > queued:
+        msg = f"Resuming {open_tasks - queued} unfinished crawl tasks"
+        if status_callback:
+            status_callback(msg)
+        print(msg)
+
+    workers = [
+        QueueWorker(
+            storage, processor, interest_prompt, summary_prompt,
+            lambda articles: save_articles(storage, articles, status_callback, run),
+            lease_seconds=int(storage.get_setting("queue_lease_seconds", "300")),
+            max_attempts=int(storage.get_setting("queue_max_attempts", "3")))
+        for _ in range(max(1, int(storage.get_setting("queue_workers", "8"))))
+    ]
+    drain_queue(workers, status_callback)
+
+    failed = storage.get_queue_stats().get("failed", 0)
+    if failed:
+        print(f"{failed} crawl tasks failed after {workers[0].max_attempts} attempts")
+
+def save_articles(storage, articles, status_callback=None, run=None):
+    """Save processed articles in one round trip, skipping URLs that are already stored"""
+    run = run or NullRun()
+    if not articles:
+        return
+    with run.stage("save"):
+        inserted = storage.save_articles(articles)
+
+    for article in articles:
+        if article["url"] not in inserted:
+            run.count("duplicates")
+            msg = f"Skipping duplicate article: {article['url']}"
+            if status_callback:
+                status_callback(msg)
+            print(msg)
+            continue
+
+        # A URL repeated within the batch is only reported once
+        inserted.pop(article["url"])
+        run.count("saved")
+        msg = f"Saved new article: {article['title']}"
+        if status_callback:
+            status_callback(msg)
+        print(msg)
+
+def generate_daily_newsletter(run=None):
     """Generate the daily newsletter"""
-    storage = Storage()
-    newsletter_gen = NewsletterGenerator()
+    storage = get_storage()
+    newsletter_gen = NewsletterGenerator(
+        run=run,
+        mode=storage.get_setting("newsletter_mode", "auto"),
+        cluster_size=int(storage.get_setting("newsletter_cluster_size", "12")),
+        concurrency=int(storage.get_setting("newsletter_concurrency", "4")),
+        section_budget=int(storage.get_setting("newsletter_section_budget", "24000")))
 
     # Get template and podcast settings
     template = storage.get_setting("newsletter_template")
@@ -106,19 +289,29 @@ def generate_daily_newsletter():
 # Store the current scheduler thread to be able to stop it
 current_scheduler_thread = None
 
-def run_scheduler(newsletter_time):
+def run_scheduler(newsletter_time, coordinator):
     """Run the scheduler continuously"""
     # Clear any existing jobs
     schedule.clear()
 
-    # Generate newsletter at specified time
-    schedule.every().day.at(newsletter_time).do(process_urls)
+    # Jobs go through the coordinator so that they never overlap a manually
+    # started run
+    sources = None
+    if get_storage().get_setting("crawl_schedule", "adaptive") == "adaptive":
+        # Each source is crawled when it is due; the daily job only writes
+        # the newsletter from what was collected
+        sources = SourceScheduler(get_storage(), coordinator)
+        schedule.every().day.at(newsletter_time).do(coordinator.submit, "scheduled", urls=[])
+    else:
+        # Generate newsletter at specified time, crawling every source first
+        schedule.every().day.at(newsletter_time).do(coordinator.submit, "scheduled")
 
-    while True:
+    # A restart starts a new thread; this one stops once it is replaced
+    while current_scheduler_thread is threading.current_thread():
         schedule.run_pending()
-        time.sleep(60)
+        time.sleep(sources.tick() if sources else 60)
 
-def start_scheduler(newsletter_time="08:00"):
+def start_scheduler(newsletter_time, coordinator):
     """Start or restart the scheduler with new settings"""
     global current_scheduler_thread
 
@@ -130,7 +323,7 @@ def start_scheduler(newsletter_time="08:00"):
     # Start new scheduler thread
     current_scheduler_thread = threading.Thread(
         target=run_scheduler,
-        args=(newsletter_time,),
+        args=(newsletter_time, coordinator),
         daemon=True
     )
     current_scheduler_thread.start()
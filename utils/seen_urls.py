@@ -0,0 +1,38 @@
+import hashlib
+from threading import Lock
+
+
+class SeenUrlIndex:
+    """In-process index of article URLs that need no further LLM work.
+
+    Loaded once per run with every stored article URL plus the URLs rejected as
+    irrelevant under the current interest prompt. Changing the prompt therefore
+    gives previously rejected articles a new chance.
+    """
+
+    def __init__(self, storage, interest_prompt):
+        self.storage = storage
+        self.prompt_hash = hashlib.sha256(interest_prompt.encode("utf-8")).hexdigest()
+        self.urls = storage.get_seen_urls(self.prompt_hash)
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __contains__(self, url):
+        with self.lock:
+            return url in self.urls
+
+    def claim(self, url):
+        """Mark a URL as taken by this run; False if it was already seen"""
+        with self.lock:
+            if url in self.urls:
+                return False
+            self.urls.add(url)
+            return True
+
+    def reject(self, url, reason):
+        """Remember that the URL was judged irrelevant"""
+        with self.lock:
+            self.urls.add(url)
+        self.storage.save_rejected_url(url, self.prompt_hash, reason)
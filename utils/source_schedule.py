@@ -0,0 +1,125 @@
+import heapq
+import random
+from datetime import datetime, timedelta
+
+# Interval of a source that has never been crawled, in minutes
+DEFAULT_INTERVAL = 360
+# New links a crawl should find on average; sources are crawled just often
+# enough to reach it
+TARGET_NEW_LINKS = 3
+# Weight of the latest observation in the smoothed change rate
+RATE_SMOOTHING = 0.3
+
+
+def adapt_interval(source, new_links, crawled_at, min_interval, max_interval):
+    """Next (crawl_interval, change_rate) of a source after a crawl
+
+    change_rate is a smoothed estimate of new links per hour. The interval
+    aims at TARGET_NEW_LINKS new links per crawl, moves by at most a factor
+    of two per crawl and stays within [min_interval, max_interval] minutes.
+    """
+    interval = source.get("crawl_interval") or DEFAULT_INTERVAL
+    if source.get("last_crawled_at"):
+        elapsed = (crawled_at - source["last_crawled_at"]).total_seconds() / 3600
+    else:
+        elapsed = interval / 60
+    rate = new_links / max(elapsed, 1 / 60)
+    change_rate = source.get("change_rate")
+    change_rate = rate if change_rate is None else (
+        RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * change_rate)
+
+    if change_rate > 0:
+        target = TARGET_NEW_LINKS / change_rate * 60
+    else:
+        target = interval * 2
+    interval = min(max(target, interval / 2), interval * 2)
+    return round(min(max(interval, min_interval), max_interval)), change_rate
+
+
+def record_source_crawls(storage, run, urls, min_interval, max_interval):
+    """Adapt the schedule of the sources a run crawled to what it found
+
+    Crawl times are taken from the database clock, which is also what due
+    sources are claimed by.
+    """
+    crawled_at = storage.get_database_time()
+    schedule = {source["url"]: source for source in storage.get_source_schedule()}
+    for url in urls:
+        source = schedule.get(url)
+        if source is None:
+            continue
+        counts = run.sources.get(url, {}).get("counts", {})
+        if "candidates" in counts or "unchanged_sources" in counts:
+            interval, change_rate = adapt_interval(
+                source, counts.get("candidates", 0), crawled_at, min_interval, max_interval)
+        else:
+            # The source page could not be fetched: nothing was learned
+            interval = source.get("crawl_interval") or DEFAULT_INTERVAL
+            change_rate = source.get("change_rate")
+        # Jitter spreads sources with equal intervals over the day
+        storage.update_source_schedule(
+            url, interval, change_rate, interval * random.uniform(0.9, 1.1))
+
+
+class SourceScheduler:
+    """Starts a crawl of each source when it is due, earliest first.
+
+    The schedule is kept in a heap of (next_crawl_at, url) that is refreshed
+    from monitored_urls, where runs store the adapted intervals. Due sources
+    are claimed in the database before they are submitted, so several server
+    processes can run a scheduler each. Crawls go through the coordinator,
+    which coalesces them with a run already in progress. Due times are
+    compared against the database clock, measured at each refresh, since
+    the schedule is written and claimed by it.
+    """
+
+    def __init__(self, storage, coordinator, refresh_seconds=60):
+        self.storage = storage
+        self.coordinator = coordinator
+        self.refresh_seconds = refresh_seconds
+        self.heap = []
+        self.clock_offset = timedelta(0)
+
+    def now(self):
+        """The current time by the database clock"""
+        return datetime.now() + self.clock_offset
+
+    def refresh(self):
+        self.clock_offset = self.storage.get_database_time() - datetime.now()
+        self.heap = [
+            (source["next_crawl_at"] or datetime.min, source["url"])
+            for source in self.storage.get_source_schedule()
+        ]
+        heapq.heapify(self.heap)
+
+    def run_due(self, now=None):
+        """Submit a crawl of every due source; returns the submitted URLs"""
+        now = now or self.now()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[1])
+        if not due:
+            return []
+        # Until the run records the adapted schedule, retry after an hour
+        claimed = self.storage.claim_due_sources(due, 60)
+        if claimed:
+            print(f"Crawling {len(claimed)} due sources")
+            self.coordinator.submit("adaptive", urls=claimed, newsletter=False)
+        return claimed
+
+    def seconds_until_due(self, now=None):
+        """Time to sleep before the next source is due, at most refresh_seconds"""
+        if not self.heap:
+            return self.refresh_seconds
+        now = now or self.now()
+        wait = (self.heap[0][0] - now).total_seconds() if self.heap[0][0] > now else 0
+        return min(max(wait, 1), self.refresh_seconds)
+
+    def tick(self):
+        """Submit the due sources and return how many seconds to sleep"""
+        try:
+            self.refresh()
+            self.run_due()
+        except Exception as e:
+            print(f"Adaptive crawl scheduling failed: {str(e)}")
+        return self.seconds_until_due()
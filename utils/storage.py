@@ -1,25 +1,94 @@
 import os
 import json
+import time
 from datetime import datetime
 import urllib.parse
 import psycopg2
 from psycopg2.pool import ThreadedConnectionPool
-from psycopg2.extras import DictCursor
+from psycopg2.extras import DictCursor, execute_values
 from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+
+# Text search configurations used for indexing and querying
+SEARCH_CONFIGS = ("swedish", "english")
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+
+# Summary projection of a newsletter for list endpoints
+NEWSLETTER_SUMMARY = """
+    id, date, left(content, 500) AS preview,
+    jsonb_array_length(articles) AS article_count,
+    podcast_script IS NOT NULL AS has_podcast,
+    podcast_script->'podcast'->>'title' AS podcast_title,
+    podcast_script->'podcast'->>'episode' AS podcast_episode,
+    podcast_script->'podcast'->>'theme' AS podcast_theme,
+    audio_url
+"""
+
+
+def _search_vector(*weighted_columns):
+    """SQL for a tsvector over the given (column, weight) pairs in every config"""
+    return " || ".join(
+        f"setweight(to_tsvector('{config}', coalesce({column}, '')), '{weight}')"
+        for config in SEARCH_CONFIGS
+        for column, weight in weighted_columns)
+
+
+def _search_query():
+    """SQL for a tsquery matching the %(query)s parameter in any config"""
+    return " || ".join(
+        f"websearch_to_tsquery('{config}', %(query)s)" for config in SEARCH_CONFIGS)
+
+
+def _headline(column):
+    """SQL for a highlighted snippet of a column, in the config that matched"""
+    first, second = SEARCH_CONFIGS
+    return f"""
+        CASE WHEN to_tsvector('{first}', {column}) @@ websearch_to_tsquery('{first}', %(query)s)
+        THEN ts_headline('{first}', {column}, websearch_to_tsquery('{first}', %(query)s), '{HEADLINE_OPTIONS}')
+        ELSE ts_headline('{second}', {column}, websearch_to_tsquery('{second}', %(query)s), '{HEADLINE_OPTIONS}')
+        END"""
+
 
 class Storage:
-    def __init__(self):
+    def __init__(self, max_connections=10, checkout_timeout=30, settings_ttl=5):
+        self.max_connections = max_connections
+        self.checkout_timeout = checkout_timeout
         self.pool = ThreadedConnectionPool(
             minconn=1,
-            maxconn=10,
+            maxconn=max_connections,
             dsn=os.getenv('DATABASE_URL')
         )
+        # ThreadedConnectionPool raises once maxconn is reached; the semaphore
+        # makes callers wait for a free connection instead
+        self.slots = BoundedSemaphore(max_connections)
+        self.stats_lock = Lock()
+        self.stats = {"in_use": 0, "checkouts": 0, "waits": 0, "timeouts": 0}
+        self.settings_lock = Lock()
+        self.settings = {}
+        self.settings_version = None
+        self.settings_checked_at = float("-inf")
+        self.settings_ttl = settings_ttl
         self.create_tables()
 
     @contextmanager
     def get_conn(self):
         """Get a database connection from the pool"""
-        conn = self.pool.getconn()
+        if not self.slots.acquire(blocking=False):
+            with self.stats_lock:
+                self.stats["waits"] += 1
+            if not self.slots.acquire(timeout=self.checkout_timeout):
+                with self.stats_lock:
+                    self.stats["timeouts"] += 1
+                raise Exception("Failed to get a database connection: pool exhausted")
+        try:
+            conn = self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+        with self.stats_lock:
+            self.stats["in_use"] += 1
+            self.stats["checkouts"] += 1
         try:
             yield conn
             conn.commit()
@@ -28,6 +97,20 @@ class Storage:
             raise
         finally:
             self.pool.putconn(conn)
+            with self.stats_lock:
+                self.stats["in_use"] -= 1
+            self.slots.release()
+
+    def pool_stats(self):
+        """Connection pool usage: size, connections in use and checkout counters"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["max"] = self.max_connections
+        stats["open"] = len(self.pool._pool) + len(self.pool._used)
+        return stats
+
+    def close(self):
+        self.pool.closeall()
 
     def create_tables(self):
         """Create database tables if they don't exist"""
@@ -41,12 +124,34 @@ class Storage:
                     )
                 """)
 
+                # Bumped on every settings change so that cached settings,
+                # also those of other processes, can be revalidated cheaply
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS app_settings_version (
+                        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                        version BIGINT NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    INSERT INTO app_settings_version (id, version) VALUES (TRUE, 0)
+                    ON CONFLICT (id) DO NOTHING
+                """)
+
                 # URLs table
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS monitored_urls (
                         url TEXT PRIMARY KEY
                     )
                 """)
+                # Adaptive crawl schedule: interval in minutes, new links per
+                # hour observed, and when the source is due next
+                cur.execute("""
+                    ALTER TABLE monitored_urls
+                        ADD COLUMN IF NOT EXISTS crawl_interval INTEGER,
+                        ADD COLUMN IF NOT EXISTS change_rate REAL,
+                        ADD COLUMN IF NOT EXISTS last_crawled_at TIMESTAMP,
+                        ADD COLUMN IF NOT EXISTS next_crawl_at TIMESTAMP
+                """)
 
                 # Articles table
                 cur.execute("""
@@ -60,6 +165,131 @@ class Storage:
                     )
                 """)
 
+                # Enforce one row per article URL, dropping duplicates left
+                # behind by earlier check-then-insert races
+                cur.execute("""
+                    DO $$
+                    BEGIN
+                        IF NOT EXISTS (
+                            SELECT 1
+                            FROM pg_indexes
+                            WHERE tablename = 'news_articles'
+                            AND indexname = 'news_articles_url_key'
+                        ) THEN
+                            DELETE FROM news_articles a
+                            USING news_articles b
+                            WHERE a.url = b.url AND a.id > b.id;
+                            CREATE UNIQUE INDEX news_articles_url_key ON news_articles (url);
+                        END IF;
+                    END $$;
+                """)
+
+                # Articles rejected as irrelevant, per interest prompt
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS rejected_urls (
+                        url TEXT NOT NULL,
+                        prompt_hash TEXT NOT NULL,
+                        reason TEXT,
+                        rejected_date TIMESTAMP NOT NULL,
+                        PRIMARY KEY (url, prompt_hash)
+                    )
+                """)
+
+                # Conditional fetch cache
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS fetch_cache (
+                        url TEXT PRIMARY KEY,
+                        etag TEXT,
+                        last_modified TEXT,
+                        body_hash TEXT NOT NULL,
+                        fetched_at TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    ALTER TABLE fetch_cache ADD COLUMN IF NOT EXISTS context_hash TEXT
+                """)
+
+                # Cached LLM responses keyed by model, prompt and content
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        created_at TIMESTAMP NOT NULL,
+                        last_used TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS llm_cache_last_used_idx ON llm_cache (last_used)
+                """)
+
+                # MinHash signatures of relevant articles, for near-duplicate
+                # detection across sources
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS article_signatures (
+                        url TEXT PRIMARY KEY,
+                        signature BYTEA NOT NULL,
+                        created_at TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS article_signatures_created_at_idx
+                    ON article_signatures (created_at)
+                """)
+
+                # Articles skipped as near-duplicates of a stored article
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS article_duplicates (
+                        url TEXT PRIMARY KEY,
+                        duplicate_of TEXT NOT NULL,
+                        similarity REAL NOT NULL,
+                        found_at TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS article_duplicates_duplicate_of_idx
+                    ON article_duplicates (duplicate_of)
+                """)
+
+                # Durable crawl work queue, drained by workers that lease
+                # tasks with FOR UPDATE SKIP LOCKED
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS crawl_tasks (
+                        id BIGSERIAL PRIMARY KEY,
+                        run_id INTEGER,
+                        kind TEXT NOT NULL,
+                        url TEXT NOT NULL,
+                        source TEXT,
+                        state TEXT NOT NULL DEFAULT 'pending',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        lease_expires TIMESTAMP,
+                        worker TEXT,
+                        error TEXT,
+                        created_at TIMESTAMP NOT NULL DEFAULT now(),
+                        updated_at TIMESTAMP NOT NULL DEFAULT now()
+                    )
+                """)
+                cur.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS crawl_tasks_open_url_key
+                    ON crawl_tasks (url) WHERE state IN ('pending', 'leased')
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS crawl_tasks_state_idx
+                    ON crawl_tasks (state, lease_expires)
+                """)
+
+                # Pipeline runs with their timings, counts and token usage
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS pipeline_runs (
+                        id SERIAL PRIMARY KEY,
+                        trigger TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        error TEXT,
+                        started_at TIMESTAMP NOT NULL,
+                        finished_at TIMESTAMP,
+                        metrics JSONB
+                    )
+                """)
+
                 # Newsletters table
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS news_newsletters (
@@ -71,21 +301,97 @@ class Storage:
                     )
                 """)
 
+                cur.execute("""
+                    ALTER TABLE news_newsletters ADD COLUMN IF NOT EXISTS audio_url TEXT
+                """)
+
+                # Keyset pagination indexes for the newest-first list endpoints
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS news_newsletters_date_idx
+                    ON news_newsletters (date DESC, id DESC)
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS news_articles_processed_date_idx
+                    ON news_articles (processed_date DESC, id DESC)
+                """)
+
+                # Full-text search. Content is Swedish or English, so each
+                # document is indexed with both configurations.
+                cur.execute(f"""
+                    ALTER TABLE news_newsletters ADD COLUMN IF NOT EXISTS search_vector tsvector
+                    GENERATED ALWAYS AS ({_search_vector(("content", "A"))}) STORED
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS news_newsletters_search_idx
+                    ON news_newsletters USING GIN (search_vector)
+                """)
+                cur.execute(f"""
+                    ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS search_vector tsvector
+                    GENERATED ALWAYS AS ({_search_vector(("title", "A"), ("summary", "B"), ("content", "C"))}) STORED
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS news_articles_search_idx
+                    ON news_articles USING GIN (search_vector)
+                """)
+
+    def get_settings(self):
+        """Snapshot of all settings, served from memory
+
+        The snapshot is revalidated against the settings version at most
+        every settings_ttl seconds and reloaded in one query when it changed.
+        """
+        with self.settings_lock:
+            if time.monotonic() - self.settings_checked_at < self.settings_ttl:
+                return dict(self.settings)
+            with self.get_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT version FROM app_settings_version")
+                    version = cur.fetchone()[0]
+                    if version != self.settings_version:
+                        cur.execute("SELECT key, value FROM app_settings")
+                        self.settings = dict(cur.fetchall())
+                        self.settings_version = version
+            self.settings_checked_at = time.monotonic()
+            return dict(self.settings)
+
     def get_setting(self, key, default=""):
-        with self.get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT value FROM app_settings WHERE key = %s", (key,))
-                result = cur.fetchone()
-                return result[0] if result else default
+        return self.get_settings().get(key, default)
+
+    def save_settings(self, settings):
+        """Write settings in one transaction and return the keys whose value changed"""
+        rows = [(key, value) for key, value in settings.items()]
+        if not rows:
+            return set()
+        with self.settings_lock:
+            with self.get_conn() as conn:
+                with conn.cursor() as cur:
+                    changed = execute_values(cur, """
+                        INSERT INTO app_settings (key, value) 
+                        VALUES %s
+                        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                        WHERE app_settings.value IS DISTINCT FROM EXCLUDED.value
+                        RETURNING key
+                    """, rows, page_size=len(rows), fetch=True)
+                    changed = {row[0] for row in changed}
+                    if changed:
+                        cur.execute("""
+                            UPDATE app_settings_version SET version = version + 1
+                            RETURNING version
+                        """)
+                        version = cur.fetchone()[0]
+            if changed:
+                # Our own write is visible at once; other processes pick it
+                # up when their snapshot is next revalidated. A write from
+                # another process in between is caught by the version check.
+                if self.settings_version is not None and version == self.settings_version + 1:
+                    self.settings.update({key: settings[key] for key in changed})
+                    self.settings_version = version
+                else:
+                    self.settings_checked_at = float("-inf")
+            return changed
 
     def save_setting(self, key, value):
-        with self.get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO app_settings (key, value) 
-                    VALUES (%s, %s)
-                    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
-                """, (key, value))
+        self.save_settings({key: value})
 
     def add_url(self, url):
         try:
@@ -112,12 +418,60 @@ class Storage:
                 cur.execute("SELECT url FROM monitored_urls")
                 return [row[0] for row in cur.fetchall()]
 
+    def get_source_schedule(self):
+        """Crawl schedule of every monitored URL; never crawled ones have no times"""
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT url, crawl_interval, change_rate, last_crawled_at, next_crawl_at
+                    FROM monitored_urls
+                    ORDER BY next_crawl_at NULLS FIRST
+                """)
+                return [dict(row) for row in cur.fetchall()]
+
+    def claim_due_sources(self, urls, lease_minutes):
+        """Push the next crawl of due sources lease_minutes ahead; returns the claimed URLs
+
+        Only sources that are still due are claimed, so schedulers in several
+        processes never start the same crawl twice.
+        """
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE monitored_urls
+                    SET next_crawl_at = LOCALTIMESTAMP + make_interval(mins => %s)
+                    WHERE url = ANY(%s)
+                        AND (next_crawl_at IS NULL OR next_crawl_at <= LOCALTIMESTAMP)
+                    RETURNING url
+                """, (lease_minutes, list(urls)))
+                return [row[0] for row in cur.fetchall()]
+
+    def update_source_schedule(self, url, crawl_interval, change_rate, next_crawl_minutes):
+        """Record a crawl of a source now and schedule the next one next_crawl_minutes ahead"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE monitored_urls
+                    SET crawl_interval = %s, change_rate = %s,
+                        last_crawled_at = LOCALTIMESTAMP,
+                        next_crawl_at = LOCALTIMESTAMP + make_interval(secs => %s * 60)
+                    WHERE url = %s
+                """, (crawl_interval, change_rate, next_crawl_minutes, url))
+
+    def get_database_time(self):
+        """The database clock, which the crawl schedule is kept in"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT LOCALTIMESTAMP")
+                return cur.fetchone()[0]
+
     def save_article(self, article):
         with self.get_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO news_articles (url, title, summary, content, processed_date)
                     VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (url) DO NOTHING
                 """, (
                     article['url'],
                     article['title'],
@@ -126,17 +480,375 @@ class Storage:
                     article['processed_date']
                 ))
 
-    def get_recent_articles(self, limit=10):
+    def save_articles(self, articles):
+        """Insert articles in one statement, skipping URLs that are already stored
+
+        Returns a dict mapping the URL of each newly inserted article to its ID.
+        """
+        if not articles:
+            return {}
+        rows = {}
+        for article in articles:
+            rows.setdefault(article['url'], (
+                article['url'],
+                article['title'],
+                article['summary'],
+                article['content'],
+                article['processed_date']
+            ))
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                inserted = execute_values(cur, """
+                    INSERT INTO news_articles (url, title, summary, content, processed_date)
+                    VALUES %s
+                    ON CONFLICT (url) DO NOTHING
+                    RETURNING url, id
+                """, list(rows.values()), page_size=len(rows), fetch=True)
+                return {url: article_id for url, article_id in inserted}
+
+    def get_seen_urls(self, prompt_hash):
+        """Load stored article URLs, their near-duplicates and URLs rejected under the given prompt"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT url FROM news_articles
+                    UNION
+                    SELECT url FROM article_duplicates
+                    UNION
+                    SELECT url FROM rejected_urls WHERE prompt_hash = %s
+                """, (prompt_hash,))
+                return {row[0] for row in cur.fetchall()}
+
+    def save_rejected_url(self, url, prompt_hash, reason):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO rejected_urls (url, prompt_hash, reason, rejected_date)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (url, prompt_hash) DO NOTHING
+                """, (url, prompt_hash, reason, datetime.now()))
+
+    def get_fetch_cache(self):
+        """Load all conditional fetch cache entries keyed by URL"""
         with self.get_conn() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 cur.execute("""
-                    SELECT url, title, summary, processed_date 
-                    FROM news_articles 
-                    ORDER BY processed_date DESC 
+                    SELECT url, etag, last_modified, body_hash, context_hash FROM fetch_cache
+                """)
+                return {row['url']: dict(row) for row in cur.fetchall()}
+
+    def save_fetch_cache(self, url, entry):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO fetch_cache
+                        (url, etag, last_modified, body_hash, context_hash, fetched_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (url) DO UPDATE SET
+                        etag = EXCLUDED.etag,
+                        last_modified = EXCLUDED.last_modified,
+                        body_hash = EXCLUDED.body_hash,
+                        context_hash = EXCLUDED.context_hash,
+                        fetched_at = EXCLUDED.fetched_at
+                """, (
+                    url,
+                    entry['etag'],
+                    entry['last_modified'],
+                    entry['body_hash'],
+                    entry['context_hash'],
+                    entry['fetched_at']
+                ))
+
+    def get_llm_cache(self, key, ttl_days):
+        """Fetch a cached LLM response younger than ttl_days and mark it as used"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE llm_cache SET last_used = NOW()
+                    WHERE key = %s AND created_at > NOW() - make_interval(days => %s)
+                    RETURNING response
+                """, (key, ttl_days))
+                result = cur.fetchone()
+                return result[0] if result else None
+
+    def save_llm_cache(self, key, response):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO llm_cache (key, response, created_at, last_used)
+                    VALUES (%s, %s, NOW(), NOW())
+                    ON CONFLICT (key) DO UPDATE SET
+                        response = EXCLUDED.response,
+                        created_at = EXCLUDED.created_at,
+                        last_used = EXCLUDED.last_used
+                """, (key, response))
+
+    def evict_llm_cache(self, ttl_days, max_entries):
+        """Delete expired and least recently used cache entries, returning the count"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM llm_cache
+                    WHERE created_at <= NOW() - make_interval(days => %s)
+                """, (ttl_days,))
+                deleted = cur.rowcount
+                cur.execute("""
+                    DELETE FROM llm_cache
+                    WHERE key IN (
+                        SELECT key FROM llm_cache
+                        ORDER BY last_used DESC
+                        OFFSET %s
+                    )
+                """, (max_entries,))
+                return deleted + cur.rowcount
+
+    def get_article_signatures(self, since):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT url, signature FROM article_signatures WHERE created_at >= %s
+                """, (since,))
+                return [(url, bytes(signature)) for url, signature in cur.fetchall()]
+
+    def save_article_signature(self, url, signature, duplicates=()):
+        """Store an article's signature and the near-duplicates found for it"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO article_signatures (url, signature, created_at)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (url) DO UPDATE SET signature = EXCLUDED.signature
+                """, (url, psycopg2.Binary(signature), datetime.now()))
+                self._insert_duplicates(cur, url, duplicates)
+
+    def save_article_duplicates(self, url, duplicates):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                self._insert_duplicates(cur, url, duplicates)
+
+    def _insert_duplicates(self, cur, url, duplicates):
+        if not duplicates:
+            return
+        now = datetime.now()
+        execute_values(cur, """
+            INSERT INTO article_duplicates (url, duplicate_of, similarity, found_at)
+            VALUES %s
+            ON CONFLICT (url) DO NOTHING
+        """, [(duplicate, url, similarity, now) for duplicate, similarity in duplicates])
+
+    def evict_article_signatures(self, before):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM article_signatures WHERE created_at < %s", (before,))
+
+    def enqueue_tasks(self, run_id, kind, urls, source=None):
+        """Queue crawl tasks, skipping stored articles and URLs with an open task
+
+        Only article tasks are checked against news_articles: a source page
+        may itself be saved as an article and must still be crawled again.
+        """
+        if not urls:
+            return 0
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                inserted = execute_values(cur, """
+                    INSERT INTO crawl_tasks (run_id, kind, url, source)
+                    SELECT v.run_id, v.kind, v.url, v.source
+                    FROM (VALUES %s) AS v (run_id, kind, url, source)
+                    WHERE v.kind <> 'article'
+                        OR NOT EXISTS (SELECT 1 FROM news_articles a WHERE a.url = v.url)
+                    ON CONFLICT (url) WHERE state IN ('pending', 'leased') DO NOTHING
+                    RETURNING id
+                """, [(run_id, kind, url, source) for url in urls],
+                    template="(%s::integer, %s, %s, %s)", fetch=True)
+                return len(inserted)
+
+    def lease_tasks(self, worker, limit, lease_seconds, max_attempts):
+        """Lease pending tasks, and tasks whose lease expired, to a worker
+
+        SKIP LOCKED lets any number of workers, in any number of processes,
+        lease concurrently without handing out the same task twice.
+        """
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                # Tasks whose worker died on the last attempt are given up
+                cur.execute("""
+                    UPDATE crawl_tasks SET state = 'failed', error = 'Lease expired',
+                        updated_at = now()
+                    WHERE state = 'leased' AND lease_expires < now() AND attempts >= %s
+                """, (max_attempts,))
+                cur.execute("""
+                    UPDATE crawl_tasks SET
+                        state = 'leased',
+                        attempts = attempts + 1,
+                        worker = %(worker)s,
+                        lease_expires = now() + make_interval(secs => %(lease_seconds)s),
+                        updated_at = now()
+                    WHERE id IN (
+                        SELECT id FROM crawl_tasks
+                        WHERE (state = 'pending'
+                               OR (state = 'leased' AND lease_expires < now()))
+                        AND attempts < %(max_attempts)s
+                        ORDER BY kind = 'article' DESC, id
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, run_id, kind, url, source, attempts
+                """, {"worker": worker, "lease_seconds": lease_seconds,
+                      "max_attempts": max_attempts, "limit": limit})
+                return [dict(row) for row in cur.fetchall()]
+
+    def complete_task(self, task_id, worker):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE crawl_tasks SET state = 'done', error = NULL, updated_at = now()
+                    WHERE id = %s AND worker = %s AND state = 'leased'
+                """, (task_id, worker))
+
+    def fail_task(self, task_id, worker, error, max_attempts):
+        """Return a failed task to the queue, or give up after max_attempts"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE crawl_tasks SET
+                        state = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                        error = %s,
+                        lease_expires = NULL,
+                        updated_at = now()
+                    WHERE id = %s AND worker = %s AND state = 'leased'
+                """, (max_attempts, error, task_id, worker))
+
+    def count_open_tasks(self):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT count(*) FROM crawl_tasks WHERE state IN ('pending', 'leased')
+                """)
+                return cur.fetchone()[0]
+
+    def get_queue_stats(self):
+        """Number of crawl tasks per state"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT state, count(*) FROM crawl_tasks GROUP BY state")
+                return dict(cur.fetchall())
+
+    def evict_tasks(self, before):
+        """Delete finished tasks last updated before the given time"""
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM crawl_tasks
+                    WHERE state IN ('done', 'failed') AND updated_at < %s
+                """, (before,))
+
+    def create_run(self, trigger, started_at):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO pipeline_runs (trigger, status, started_at)
+                    VALUES (%s, 'running', %s)
+                    RETURNING id
+                """, (trigger, started_at))
+                return cur.fetchone()[0]
+
+    def finish_run(self, run_id, status, error, finished_at, metrics):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE pipeline_runs
+                    SET status = %s, error = %s, finished_at = %s, metrics = %s
+                    WHERE id = %s
+                """, (status, error, finished_at, json.dumps(metrics), run_id))
+
+    def get_running_run_id(self):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id FROM pipeline_runs
+                    WHERE status = 'running'
+                    ORDER BY id DESC
+                    LIMIT 1
+                """)
+                result = cur.fetchone()
+                return result[0] if result else None
+
+    def mark_interrupted_runs(self):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE pipeline_runs SET status = 'interrupted'
+                    WHERE status = 'running'
+                """)
+
+    def try_advisory_lock(self, key):
+        """Try to take a session-level advisory lock
+
+        The lock lives as long as the returned dedicated connection, so it is
+        released even if the process dies. Returns None if another session
+        holds the lock.
+        """
+        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (key,))
+                if cur.fetchone()[0]:
+                    return conn
+        except Exception:
+            conn.close()
+            raise
+        conn.close()
+        return None
+
+    def release_advisory_lock(self, conn, key):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (key,))
+        finally:
+            conn.close()
+
+    def get_runs(self, limit=20):
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT id, trigger, status, error, started_at, finished_at
+                    FROM pipeline_runs
+                    ORDER BY id DESC
                     LIMIT %s
                 """, (limit,))
                 return [dict(row) for row in cur.fetchall()]
 
+    def get_run(self, run_id):
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT id, trigger, status, error, started_at, finished_at, metrics
+                    FROM pipeline_runs
+                    WHERE id = %s
+                """, (run_id,))
+                row = cur.fetchone()
+                return dict(row) if row else None
+
+    def get_recent_articles(self, limit=10, before=None):
+        """Newest articles first; before is the (processed_date, id) of the last one seen"""
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT id, url, title, summary, processed_date 
+                    FROM news_articles 
+                    WHERE NOT %(before)s OR (processed_date, id) < (%(date)s, %(id)s)
+                    ORDER BY processed_date DESC, id DESC 
+                    LIMIT %(limit)s
+                """, {
+                    "before": before is not None,
+                    "date": before[0] if before else None,
+                    "id": before[1] if before else None,
+                    "limit": limit
+                })
+                return [dict(row) for row in cur.fetchall()]
+
     def save_newsletter(self, newsletter):
         with self.get_conn() as conn:
             with conn.cursor() as cur:
@@ -150,32 +862,85 @@ class Storage:
                     json.dumps(newsletter.get('podcast_script')) if newsletter.get('podcast_script') else None
                 ))
 
-    def get_newsletters(self, search_term=None):
+    def get_newsletters(self, limit=10, before=None, podcasts_only=False):
+        """Newest newsletters first as summaries
+
+        before is the (date, id) of the last newsletter seen; podcasts_only
+        restricts the list to newsletters with a podcast script.
+        """
         with self.get_conn() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
-                if search_term:
-                    cur.execute("""
-                        SELECT id, date, content, articles, podcast_script, audio_url
-                        FROM news_newsletters 
-                        WHERE content ILIKE %s 
-                        ORDER BY date DESC
-                    """, (f'%{search_term}%',))
-                else:
-                    cur.execute("""
-                        SELECT id, date, content, articles, podcast_script, audio_url
-                        FROM news_newsletters 
-                        ORDER BY date DESC
-                        LIMIT 10
-                    """)
+                cur.execute(f"""
+                    SELECT {NEWSLETTER_SUMMARY}
+                    FROM news_newsletters
+                    WHERE (NOT %(before)s OR (date, id) < (%(date)s, %(id)s))
+                    AND (NOT %(podcasts_only)s OR podcast_script IS NOT NULL)
+                    ORDER BY date DESC, id DESC
+                    LIMIT %(limit)s
+                """, {
+                    "before": before is not None,
+                    "date": before[0] if before else None,
+                    "id": before[1] if before else None,
+                    "podcasts_only": podcasts_only,
+                    "limit": limit
+                })
+                return [dict(row) for row in cur.fetchall()]
+
+    def search_newsletters(self, search_term, limit=10, offset=0):
+        """Newsletter summaries matching search_term ranked by relevance, with a highlighted snippet"""
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(f"""
+                    SELECT {NEWSLETTER_SUMMARY},
+                           ts_rank_cd(search_vector, q.query) AS rank,
+                           {_headline("content")} AS snippet
+                    FROM news_newsletters, (SELECT {_search_query()} AS query) q
+                    WHERE search_vector @@ q.query
+                    ORDER BY rank DESC, date DESC
+                    LIMIT %(limit)s OFFSET %(offset)s
+                """, {"query": search_term, "limit": limit, "offset": offset})
+                return [dict(row) for row in cur.fetchall()]
+
+    def get_newsletter(self, newsletter_id):
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT id, date, content, articles, podcast_script, audio_url
+                    FROM news_newsletters
+                    WHERE id = %s
+                """, (newsletter_id,))
+                row = cur.fetchone()
+                return dict(row) if row else None
+
+    def search_articles(self, search_term, limit=20, offset=0):
+        """Articles matching search_term ranked by relevance, with a highlighted snippet"""
+        with self.get_conn() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(f"""
+                    SELECT url, title, summary, processed_date,
+                           ts_rank_cd(search_vector, q.query) AS rank,
+                           {_headline("content")} AS snippet
+                    FROM news_articles, (SELECT {_search_query()} AS query) q
+                    WHERE search_vector @@ q.query
+                    ORDER BY rank DESC, processed_date DESC
+                    LIMIT %(limit)s OFFSET %(offset)s
+                """, {"query": search_term, "limit": limit, "offset": offset})
                 return [dict(row) for row in cur.fetchall()]
 
     def get_unprocessed_articles(self, since_date):
         with self.get_conn() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
+                # Near-duplicates from other sources come along as related URLs
                 cur.execute("""
-                    SELECT * FROM news_articles 
-                    WHERE processed_date > %s 
-                    ORDER BY processed_date DESC
+                    SELECT a.id, a.url, a.title, a.summary, a.content, a.processed_date,
+                           COALESCE((
+                               SELECT array_agg(d.url ORDER BY d.found_at)
+                               FROM article_duplicates d
+                               WHERE d.duplicate_of = a.url
+                           ), '{}') AS related_urls
+                    FROM news_articles a
+                    WHERE a.processed_date > %s 
+                    ORDER BY a.processed_date DESC
                 """, (since_date,))
                 return [dict(row) for row in cur.fetchall()]
 
@@ -183,22 +948,6 @@ class Storage:
         """Update the newsletter with generated audio URL"""
         with self.get_conn() as conn:
             with conn.cursor() as cur:
-                # First add the audio_url column if it doesn't exist
-                cur.execute("""
-                    DO $$ 
-                    BEGIN 
-                        IF NOT EXISTS (
-                            SELECT column_name 
-                            FROM information_schema.columns 
-                            WHERE table_name='news_newsletters' 
-                            AND column_name='audio_url'
-                        ) THEN
-                            ALTER TABLE news_newsletters ADD COLUMN audio_url TEXT;
-                        END IF;
-                    END $$;
-                """)
-
-                # Update the newsletter with the audio URL
                 cur.execute("""
                     UPDATE news_newsletters 
                     SET audio_url = %s 
@@ -0,0 +1,157 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class QueueWorker:
+    """Drains the durable crawl queue in the crawl_tasks table.
+
+    A "source" task fetches a source page, checks the page itself and queues
+    one "article" task per unseen link. An "article" task fetches, classifies
+    and summarizes one article and saves it right away, so a task is only
+    marked done once its result is stored.
+
+    Tasks are leased for lease_seconds. When a worker crashes its lease
+    expires and another worker, in this or any other process sharing the
+    database, takes the task over. Failing tasks are retried until they have
+    been attempted max_attempts times.
+    """
+
+    def __init__(self, storage, processor, interest_prompt, summary_prompt, save_articles,
+                 worker_id=None, lease_seconds=300, max_attempts=3, poll_interval=2.0):
+        self.storage = storage
+        self.processor = processor
+        self.interest_prompt = interest_prompt
+        self.summary_prompt = summary_prompt
+        self.save_articles = save_articles
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+    @property
+    def run(self):
+        return self.processor.run
+
+    def _update_status(self, message, status_callback=None):
+        self.processor._update_status(message, status_callback)
+
+    def run_once(self, status_callback=None):
+        """Lease and handle one task; returns False when none was available"""
+        tasks = self.storage.lease_tasks(
+            self.worker_id, 1, self.lease_seconds, self.max_attempts)
+        if not tasks:
+            return False
+        task = tasks[0]
+        try:
+            if task["kind"] == "source":
+                self._source(task, status_callback)
+            else:
+                self._article(task)
+        except Exception as e:
+            self.run.count("errors", source=task["source"])
+            self._update_status(
+                f"Fel vid bearbetning av {task['url']} "
+                f"(försök {task['attempts']} av {self.max_attempts}): {str(e)}",
+                status_callback)
+            self.storage.fail_task(task["id"], self.worker_id, str(e), self.max_attempts)
+        else:
+            self.storage.complete_task(task["id"], self.worker_id)
+        return True
+
+    def drain(self, status_callback=None, stop=None):
+        """Handle tasks until no task is open anywhere, or stop is set
+
+        Tasks leased by other workers count as open, so this also waits for
+        them to finish or for their leases to expire.
+        """
+        while not (stop and stop.is_set()):
+            if self.run_once(status_callback):
+                continue
+            if self.storage.count_open_tasks() == 0:
+                return
+            time.sleep(self.poll_interval)
+
+    def _source(self, task, status_callback=None):
+        processor = self.processor
+        url = task["url"]
+        self._update_status(f"Hämtar innehåll från: {url}", status_callback)
+        with self.run.source(url):
+            content, article_links = processor.fetch_article(url)
+        if content is None:
+            self.run.count("unchanged_sources", source=url)
+            self._update_status(f"Oförändrad sedan förra körningen: {url}", status_callback)
+            return
+
+        new_links = processor._unseen_links(article_links)
+        queued = self.storage.enqueue_tasks(task["run_id"], "article", new_links, source=url)
+        self.run.count("candidates", queued, source=url)
+        self.run.count("known", len(article_links) - queued, source=url)
+        if queued:
+            self._update_status(f"Hittade {queued} potentiella artikellänkar", status_callback)
+
+        # The source page itself may be relevant too
+        if processor._passes_prefilter(content):
+            relevant, _ = processor.check_relevance(content, self.interest_prompt)
+            if relevant:
+                title, summary = processor.summarize_article(content, self.summary_prompt)
+                self.save_articles([processor._build_article(url, title, summary, content)])
+                self.run.count("relevant", source=url)
+                self._update_status(
+                    f"Hittade relevant innehåll på huvudsidan: {title}", status_callback)
+
+        # The links are queued durably, so the page need not be fetched again
+        # until it changes
+        if processor.fetch_cache:
+            processor.fetch_cache.commit(url)
+
+    def _article(self, task):
+        processor = self.processor
+        article_url, source = task["url"], task["source"]
+        self._update_status(f"Kontrollerar artikel: {article_url}")
+        content, _ = processor.fetch_article(article_url, discover_links=False)
+        if content is None:
+            self.run.count("unchanged", source=source)
+            return
+        if not processor._passes_prefilter(content):
+            self.run.count("prefilter_rejected", source=source)
+            if processor.fetch_cache:
+                processor.fetch_cache.commit(article_url)
+            return
+        if processor._is_near_duplicate(article_url, content, source):
+            return
+
+        try:
+            relevant, reason = processor.check_relevance(content, self.interest_prompt)
+            if relevant:
+                title, summary = processor.summarize_article(content, self.summary_prompt)
+                self.save_articles([processor._build_article(article_url, title, summary, content)])
+        except Exception:
+            processor._settle_near_duplicate(article_url, False)
+            raise
+
+        processor._settle_near_duplicate(article_url, bool(relevant))
+        if relevant:
+            self.run.count("relevant", source=source)
+            self._update_status(f"Hittade relevant artikel: {title}")
+        else:
+            self.run.count("irrelevant", source=source)
+            if processor.seen_urls is not None:
+                processor.seen_urls.reject(article_url, reason)
+        if processor.fetch_cache:
+            processor.fetch_cache.commit(article_url)
+
+
+def drain_queue(workers, status_callback=None):
+    """Run QueueWorkers in threads until the queue is empty"""
+    threads = [
+        threading.Thread(target=worker.drain, args=(status_callback,), daemon=True)
+        for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()